@@ -0,0 +1,83 @@
+"""
+Заглушка xdg-desktop-portal (org.freedesktop.portal.Wallpaper) для проверки
+установки обоев без настоящего рабочего стола.
+
+Публикует портал на текущей сессионной шине и печатает каждый вызов
+SetWallpaperFile (размер переданного файла) в stdout. Удобно запускать
+на изолированной шине:
+
+    dbus-run-session -- sh -c '
+        python benchmarks/fake_portal.py &
+        sleep 1
+        FLATPAK_ID=test python -m wallhaven_viewer rotate --once'
+
+Параметр --fail заставляет портал отвечать ошибкой (проверка fallback).
+"""
+
+import os
+import argparse
+
+import gi
+gi.require_version("Gio", "2.0")
+from gi.repository import Gio, GLib
+
+PORTAL_NAME = "org.freedesktop.portal.Desktop"
+PORTAL_PATH = "/org/freedesktop/portal/desktop"
+
+INTROSPECTION = """
+<node>
+  <interface name="org.freedesktop.portal.Wallpaper">
+    <method name="SetWallpaperFile">
+      <arg type="s" name="parent_window" direction="in"/>
+      <arg type="h" name="fd" direction="in"/>
+      <arg type="a{sv}" name="options" direction="in"/>
+      <arg type="o" name="handle" direction="out"/>
+    </method>
+    <property name="version" type="u" access="read"/>
+  </interface>
+</node>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка портала обоев на сессионной шине")
+    parser.add_argument("--fail", action="store_true", help="отвечать ошибкой на SetWallpaperFile")
+    args = parser.parse_args()
+
+    node = Gio.DBusNodeInfo.new_for_xml(INTROSPECTION)
+    loop = GLib.MainLoop()
+
+    def on_call(connection, sender, path, iface, method, params, invocation):
+        if args.fail:
+            invocation.return_dbus_error("org.freedesktop.portal.Error.Failed", "fake failure")
+            return
+        fd_list = invocation.get_message().get_unix_fd_list()
+        fd = fd_list.get(params.unpack()[1])
+        size = os.fstat(fd).st_size
+        os.close(fd)
+        print(f"SetWallpaperFile: {size} bytes, options={params.unpack()[2]}", flush=True)
+        invocation.return_value(GLib.Variant("(o)", ("/org/freedesktop/portal/desktop/request/1_1/fake",)))
+
+    def on_get_property(connection, sender, path, iface, name):
+        return GLib.Variant("u", 1) if name == "version" else None
+
+    def on_bus_acquired(connection, name):
+        connection.register_object(PORTAL_PATH, node.interfaces[0], on_call, on_get_property, None)
+
+    def on_name_acquired(connection, name):
+        print(f"Портал-заглушка запущен: {name}", flush=True)
+
+    def on_name_lost(connection, name):
+        print(f"Не удалось занять имя {name} на шине", flush=True)
+        loop.quit()
+
+    Gio.bus_own_name(Gio.BusType.SESSION, PORTAL_NAME, Gio.BusNameOwnerFlags.NONE,
+                     on_bus_acquired, on_name_acquired, on_name_lost)
+    try:
+        loop.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Локальная замена Wallhaven для бенчмарков.
+
+Обслуживает:
+    /api/v1/search?page=N     — страница выдачи (PER_PAGE обоев, LAST_PAGE страниц)
+    /api/v1/w/<id>            — информация об обоях
+    /th/small/<xx>/<id>.png   — синтетическая миниатюра
+    /full/<xx>/wallhaven-<id>.png — синтетический оригинал
+
+Изображения — PNG-градиенты, собранные через zlib без сторонних библиотек.
+
+    python benchmarks/fake_server.py --port 8765 --latency-ms 30
+"""
+
+import json
+import struct
+import threading
+import time
+import zlib
+import argparse
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+PER_PAGE = 24
+LAST_PAGE = 50
+THUMB_SIZE = (300, 200)
+FULL_SIZE = (3840, 2160)
+
+
+@lru_cache(maxsize=8)
+def make_png(width, height, seed=0):
+    """Собирает RGB PNG с градиентом заданного размера."""
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xffffffff)
+
+    row_pattern = bytes((x * 255 // max(1, width - 1) + seed) % 256 for x in range(width))
+    rows = []
+    for y in range(height):
+        g = y * 255 // max(1, height - 1)
+        row = bytearray(b"\x00")
+        for r in row_pattern:
+            row += bytes((r, g, (r + g) // 2))
+        rows.append(bytes(row))
+    raw = b"".join(rows)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b""))
+
+
+def wallpaper_id(page, index):
+    """Детерминированный ID обоев для позиции в выдаче."""
+    return f"{(page * PER_PAGE + index):06x}"
+
+
+class FakeWallhavenHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов; задержка берётся из server.latency."""
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _base(self):
+        return f"http://{self.headers.get('Host')}"
+
+    def _wallpaper(self, w_id):
+        base = self._base()
+        return {
+            "id": w_id,
+            "path": f"{base}/full/{w_id[:2]}/wallhaven-{w_id}.png",
+            "thumbs": {"large": f"{base}/th/small/{w_id[:2]}/{w_id}.png",
+                       "original": f"{base}/th/small/{w_id[:2]}/{w_id}.png"},
+            "resolution": f"{FULL_SIZE[0]}x{FULL_SIZE[1]}",
+            "file_size": len(make_png(*FULL_SIZE)),
+            "views": 1, "favorites": 0, "colors": ["#336699"],
+            "uploader": {"username": "bench"},
+            "tags": [{"id": 1, "name": "benchmark"}],
+        }
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+
+        if url.path == "/api/v1/search":
+            page = int(parse_qs(url.query).get("page", ["1"])[0])
+            data = [self._wallpaper(wallpaper_id(page, i)) for i in range(PER_PAGE)] if page <= LAST_PAGE else []
+            body = json.dumps({"data": data, "meta": {"current_page": page, "last_page": LAST_PAGE,
+                                                      "per_page": PER_PAGE, "total": PER_PAGE * LAST_PAGE}})
+            self._send(200, "application/json", body.encode())
+        elif parts[:3] == ["api", "v1", "w"] and len(parts) == 4:
+            self._send(200, "application/json", json.dumps({"data": self._wallpaper(parts[3])}).encode())
+        elif parts[:1] == ["th"]:
+            self._send(200, "image/png", make_png(*THUMB_SIZE))
+        elif parts[:1] == ["full"]:
+            self._send(200, "image/png", make_png(*FULL_SIZE))
+        else:
+            self._send(404, "text/plain", b"not found")
+
+
+def start_server(port=0, latency_ms=0):
+    """
+    Запускает сервер в фоновом потоке.
+
+    Returns:
+        ThreadingHTTPServer: Сервер; адрес — server.server_address.
+    """
+    # Изображения собираются один раз заранее, чтобы не искажать первые замеры
+    make_png(*THUMB_SIZE)
+    make_png(*FULL_SIZE)
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeWallhavenHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000.0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная замена Wallhaven для бенчмарков")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    args = parser.parse_args()
+    srv = start_server(args.port, args.latency_ms)
+    print(f"WALLHAVEN_API_BASE=http://127.0.0.1:{srv.server_address[1]}/api/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
@@ -0,0 +1,215 @@
+"""
+Бенчмарки Wallhaven Viewer против локального сервера (fake_server.py).
+
+Замеряет:
+    search        — задержку запроса страницы выдачи (WallhavenAPI.search_wallpapers);
+    thumbnails    — миниатюр в секунду через ImageLoader.load_thumbnail (сеть и кэш);
+    download      — пропускную способность загрузки оригинала (ImageLoader.fetch_to_file);
+    library_scan  — сканирование папки с 10 000 файлов (library.scan_library,
+                    основа MainWindow.scan_downloaded_wallpapers);
+    clean_cache   — очистку переполненного кэша (utils.clean_cache).
+
+Результаты пишутся в JSON для сравнения между версиями:
+
+    python benchmarks/run_benchmarks.py --output benchmarks/results/0.0.2.json
+
+С профилем симуляции сети (задержки, лимит скорости, обрывы, 429, таймауты):
+
+    python benchmarks/run_benchmarks.py --net-profile benchmarks/net_profiles/throttled.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+from fake_server import start_server  # noqa: E402
+
+
+def summarize(samples_ms):
+    """Сводка по списку длительностей в миллисекундах."""
+    ordered = sorted(samples_ms)
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.mean(ordered),
+        'p50_ms': ordered[len(ordered) // 2],
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'max_ms': ordered[-1],
+    }
+
+
+def bench_search(pages):
+    from wallhaven_viewer.api import WallhavenAPI
+    from wallhaven_viewer.config import DEFAULT_SETTINGS
+
+    samples = []
+    errors = 0
+    for page in range(1, pages + 1):
+        start = time.perf_counter()
+        data, _meta = WallhavenAPI.search_wallpapers("bench", page, DEFAULT_SETTINGS)
+        samples.append((time.perf_counter() - start) * 1000)
+        if data is None:
+            errors += 1
+    result = summarize(samples)
+    result['errors'] = errors
+    return result
+
+
+def bench_thumbnails(count):
+    from gi.repository import GLib
+    from wallhaven_viewer.api import WallhavenAPI
+    from wallhaven_viewer.config import DEFAULT_SETTINGS
+    from wallhaven_viewer.image_loader import ImageLoader
+    from wallhaven_viewer.utils import get_cache_path
+
+    urls = []
+    page = 1
+    while len(urls) < count:
+        data, _meta = WallhavenAPI.search_wallpapers("bench", page, DEFAULT_SETTINGS)
+        if data is not None:
+            urls += [w['thumbs']['large'] for w in data]
+            page += 1
+    urls = urls[:count]
+
+    def run():
+        loop = GLib.MainLoop()
+        state = {'left': len(urls), 'failed': 0}
+
+        def on_loaded(pixbuf):
+            if pixbuf is None:
+                state['failed'] += 1
+            state['left'] -= 1
+            if state['left'] == 0:
+                loop.quit()
+            return False
+
+        start = time.perf_counter()
+        for url in urls:
+            ImageLoader.load_thumbnail(cache_path=get_cache_path(url), thumb_url=url,
+                                       target_size=(280, 185), callback=on_loaded)
+        loop.run()
+        elapsed = time.perf_counter() - start
+        return {'count': len(urls), 'failed': state['failed'], 'seconds': elapsed,
+                'per_second': len(urls) / elapsed if elapsed else 0.0}
+
+    # Первый проход — из сети (с записью в кэш), второй — из кэша
+    return {'network': run(), 'cache': run()}
+
+
+def bench_download(count, workdir):
+    from wallhaven_viewer.api import WallhavenAPI
+    from wallhaven_viewer.config import DEFAULT_SETTINGS
+    from wallhaven_viewer.image_loader import ImageLoader
+
+    data = None
+    while data is None:
+        data, _meta = WallhavenAPI.search_wallpapers("bench", 1, DEFAULT_SETTINGS)
+    total_bytes = 0
+    failed = 0
+    start = time.perf_counter()
+    for w in data[:count]:
+        dest = os.path.join(workdir, os.path.basename(w['path']))
+        if ImageLoader.fetch_to_file(w['path'], dest):
+            total_bytes += os.path.getsize(dest)
+        else:
+            failed += 1
+    elapsed = time.perf_counter() - start
+    return {'files': count, 'failed': failed, 'bytes': total_bytes, 'seconds': elapsed,
+            'mb_per_second': total_bytes / (1024 * 1024) / elapsed if elapsed else 0.0}
+
+
+def bench_library_scan(files, workdir):
+    from wallhaven_viewer.library import scan_library
+
+    library = os.path.join(workdir, "library")
+    os.makedirs(library, exist_ok=True)
+    for i in range(files):
+        with open(os.path.join(library, f"wallhaven-{i:06x}.jpg"), "wb") as f:
+            f.write(b"\xff\xd8\xff")
+    samples = []
+    for _ in range(3):
+        start = time.perf_counter()
+        found = scan_library(library)
+        samples.append((time.perf_counter() - start) * 1000)
+    result = summarize(samples)
+    result['files'] = len(found)
+    return result
+
+
+def bench_clean_cache(files, size_kb):
+    from wallhaven_viewer.utils import clean_cache, get_cache_dir
+
+    cache_dir = get_cache_dir()
+    payload = b"\0" * (size_kb * 1024)
+    old = time.time() - 30 * 24 * 3600
+    for i in range(files):
+        path = os.path.join(cache_dir, f"bench-{i:06x}.jpg")
+        with open(path, "wb") as f:
+            f.write(payload)
+        if i % 2:
+            os.utime(path, (old, old))
+    start = time.perf_counter()
+    clean_cache(7, max(1, files * size_kb // 1024 // 4))
+    elapsed = (time.perf_counter() - start) * 1000
+    return {'files': files, 'file_kb': size_kb, 'ms': elapsed, 'remaining': len(os.listdir(cache_dir))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки Wallhaven Viewer")
+    parser.add_argument("--output", help="куда записать JSON (по умолчанию — stdout)")
+    parser.add_argument("--latency-ms", type=int, default=0, help="задержка ответа сервера")
+    parser.add_argument("--net-profile", help="JSON-профиль симуляции сети (WALLHAVEN_NET_PROFILE)")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--thumbnails", type=int, default=200)
+    parser.add_argument("--downloads", type=int, default=5)
+    parser.add_argument("--library-files", type=int, default=10000)
+    parser.add_argument("--cache-files", type=int, default=2000)
+    args = parser.parse_args()
+
+    server = start_server(latency_ms=args.latency_ms)
+    workdir = tempfile.mkdtemp(prefix="wallhaven-bench-")
+    # Окружение задаётся до импорта пакета: config читает адрес API при импорте
+    os.environ["WALLHAVEN_API_BASE"] = f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+    os.environ["XDG_CACHE_HOME"] = os.path.join(workdir, "cache")
+    os.environ["XDG_CONFIG_HOME"] = os.path.join(workdir, "config")
+    if args.net_profile:
+        os.environ["WALLHAVEN_NET_PROFILE"] = os.path.abspath(args.net_profile)
+
+    try:
+        results = {
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'latency_ms': args.latency_ms,
+            'net_profile': os.path.basename(args.net_profile) if args.net_profile else None,
+            'search': bench_search(args.pages),
+            'thumbnails': bench_thumbnails(args.thumbnails),
+            'download': bench_download(args.downloads, workdir),
+            'library_scan': bench_library_scan(args.library_files, workdir),
+            'clean_cache': bench_clean_cache(args.cache_files, 16),
+        }
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
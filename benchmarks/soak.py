@@ -0,0 +1,101 @@
+"""
+Soak-тест памяти главного окна против локального сервера (fake_server.py).
+
+Прокручивает выдачу на 100 страниц циклами «новый поиск → N страниц» и
+проверяет, что RSS после последнего цикла вырос относительно первого не
+больше допустимого. Требуется графическая сессия (или Xvfb/Broadway):
+
+    python benchmarks/soak.py --pages 100 --pages-per-cycle 10 --max-growth-mb 64
+
+Код возврата 0 — рост памяти в пределах нормы, 1 — превышен.
+"""
+
+import os
+import gc
+import sys
+import json
+import shutil
+import tempfile
+import argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+from fake_server import start_server  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak-тест памяти Wallhaven Viewer")
+    parser.add_argument("--pages", type=int, default=100, help="сколько страниц прокрутить всего")
+    parser.add_argument("--pages-per-cycle", type=int, default=10, help="страниц между новыми поисками")
+    parser.add_argument("--max-growth-mb", type=float, default=64.0, help="допустимый рост RSS")
+    parser.add_argument("--latency-ms", type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_server(latency_ms=args.latency_ms)
+    workdir = tempfile.mkdtemp(prefix="wallhaven-soak-")
+    # Окружение задаётся до импорта пакета: config читает адрес API при импорте
+    os.environ["WALLHAVEN_API_BASE"] = f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+    os.environ["XDG_CACHE_HOME"] = os.path.join(workdir, "cache")
+    os.environ["XDG_CONFIG_HOME"] = os.path.join(workdir, "config")
+    os.environ.setdefault("WALLHAVEN_LEAK_MONITOR", "30")
+
+    import gi
+    gi.require_version("Gtk", "4.0")
+    gi.require_version("Adw", "1")
+    from gi.repository import GLib, Adw
+    from wallhaven_viewer import metrics
+    from wallhaven_viewer.leak_monitor import get_rss_bytes, get_live_counts
+    from wallhaven_viewer.main_window import MainWindow
+
+    cycles = max(1, args.pages // args.pages_per_cycle)
+    state = {'cycle': 0, 'pages': 0, 'rss': [], 'live': [], 'ok': False}
+    app = Adw.Application(application_id="cc.wallhaven.Viewer.Soak")
+
+    def thumbnails_busy():
+        return metrics.snapshot()['gauges'].get('thumb.in_flight', 0) > 0
+
+    def step(window):
+        if window.is_loading or thumbnails_busy():
+            return True
+        if state['pages'] < args.pages_per_cycle and window.has_more_pages:
+            adj = window.v_adj
+            adj.set_value(adj.get_upper())
+            window.check_if_can_load_next_page(force=True)
+            state['pages'] += 1
+            return True
+
+        gc.collect()
+        state['rss'].append(get_rss_bytes() / (1024 * 1024))
+        state['live'].append(get_live_counts())
+        print(f"цикл {state['cycle'] + 1}/{cycles}: RSS {state['rss'][-1]:.1f} MB, "
+              f"объекты {state['live'][-1]}", file=sys.stderr)
+        state['cycle'] += 1
+        if state['cycle'] >= cycles:
+            growth = state['rss'][-1] - state['rss'][0]
+            state['ok'] = growth <= args.max_growth_mb
+            print(json.dumps({'cycles': cycles, 'rss_mb': state['rss'], 'growth_mb': growth,
+                              'max_growth_mb': args.max_growth_mb, 'ok': state['ok']}))
+            window.close()
+            return False
+        state['pages'] = 0
+        window.start_new_search(f"soak {state['cycle']}")
+        return True
+
+    def on_activate(application):
+        window = MainWindow(application)
+        window.present()
+        GLib.timeout_add(50, step, window)
+
+    app.connect("activate", on_activate)
+    try:
+        app.run([sys.argv[0]])
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0 if state['ok'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,20 @@
 """
 Точка входа для запуска:  python -m wallhaven_viewer
+
+С подкомандой (search, download, scan, ...) запускается консольный режим без GTK.
 """
 
-from wallhaven_viewer.app import main
+import sys
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Первым импортируется таймлайн: от этого момента отсчитываются этапы запуска
+    from wallhaven_viewer.timeline import mark
+    from wallhaven_viewer.commands import COMMANDS
+
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS + ("-h", "--help"):
+        from wallhaven_viewer.cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    from wallhaven_viewer.app import main
+    mark("app_imported")
+    main()
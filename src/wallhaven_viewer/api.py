@@ -2,15 +2,51 @@
 Модуль для работы с Wallhaven API.
 """
 
-import requests
-from wallhaven_viewer.config import API_URL, WALLPAPER_API_URL, RESOLUTION_OPTIONS, RATIO_OPTIONS, SORT_OPTIONS
+import time
+import random
+import string
+from wallhaven_viewer import metrics
+from wallhaven_viewer.net import get_session
+from wallhaven_viewer.tag_index import get_tag_index
+from wallhaven_viewer.config import (
+    API_URL, WALLPAPER_API_URL, COLLECTIONS_API_URL, RESOLUTION_OPTIONS, RATIO_OPTIONS, SORT_OPTIONS)
+
+# Значения параметра sorting в порядке SORT_OPTIONS
+SORT_MODES = ["relevance", "random", "date_added", "views", "favorites", "toplist", "hot"]
+# Длина seed случайной выдачи (формат API: [a-zA-Z0-9]{6})
+SEED_LENGTH = 6
 
 
 class WallhavenAPI:
     """Класс для работы с API Wallhaven."""
 
     @staticmethod
-    def build_search_params(settings, query, page):
+    def new_seed():
+        """
+        Создаёт seed для постраничного обхода случайной выдачи.
+
+        С одним и тем же seed все страницы берутся из одной перестановки,
+        поэтому следующие страницы не повторяют уже показанные обои.
+        """
+        return "".join(random.choices(string.ascii_letters + string.digits, k=SEED_LENGTH))
+
+    @staticmethod
+    def build_purity(settings):
+        """
+        Возвращает фильтр purity ('100', '110' и т.д.) по настройкам.
+        Sketchy и NSFW доступны только с API-ключом.
+        """
+        p_sfw = "1" if settings.get('purity_sfw', 'true').lower() == 'true' else "0"
+        if settings.get('api_key', ''):
+            p_sky = "1" if settings.get('purity_sketchy', 'false').lower() == 'true' else "0"
+            p_nsf = "1" if settings.get('purity_nsfw', 'false').lower() == 'true' else "0"
+        else:
+            p_sky = "0"
+            p_nsf = "0"
+        return f"{p_sfw}{p_sky}{p_nsf}"
+
+    @staticmethod
+    def build_search_params(settings, query, page, seed=None):
         """
         Формирует словарь параметров для запроса к Wallhaven API на основе текущих фильтров.
 
@@ -18,6 +54,7 @@ class WallhavenAPI:
             settings (dict): Словарь настроек приложения.
             query (str): Поисковый запрос.
             page (int): Номер страницы.
+            seed (str, optional): Seed случайной выдачи; для других сортировок не передаётся.
 
         Returns:
             dict: Параметры запроса.
@@ -25,20 +62,10 @@ class WallhavenAPI:
         c_gen = "1" if settings.get('cat_general', 'true').lower() == 'true' else "0"
         c_ani = "1" if settings.get('cat_anime', 'true').lower() == 'true' else "0"
         c_peo = "1" if settings.get('cat_people', 'true').lower() == 'true' else "0"
-        p_sfw = "1" if settings.get('purity_sfw', 'true').lower() == 'true' else "0"
         api_key = settings.get('api_key', '')
 
-        # Обработка Purity в зависимости от наличия API-ключа
-        if api_key:
-            p_sky = "1" if settings.get('purity_sketchy', 'false').lower() == 'true' else "0"
-            p_nsf = "1" if settings.get('purity_nsfw', 'false').lower() == 'true' else "0"
-        else:
-            p_sky = "0"
-            p_nsf = "0"
-
         sort_idx = int(settings.get('sort_index', '5'))
-        sort_modes = ["relevance", "random", "date_added", "views", "favorites", "toplist", "hot"]
-        sorting = sort_modes[sort_idx] if sort_idx < len(sort_modes) else "views"
+        sorting = SORT_MODES[sort_idx] if sort_idx < len(SORT_MODES) else "views"
 
         res_idx = int(settings.get('resolution_index', '0'))
         ratio_idx = int(settings.get('ratio_index', '0'))
@@ -48,7 +75,7 @@ class WallhavenAPI:
         params = {
             "q": query,
             "categories": f"{c_gen}{c_ani}{c_peo}",
-            "purity": f"{p_sfw}{p_sky}{p_nsf}",
+            "purity": WallhavenAPI.build_purity(settings),
             "sorting": sorting,
             "page": page
         }
@@ -59,11 +86,13 @@ class WallhavenAPI:
             params["ratios"] = selected_ratio
         if api_key:
             params["apikey"] = api_key
+        if seed and sorting == "random":
+            params["seed"] = seed
 
         return params
 
     @staticmethod
-    def search_wallpapers(query, page, settings, timeout=10):
+    def search_wallpapers(query, page, settings, timeout=10, seed=None):
         """
         Выполняет поиск обоев через API Wallhaven.
 
@@ -72,20 +101,88 @@ class WallhavenAPI:
             page (int): Номер страницы.
             settings (dict): Словарь настроек приложения.
             timeout (int): Таймаут запроса в секундах.
+            seed (str, optional): Seed случайной выдачи (см. `new_seed`); API
+                возвращает действующий seed в meta['seed'].
 
         Returns:
             tuple: (data, meta) - список обоев и метаданные, или (None, None) в случае ошибки.
         """
         try:
-            params = WallhavenAPI.build_search_params(settings, query, page)
-            resp = requests.get(API_URL, params=params, timeout=timeout)
-            resp.raise_for_status()
-            json_data = resp.json()
+            params = WallhavenAPI.build_search_params(settings, query, page, seed)
+            with metrics.span("api.search", page=page):
+                resp = get_session().get(API_URL, params=params, timeout=timeout)
+                resp.raise_for_status()
+                json_data = resp.json()
             return json_data.get("data", []), json_data.get("meta", {})
         except Exception as e:
+            metrics.count("api.errors")
             print(f"Ошибка API поиска: {e}")
             return None, None
 
+    @staticmethod
+    def list_collections(settings, timeout=10):
+        """
+        Получает список коллекций пользователя.
+
+        С API-ключом возвращаются все коллекции владельца ключа (включая
+        приватные), без ключа — публичные коллекции пользователя 'username'.
+
+        Args:
+            settings (dict): Словарь настроек приложения.
+            timeout (int): Таймаут запроса в секундах.
+
+        Returns:
+            list or None: Коллекции (id, label, views, public, count) или None при ошибке.
+        """
+        api_key = settings.get('api_key', '')
+        username = settings.get('username', '')
+        if api_key:
+            url, params = COLLECTIONS_API_URL, {"apikey": api_key}
+        elif username:
+            url, params = f"{COLLECTIONS_API_URL}/{username}", {}
+        else:
+            return None
+        try:
+            with metrics.span("api.collections"):
+                resp = get_session().get(url, params=params, timeout=timeout)
+                resp.raise_for_status()
+                json_data = resp.json()
+            return json_data.get("data", [])
+        except Exception as e:
+            metrics.count("api.errors")
+            print(f"Ошибка API коллекций: {e}")
+            return None
+
+    @staticmethod
+    def get_collection_page(username, collection_id, page, settings, timeout=10):
+        """
+        Получает страницу обоев коллекции.
+
+        Args:
+            username (str): Владелец коллекции.
+            collection_id (int): ID коллекции.
+            page (int): Номер страницы.
+            settings (dict): Словарь настроек (API-ключ и фильтр purity).
+            timeout (int): Таймаут запроса в секундах.
+
+        Returns:
+            tuple: (data, meta) — как у `search_wallpapers`, или (None, None) при ошибке.
+        """
+        params = {"page": page, "purity": WallhavenAPI.build_purity(settings)}
+        if settings.get('api_key', ''):
+            params["apikey"] = settings['api_key']
+        try:
+            with metrics.span("api.collection", page=page):
+                resp = get_session().get(f"{COLLECTIONS_API_URL}/{username}/{collection_id}",
+                                         params=params, timeout=timeout)
+                resp.raise_for_status()
+                json_data = resp.json()
+            return json_data.get("data", []), json_data.get("meta", {})
+        except Exception as e:
+            metrics.count("api.errors")
+            print(f"Ошибка API коллекции: {e}")
+            return None, None
+
     @staticmethod
     def get_wallpaper_info(wallpaper_id, timeout=5):
         """
@@ -100,7 +197,8 @@ class WallhavenAPI:
         """
         try:
             info_url = f"{WALLPAPER_API_URL}/{wallpaper_id}"
-            resp = requests.get(info_url, timeout=timeout)
+            with metrics.span("api.info"):
+                resp = get_session().get(info_url, timeout=timeout)
             try:
                 resp.raise_for_status()
             except Exception as e:
@@ -117,11 +215,37 @@ class WallhavenAPI:
             if not data:
                 print(f"Wallhaven API: no data for wallpaper {wallpaper_id}")
                 return None
+            # Пополняем словарь тегов для автодополнения поиска
+            get_tag_index().add_wallpaper(wallpaper_id, data.get("tags"))
             return data
         except Exception as e:
             print(f"Wallhaven API request failed: {e}")
             return None
 
+    @staticmethod
+    def fetch_wallpaper_info(wallpaper_id, attempts=3, delay=0.6):
+        """
+        Получает информацию об обоях по ID с повторными попытками.
+
+        Args:
+            wallpaper_id (str): ID обоев.
+            attempts (int): Количество попыток.
+            delay (float): Пауза между попытками в секундах.
+
+        Returns:
+            dict or None: Информация об обоях или None, если все попытки неудачны.
+        """
+        for attempt in range(1, attempts + 1):
+            try:
+                wallpaper_info = WallhavenAPI.get_wallpaper_info(wallpaper_id)
+                if wallpaper_info:
+                    return wallpaper_info
+            except Exception as e:
+                print(f"Ошибка при запросе wallpaper_info (attempt {attempt}): {e}")
+            if attempt < attempts:
+                time.sleep(delay)
+        return None
+
     @staticmethod
     def build_wallpaper_url(wallpaper_id, extension="jpg"):
         """
@@ -2,12 +2,16 @@
 Основной модуль приложения Wallhaven Viewer.
 """
 
+from wallhaven_viewer.timeline import mark
 import gi
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
 from gi.repository import Gtk, Gdk, Gio, Adw
-from wallhaven_viewer.utils import resolve_path
-from wallhaven_viewer.main_window import MainWindow
+from wallhaven_viewer.resources import register_resources, load_css
+from wallhaven_viewer.net import preconnect
+from wallhaven_viewer.wallpaper import get_wallpaper_backends
+
+mark("gtk_imported")
 
 
 class WallpaperViewer(Adw.Application):
@@ -32,7 +36,7 @@ class WallpaperViewer(Adw.Application):
             # Загрузка CSS стилей
             css_provider = Gtk.CssProvider()
             try:
-                css_provider.load_from_path(resolve_path("style.css"))
+                load_css(css_provider, "style.css")
                 Gtk.StyleContext.add_provider_for_display(
                     Gdk.Display.get_default(),
                     css_provider,
@@ -41,19 +45,39 @@ class WallpaperViewer(Adw.Application):
             except Exception as e:
                 print(f"Ошибка загрузки style.css: {e}")
 
-            # Создаем и показываем окно (без дублей)
+            # Создаем и показываем окно (без дублей).
+            # Модуль главного окна импортируется здесь, а не при старте модуля,
+            # чтобы его импорт шёл параллельно с предварительным подключением к серверам.
             if not self.window:
-             self.window = MainWindow(self)
-            self.window.present()
-
+                preconnect()
+                from wallhaven_viewer.main_window import MainWindow
+                mark("main_window_imported")
+                self.window = MainWindow(self)
+                self._watch_first_frame()
             self.window.present()
         except Exception as e:
             print(f"Ошибка в do_activate: {e}")
             traceback.print_exc()
     
+    def _watch_first_frame(self):
+        """Отмечает в таймлайне запуска момент отрисовки первого кадра окна."""
+        def on_after_paint(clock):
+            mark("first_frame")
+            clock.disconnect(self._first_frame_handler)
+
+        def on_realize(window):
+            clock = window.get_frame_clock()
+            if clock is not None:
+                self._first_frame_handler = clock.connect("after-paint", on_after_paint)
+
+        self.window.connect("realize", on_realize)
+
     def do_startup(self):
-        """Вызывается при старте приложения."""
+        """Вызывается при старте приложения: регистрирует ресурсы до создания окон."""
+        register_resources()
         Adw.Application.do_startup(self)
+        # Backend'ы установки обоев проверяются в фоне, к первому клику результат уже готов
+        get_wallpaper_backends().probe()
 
 
 def main():
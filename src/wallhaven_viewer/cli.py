@@ -0,0 +1,469 @@
+"""
+Консольный (headless) режим Wallhaven Viewer.
+
+Не импортирует Gtk/Adw, поэтому работает на машинах без графической сессии:
+
+    python -m wallhaven_viewer search "nature" --pages 2 > results.jsonl
+    python -m wallhaven_viewer download --query "nature" --pages 3 --parallel 4
+    python -m wallhaven_viewer download abc123 def456 --dest ~/Pictures/walls
+    python -m wallhaven_viewer scan
+    python -m wallhaven_viewer sync "nature" --sort date_added --dest /srv/walls/nature
+    python -m wallhaven_viewer warmup --workers 8
+    python -m wallhaven_viewer colors "#336699" --limit 20
+    python -m wallhaven_viewer rotate --interval 30m --screen 1920x1080
+    python -m wallhaven_viewer rotate --source collection --collection Favorites
+    python -m wallhaven_viewer recompress --dry-run
+
+Настройки (API-ключ, фильтры, папка загрузок) берутся из config.ini GUI;
+параметры командной строки их переопределяют.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+from wallhaven_viewer.api import WallhavenAPI, SORT_MODES
+from wallhaven_viewer.config import load_settings, get_config_dir
+from wallhaven_viewer.download_manager import DownloadManager
+from wallhaven_viewer.library import scan_library
+from wallhaven_viewer.probe import probe_file
+from wallhaven_viewer.sidecar import read_sidecar
+from wallhaven_viewer.sync import sync_collection
+from wallhaven_viewer.thumbnailer import warm_library
+from wallhaven_viewer.tag_index import save_tag_index
+
+
+def build_settings(args):
+    """
+    Накладывает параметры командной строки на сохранённые настройки.
+
+    Args:
+        args (argparse.Namespace): Разобранные аргументы.
+
+    Returns:
+        dict: Настройки в формате, который понимает `WallhavenAPI.build_search_params`.
+    """
+    settings = load_settings()
+    if getattr(args, 'api_key', None):
+        settings['api_key'] = args.api_key
+    if getattr(args, 'username', None):
+        settings['username'] = args.username
+    if getattr(args, 'sort', None):
+        settings['sort_index'] = str(SORT_MODES.index(args.sort))
+    if getattr(args, 'categories', None):
+        flags = args.categories.ljust(3, '0')
+        for key, flag in zip(('cat_general', 'cat_anime', 'cat_people'), flags):
+            settings[key] = 'true' if flag == '1' else 'false'
+    if getattr(args, 'purity', None):
+        flags = args.purity.ljust(3, '0')
+        for key, flag in zip(('purity_sfw', 'purity_sketchy', 'purity_nsfw'), flags):
+            settings[key] = 'true' if flag == '1' else 'false'
+    if getattr(args, 'dest', None):
+        settings['download_path'] = os.path.expanduser(args.dest)
+    return settings
+
+
+def iter_search(query, settings, first_page=1, pages=1):
+    """
+    Постранично выполняет поиск и возвращает обои по одному.
+
+    Args:
+        query (str): Поисковый запрос.
+        settings (dict): Настройки поиска.
+        first_page (int): Первая страница.
+        pages (int): Сколько страниц пройти (0 — до последней).
+
+    Yields:
+        dict: Данные обоев из ответа API.
+    """
+    page = first_page
+    seed = WallhavenAPI.new_seed()
+    while True:
+        data, meta = WallhavenAPI.search_wallpapers(query, page, settings, seed=seed)
+        if data is None:
+            raise RuntimeError(f"ошибка API на странице {page}")
+        seed = (meta or {}).get('seed') or seed
+        for w in data:
+            yield w
+        last_page = (meta or {}).get('last_page', page)
+        if page >= last_page or (pages and page - first_page + 1 >= pages):
+            return
+        page += 1
+
+
+def cmd_search(args):
+    """Выводит результаты поиска в формате JSON Lines."""
+    settings = build_settings(args)
+    query = args.query if args.query is not None else settings.get('last_query', '')
+    for w in iter_search(query, settings, args.page, args.pages):
+        sys.stdout.write(json.dumps(w, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+    return 0
+
+
+def cmd_download(args):
+    """Скачивает обои по ID или по результатам поиска параллельно."""
+    settings = build_settings(args)
+    download_path = settings.get('download_path', '')
+    if not download_path:
+        print("Папка загрузок не задана: укажите --dest или настройте её в GUI", file=sys.stderr)
+        return 2
+    os.makedirs(download_path, exist_ok=True)
+
+    ids = list(args.ids)
+    if args.query is not None:
+        ids += [w['id'] for w in iter_search(args.query, settings, args.page, args.pages) if w.get('id')]
+    if not ids:
+        print("Нечего скачивать", file=sys.stderr)
+        return 0
+
+    parallelism = args.parallel or int(settings.get('download_parallelism', 3))
+    bandwidth = args.limit_kbps if args.limit_kbps is not None else int(settings.get('download_bandwidth_kbps', 0))
+    manager = DownloadManager(
+        parallelism=parallelism,
+        bandwidth_kbps=bandwidth,
+        journal_path=os.path.join(get_config_dir(), "downloads-cli.json") if args.journal else None,
+        on_progress=print_download_progress,
+    )
+    if args.journal:
+        manager.resume()
+    manager.enqueue(ids, download_path)
+    manager.wait()
+    stats = manager.get_stats()
+    sys.stderr.write("\n")
+    manager.clear_finished()
+    return 1 if stats['failed'] else 0
+
+
+def cmd_scan(args):
+    """Индексирует папку загрузок и выводит записи в формате JSON Lines."""
+    settings = build_settings(args)
+    download_path = settings.get('download_path', '')
+    if not download_path or not os.path.isdir(download_path):
+        print(f"Папка загрузок не найдена: {download_path}", file=sys.stderr)
+        return 2
+    for w_id, path in sorted(scan_library(download_path).items()):
+        record = {'id': w_id, 'path': path, 'size': os.path.getsize(path)}
+        # Формат и размеры — из заголовка, без декодирования
+        info = probe_file(path)
+        if info:
+            record.update(format=info.format, width=info.width, height=info.height,
+                          color_type=info.color_type)
+        if args.meta:
+            meta, tags = read_sidecar(path)
+            record['meta'] = meta
+            record['tags'] = [t.get('name') if isinstance(t, dict) else t for t in (tags or [])]
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return 0
+
+
+def print_download_progress(stats):
+    """Печатает агрегированный прогресс загрузок в stderr одной строкой."""
+    finished = stats['done'] + stats['failed']
+    sys.stderr.write(f"\rСкачано {finished}/{stats['total']} (ошибок: {stats['failed']}, "
+                     f"{stats['bytes'] // 1024} КБ)   ")
+    sys.stderr.flush()
+
+
+def cmd_sync(args):
+    """Зеркалирует выдачу поиска в папку: скачивает только новые обои."""
+    settings = build_settings(args)
+    download_path = settings.get('download_path', '')
+    if not download_path:
+        print("Папка загрузок не задана: укажите --dest или настройте её в GUI", file=sys.stderr)
+        return 2
+
+    spec = dict(settings)
+    spec['query'] = args.query if args.query is not None else ''
+    parallelism = args.parallel or int(settings.get('download_parallelism', 3))
+    bandwidth = args.limit_kbps if args.limit_kbps is not None else int(settings.get('download_bandwidth_kbps', 0))
+    report = sync_collection(
+        spec,
+        download_path,
+        max_pages=args.max_pages,
+        parallelism=parallelism,
+        bandwidth_kbps=bandwidth,
+        on_progress=print_download_progress,
+        dry_run=args.dry_run,
+    )
+    if report['new'] and not args.dry_run:
+        sys.stderr.write("\n")
+    sys.stdout.write(json.dumps(report, ensure_ascii=False) + "\n")
+    return 1 if report['failed'] else 0
+
+
+def cmd_warmup(args):
+    """Готовит миниатюры для всей библиотеки в пуле процессов."""
+    settings = build_settings(args)
+    download_path = settings.get('download_path', '')
+    if not download_path or not os.path.isdir(download_path):
+        print(f"Папка загрузок не найдена: {download_path}", file=sys.stderr)
+        return 2
+
+    def on_progress(done, total):
+        sys.stderr.write(f"\rМиниатюры {done}/{total}   ")
+        sys.stderr.flush()
+
+    report = warm_library(download_path, workers=args.workers, on_progress=on_progress)
+    if report['generated'] or report['failed']:
+        sys.stderr.write("\n")
+    sys.stdout.write(json.dumps(report, ensure_ascii=False) + "\n")
+    return 1 if report['failed'] else 0
+
+
+def cmd_colors(args):
+    """Ищет в библиотеке обои, близкие к цветам или к палитре других обоев."""
+    try:
+        from wallhaven_viewer.color_index import ColorIndex, parse_colors
+    except ImportError:
+        print("Для поиска по цвету установите NumPy: pip install numpy", file=sys.stderr)
+        return 2
+
+    settings = build_settings(args)
+    download_path = settings.get('download_path', '')
+    if not download_path or not os.path.isdir(download_path):
+        print(f"Папка загрузок не найдена: {download_path}", file=sys.stderr)
+        return 2
+
+    colors = parse_colors(" ".join(args.colors))
+    if not colors and not args.similar:
+        print("Укажите цвета в формате #rrggbb или --similar ID", file=sys.stderr)
+        return 2
+
+    def on_progress(done, total):
+        sys.stderr.write(f"\rЦветовой индекс {done}/{total}   ")
+        sys.stderr.flush()
+
+    index = ColorIndex.load()
+    if index.update(download_path, workers=args.workers, on_progress=on_progress):
+        sys.stderr.write("\n")
+        index.save()
+
+    started = time.perf_counter()
+    if args.similar:
+        matches = index.query_similar(args.similar, args.limit)
+    else:
+        matches = index.query_colors(colors, args.limit)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"Поиск по {len(index.ids)} обоям: {elapsed_ms:.1f} мс", file=sys.stderr)
+
+    library = scan_library(download_path)
+    for w_id, score in matches:
+        record = {'id': w_id, 'path': library.get(w_id), 'score': round(score, 4)}
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return 0
+
+
+def cmd_recompress(args):
+    """Пересжимает библиотеку без потерь; с --dry-run только считает экономию."""
+    from wallhaven_viewer.recompress import (
+        recompress_library, has_webp_support, has_jpegtran, webp_viewable)
+
+    settings = build_settings(args)
+    download_path = settings.get('download_path', '')
+    if not download_path or not os.path.isdir(download_path):
+        print(f"Папка загрузок не найдена: {download_path}", file=sys.stderr)
+        return 2
+
+    webp = not args.no_webp
+    if webp and not has_webp_support():
+        print("PNG → WebP пропущен: установите Pillow с поддержкой WebP", file=sys.stderr)
+        webp = False
+    if webp and not webp_viewable():
+        print("PNG → WebP пропущен: GdkPixbuf не умеет открывать WebP (webp-pixbuf-loader)", file=sys.stderr)
+        webp = False
+    jpeg = not args.no_jpeg
+    if jpeg and not has_jpegtran():
+        print("Оптимизация JPEG пропущена: jpegtran не найден (libjpeg-turbo-progs)", file=sys.stderr)
+        jpeg = False
+
+    def on_progress(done, total):
+        sys.stderr.write(f"\rПересжатие {done}/{total}   ")
+        sys.stderr.flush()
+
+    # Текущие обои не переименовываем: на них ссылаются настройки и рабочий стол
+    keep_paths = (settings.get('wallpaper_source', ''), settings.get('wallpaper_applied', ''))
+    report = recompress_library(download_path, workers=args.workers, dry_run=args.dry_run,
+                                webp=webp, jpeg=jpeg, on_progress=on_progress, keep_paths=keep_paths)
+    if report['saved'] or report['kept'] or report['failed']:
+        sys.stderr.write("\n")
+    saved_mb = (report['bytes_before'] - report['bytes_after']) / (1024 * 1024)
+    action = "можно сэкономить" if args.dry_run else "сэкономлено"
+    print(f"{report['saved']} файлов, {action} {saved_mb:.1f} МБ", file=sys.stderr)
+    sys.stdout.write(json.dumps(report, ensure_ascii=False) + "\n")
+    return 1 if report['failed'] else 0
+
+
+def resolve_collection(name, settings):
+    """
+    Возвращает ID коллекции по ID или названию (название ищется в списке
+    коллекций: сначала в API, при его недоступности — в кэше).
+    """
+    if str(name).isdigit():
+        return str(name)
+    from wallhaven_viewer.collections_cache import load_collection_list, fetch_collection_list
+
+    collections = fetch_collection_list(settings)
+    if collections is None:
+        collections = load_collection_list(settings.get('username', ''))
+    for collection in collections:
+        if collection.get('label', '').lower() == str(name).lower():
+            return str(collection['id'])
+    return None
+
+
+def cmd_rotate(args):
+    """Меняет обои по расписанию из библиотеки, сохранённого поиска или коллекции."""
+    from wallhaven_viewer.rotation import (RotationService, LibrarySource, SearchSource, CollectionSource,
+                                           parse_interval)
+
+    settings = build_settings(args)
+    download_path = settings.get('download_path', '')
+    if not download_path:
+        print("Папка загрузок не задана: укажите --dest или настройте её в GUI", file=sys.stderr)
+        return 2
+
+    if args.source == "search":
+        spec = dict(settings)
+        spec['query'] = args.query if args.query is not None else settings.get('last_query', '')
+        os.makedirs(download_path, exist_ok=True)
+        source = SearchSource(spec, download_path)
+    elif args.source == "collection":
+        username = settings.get('username', '')
+        if not username or not args.collection:
+            print("Для --source collection нужны --username (или имя в настройках GUI) и --collection",
+                  file=sys.stderr)
+            return 2
+        collection_id = resolve_collection(args.collection, settings)
+        if collection_id is None:
+            print(f"Коллекция не найдена: {args.collection}", file=sys.stderr)
+            return 2
+        os.makedirs(download_path, exist_ok=True)
+        source = CollectionSource(settings, username, collection_id, download_path)
+    else:
+        source = LibrarySource(download_path)
+
+    screen_size = None
+    if args.screen:
+        try:
+            width, height = (int(v) for v in args.screen.lower().split("x"))
+            screen_size = (width, height)
+        except ValueError:
+            print(f"Неверный размер экрана: {args.screen} (ожидается, например, 1920x1080)", file=sys.stderr)
+            return 2
+
+    def on_applied(w_id, path):
+        sys.stdout.write(json.dumps({'id': w_id, 'path': path, 'time': int(time.time())}, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+    service = RotationService(source, parse_interval(args.interval), screen_size, args.fit, on_applied)
+    service.run(once=args.once)
+    return 0
+
+
+def add_search_options(parser, paging=True):
+    """Добавляет общие параметры поиска к подкоманде."""
+    if paging:
+        parser.add_argument("--page", type=int, default=1, help="первая страница (по умолчанию 1)")
+        parser.add_argument("--pages", type=int, default=1, help="сколько страниц пройти, 0 — все")
+    parser.add_argument("--sort", choices=SORT_MODES, help="сортировка")
+    parser.add_argument("--categories", help="флаги категорий general/anime/people, например 110")
+    parser.add_argument("--purity", help="флаги purity sfw/sketchy/nsfw, например 100")
+    parser.add_argument("--api-key", help="API-ключ Wallhaven")
+
+
+def build_parser():
+    """Создаёт парсер аргументов консольного режима."""
+    parser = argparse.ArgumentParser(prog="wallhaven-viewer", description="Wallhaven Viewer — консольный режим")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_search = sub.add_parser("search", help="поиск, результаты в JSON Lines")
+    p_search.add_argument("query", nargs="?", help="поисковый запрос (по умолчанию — последний из GUI)")
+    add_search_options(p_search)
+    p_search.set_defaults(func=cmd_search)
+
+    p_download = sub.add_parser("download", help="параллельная загрузка обоев")
+    p_download.add_argument("ids", nargs="*", help="ID обоев")
+    p_download.add_argument("--query", help="скачать результаты этого поиска")
+    p_download.add_argument("--dest", help="папка загрузок (по умолчанию — из настроек)")
+    p_download.add_argument("--parallel", type=int, help="число одновременных загрузок")
+    p_download.add_argument("--limit-kbps", type=int, help="общий лимит скорости, КБ/с")
+    p_download.add_argument("--journal", action="store_true", help="вести журнал и продолжать прерванные загрузки")
+    add_search_options(p_download)
+    p_download.set_defaults(func=cmd_download)
+
+    p_scan = sub.add_parser("scan", help="индекс папки загрузок в JSON Lines")
+    p_scan.add_argument("--dest", help="папка загрузок (по умолчанию — из настроек)")
+    p_scan.add_argument("--meta", action="store_true", help="добавить метаданные и теги из sidecar")
+    p_scan.set_defaults(func=cmd_scan)
+
+    p_sync = sub.add_parser("sync", help="инкрементальное зеркалирование выдачи в папку")
+    p_sync.add_argument("query", nargs="?", help="поисковый запрос (пустой — вся выдача, например toplist)")
+    p_sync.add_argument("--dest", help="папка зеркала (по умолчанию — папка загрузок из настроек)")
+    p_sync.add_argument("--max-pages", type=int, default=0, help="ограничение числа страниц, 0 — без ограничения")
+    p_sync.add_argument("--parallel", type=int, help="число одновременных загрузок")
+    p_sync.add_argument("--limit-kbps", type=int, help="общий лимит скорости, КБ/с")
+    p_sync.add_argument("--dry-run", action="store_true", help="только посчитать новые обои")
+    add_search_options(p_sync, paging=False)
+    p_sync.set_defaults(func=cmd_sync)
+
+    p_warmup = sub.add_parser("warmup", help="подготовить миниатюры библиотеки (все ядра)")
+    p_warmup.add_argument("--dest", help="папка загрузок (по умолчанию — из настроек)")
+    p_warmup.add_argument("--workers", type=int, help="число процессов (по умолчанию — число ядер)")
+    p_warmup.set_defaults(func=cmd_warmup)
+
+    p_colors = sub.add_parser("colors", help="поиск по цвету в библиотеке (нужен NumPy)")
+    p_colors.add_argument("colors", nargs="*", help="цвета #rrggbb; для нескольких учитывается ближайший")
+    p_colors.add_argument("--similar", metavar="ID", help="обои с палитрой, похожей на эти обои")
+    p_colors.add_argument("--limit", type=int, default=50, help="сколько результатов вывести")
+    p_colors.add_argument("--dest", help="папка загрузок (по умолчанию — из настроек)")
+    p_colors.add_argument("--workers", type=int, help="число процессов для обновления индекса")
+    p_colors.set_defaults(func=cmd_colors)
+
+    p_recompress = sub.add_parser("recompress", help="пересжать библиотеку без потерь (все ядра)")
+    p_recompress.add_argument("--dry-run", action="store_true", help="только посчитать экономию места")
+    p_recompress.add_argument("--no-webp", action="store_true", help="не перекодировать PNG в WebP")
+    p_recompress.add_argument("--no-jpeg", action="store_true", help="не оптимизировать JPEG (jpegtran)")
+    p_recompress.add_argument("--dest", help="папка загрузок (по умолчанию — из настроек)")
+    p_recompress.add_argument("--workers", type=int, help="число процессов (по умолчанию — число ядер)")
+    p_recompress.set_defaults(func=cmd_recompress)
+
+    p_rotate = sub.add_parser("rotate", help="смена обоев по расписанию (без главного окна)")
+    p_rotate.add_argument("query", nargs="?", help="запрос для --source search (по умолчанию — последний из GUI)")
+    p_rotate.add_argument("--source", choices=("library", "search", "collection"), default="library",
+                          help="откуда брать обои: библиотека, поиск или коллекция Wallhaven")
+    p_rotate.add_argument("--collection", metavar="ID", help="ID или название коллекции для --source collection")
+    p_rotate.add_argument("--username", help="владелец коллекции (по умолчанию — из настроек)")
+    p_rotate.add_argument("--interval", default="30m", help="интервал смены: 90s, 15m, 2h, 1d (по умолчанию 30m)")
+    p_rotate.add_argument("--screen", metavar="WxH", help="подгонять обои под экран этого размера")
+    p_rotate.add_argument("--fit", choices=("fill", "fit"), default="fill",
+                          help="режим подгонки: заполнить с обрезкой или вписать целиком")
+    p_rotate.add_argument("--once", action="store_true", help="сменить обои один раз и выйти")
+    p_rotate.add_argument("--dest", help="папка загрузок (по умолчанию — из настроек)")
+    add_search_options(p_rotate, paging=False)
+    p_rotate.set_defaults(func=cmd_rotate)
+
+    return parser
+
+
+def main(argv=None):
+    """Точка входа консольного режима."""
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        return 0
+    except Exception as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    finally:
+        # Теги из ответов API пополняют словарь автодополнения GUI
+        save_tag_index()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
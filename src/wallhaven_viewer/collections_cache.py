@@ -0,0 +1,249 @@
+"""
+Модуль локального кэша коллекций Wallhaven.
+
+Кэш хранит список коллекций пользователя и для каждой коллекции —
+уже полученный префикс её содержимого (в порядке API). При открытии
+коллекции запрашивается только первая страница: если она и общее число
+обоев не изменились, остальные страницы берутся из кэша без запросов.
+Если изменились — страницы запрашиваются, пока новое начало не сойдётся
+со старым содержимым (добавления и удаления в начале коллекции), а хвост
+берётся из кэша.
+
+Не зависит от GTK.
+"""
+
+import os
+import json
+import time
+import threading
+
+from wallhaven_viewer.api import WallhavenAPI
+from wallhaven_viewer.utils import get_cache_dir
+
+# Версия формата файлов кэша; файлы другой версии игнорируются
+COLLECTIONS_VERSION = 1
+# Размер страницы API по умолчанию (если meta его не сообщила)
+DEFAULT_PER_PAGE = 24
+
+
+def get_collections_dir():
+    """Возвращает папку кэша коллекций или None."""
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return None
+    collections_dir = os.path.join(cache_dir, "index", "collections")
+    os.makedirs(collections_dir, exist_ok=True)
+    return collections_dir
+
+
+def _write_json(path, data):
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Ошибка записи кэша коллекций {path}: {e}")
+
+
+def _read_json(path):
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if data.get('version') == COLLECTIONS_VERSION else None
+    except Exception as e:
+        print(f"Ошибка чтения кэша коллекций {path}: {e}")
+        return None
+
+
+def _list_path(username):
+    collections_dir = get_collections_dir()
+    return os.path.join(collections_dir, f"{username or '_'}.json") if collections_dir else None
+
+
+def load_collection_list(username):
+    """Возвращает закэшированный список коллекций пользователя (может быть пустым)."""
+    data = _read_json(_list_path(username))
+    return data.get('collections', []) if data else []
+
+
+def fetch_collection_list(settings):
+    """
+    Запрашивает список коллекций у API и обновляет кэш.
+
+    Returns:
+        list or None: Коллекции или None, если API недоступен (кэш не меняется).
+    """
+    collections = WallhavenAPI.list_collections(settings)
+    path = _list_path(settings.get('username', ''))
+    if collections is not None and path:
+        _write_json(path, {'version': COLLECTIONS_VERSION, 'collections': collections})
+    return collections
+
+
+def item_from_api(w):
+    """Сжимает запись обоев из ответа API до полей, нужных сетке."""
+    thumbs = w.get("thumbs", {})
+    return {
+        'id': w.get("id"),
+        'thumb': thumbs.get("large") or thumbs.get("original"),
+        'path': w.get("path"),
+        'color': (w.get("colors") or [None])[0],
+    }
+
+
+class CollectionCache:
+    """
+    Кэш содержимого одной коллекции с инкрементальной ревалидацией.
+
+    Args:
+        username (str): Владелец коллекции.
+        collection_id (int): ID коллекции.
+        purity (str): Фильтр purity (у разных фильтров разное содержимое).
+        items (list): Закэшированный префикс коллекции (словари `item_from_api`).
+        total (int, optional): Число обоев в коллекции по последнему ответу API.
+        per_page (int): Размер страницы API.
+    """
+
+    def __init__(self, username, collection_id, purity, items=None, total=None, per_page=DEFAULT_PER_PAGE):
+        self.username = username
+        self.collection_id = collection_id
+        self.purity = purity
+        self.items = list(items or [])
+        self.total = total
+        self.per_page = per_page
+        self.checked = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        collections_dir = get_collections_dir()
+        if not collections_dir:
+            return None
+        return os.path.join(collections_dir, f"{self.username}-{self.collection_id}-{self.purity}.json")
+
+    @property
+    def complete(self):
+        """True, если в кэше вся коллекция."""
+        return self.total is not None and len(self.items) >= self.total
+
+    @classmethod
+    def load(cls, username, collection_id, purity):
+        """Загружает кэш коллекции; при отсутствии или ошибке — пустой."""
+        cache = cls(username, collection_id, purity)
+        data = _read_json(cache.path)
+        if data:
+            cache.items = data.get('items', [])
+            cache.total = data.get('total')
+            cache.per_page = data.get('per_page', DEFAULT_PER_PAGE)
+            cache.checked = data.get('checked', 0.0)
+        return cache
+
+    def save(self):
+        """Атомарно сохраняет кэш коллекции."""
+        path = self.path
+        if not path:
+            return
+        with self._lock:
+            data = {
+                'version': COLLECTIONS_VERSION,
+                'items': self.items,
+                'total': self.total,
+                'per_page': self.per_page,
+                'checked': self.checked,
+            }
+        _write_json(path, data)
+
+    def _fetch(self, page, settings):
+        data, meta = WallhavenAPI.get_collection_page(self.username, self.collection_id, page, settings)
+        if data is None:
+            return None, None
+        meta = meta or {}
+        per_page = int(meta.get('per_page') or self.per_page)
+        return [item_from_api(w) for w in data if w.get('id')], {
+            'total': int(meta.get('total', len(data))),
+            'last_page': int(meta.get('last_page', page)),
+            'per_page': per_page,
+        }
+
+    def revalidate(self, settings):
+        """
+        Сверяет кэш с API, запрашивая страницы с начала коллекции, пока новое
+        содержимое не сойдётся с закэшированным.
+
+        Returns:
+            bool or None: True — содержимое изменилось, False — кэш актуален,
+            None — API недоступен (используется кэш как есть).
+        """
+        fetched = []
+        page = 1
+        while True:
+            data, meta = self._fetch(page, settings)
+            if data is None:
+                return None
+            fetched.extend(data)
+            with self._lock:
+                old_ids = [item['id'] for item in self.items]
+                old_total = self.total
+                merged = self._merge(fetched, old_ids, meta['total'])
+                # Без схождения на длине старого кэша он бесполезен — начинаем заново
+                if merged is not None or page >= meta['last_page'] or len(fetched) >= len(old_ids):
+                    new_items = merged if merged is not None else fetched
+                    changed = (meta['total'] != old_total
+                               or [item['id'] for item in new_items] != old_ids[:len(new_items)])
+                    self.items = new_items
+                    self.total = meta['total']
+                    self.per_page = meta['per_page']
+                    self.checked = time.time()
+                    return changed
+            page += 1
+
+    def _merge(self, fetched, old_ids, total):
+        # Первый из новых обоев, который есть в кэше, — точка схождения
+        position = {w_id: i for i, w_id in enumerate(old_ids)}
+        for k, item in enumerate(fetched):
+            j = position.get(item['id'])
+            if j is None:
+                continue
+            tail = [w['id'] for w in fetched[k:]]
+            if tail != old_ids[j:j + len(tail)]:
+                # Порядок внутри страницы изменился — нужна следующая страница
+                return None
+            merged = fetched[:k] + self.items[j:]
+            # Полный кэш должен дать ровно total обоев, иначе были изменения дальше
+            if self.total is not None and len(self.items) >= self.total and len(merged) != total:
+                return None
+            return merged[:total]
+        return None
+
+    def get_page(self, page, settings):
+        """
+        Возвращает страницу коллекции: из кэша, если она там есть, иначе из API
+        (полученные обои дописываются в кэш).
+
+        Returns:
+            tuple: (список записей, есть_ли_ещё_страницы) или (None, False) при ошибке.
+        """
+        while True:
+            with self._lock:
+                start = (page - 1) * self.per_page
+                end = start + self.per_page
+                if len(self.items) >= end or self.complete:
+                    more = end < (self.total if self.total is not None else len(self.items))
+                    return self.items[start:end], more
+                # Следующая страница API, содержащая первые недостающие обои
+                api_page = len(self.items) // self.per_page + 1
+                offset = (api_page - 1) * self.per_page
+            data, meta = self._fetch(api_page, settings)
+            if data is None:
+                return None, False
+            with self._lock:
+                added = data[len(self.items) - offset:]
+                self.items.extend(added)
+                self.total = meta['total']
+                self.per_page = meta['per_page']
+                if not added or api_page >= meta['last_page']:
+                    # Коллекция короче, чем ожидалось: всё, что есть, уже в кэше
+                    self.total = len(self.items)
@@ -0,0 +1,265 @@
+"""
+Модуль цветового индекса локальной библиотеки на NumPy.
+
+Для каждой миниатюры библиотеки (см. `thumbnailer`) считается гистограмма
+палитры: цвета квантуются в BINS_PER_CHANNEL³ ячеек. Гистограммы всей
+библиотеки хранятся одной матрицей в .npz, поэтому запрос «обои, близкие
+к цвету/палитре» — одно матричное умножение по всей библиотеке.
+
+Не зависит от GTK в главном процессе.
+"""
+
+import os
+import re
+
+import numpy as np
+
+from wallhaven_viewer.library import scan_library, get_tile_path, is_tile_fresh
+from wallhaven_viewer.utils import get_cache_dir, process_pool
+from wallhaven_viewer.thumbnailer import warm_library
+
+# Квантование: 4 уровня на канал → 64 ячейки палитры
+BINS_PER_CHANNEL = 4
+BINS = BINS_PER_CHANNEL ** 3
+# Ширина гауссова ядра близости цветов (в единицах RGB 0..255)
+COLOR_SIGMA = 48.0
+# Шаг прореживания пикселей миниатюры при подсчёте гистограммы
+PIXEL_STEP = 4
+INDEX_FILE = "color_index.npz"
+
+_HEX_RE = re.compile(r"#?([0-9a-fA-F]{6})\b")
+
+
+def get_index_path():
+    """
+    Возвращает путь к файлу цветового индекса или None.
+
+    Индекс лежит в подпапке кэша, чтобы его не удаляла `clean_cache`.
+    """
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return None
+    index_dir = os.path.join(cache_dir, "index")
+    os.makedirs(index_dir, exist_ok=True)
+    return os.path.join(index_dir, INDEX_FILE)
+
+
+def get_bin_centers():
+    """Возвращает центры ячеек палитры, массив (BINS, 3) в RGB."""
+    step = 256 / BINS_PER_CHANNEL
+    levels = (np.arange(BINS_PER_CHANNEL) + 0.5) * step
+    r, g, b = np.meshgrid(levels, levels, levels, indexing="ij")
+    return np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1).astype(np.float32)
+
+
+def parse_colors(text):
+    """
+    Извлекает цвета вида #rrggbb из строки запроса.
+
+    Returns:
+        list: Кортежи (r, g, b); пустой список, если цветов нет.
+    """
+    colors = []
+    for match in _HEX_RE.finditer(text or ""):
+        value = int(match.group(1), 16)
+        colors.append(((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF))
+    return colors
+
+
+def load_rgb(path):
+    """Загружает изображение в массив (H, W, 3) uint8 (Pillow или GdkPixbuf)."""
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+    if Image is not None:
+        with Image.open(path) as img:
+            return np.asarray(img.convert("RGB"))
+
+    import gi
+    gi.require_version("GdkPixbuf", "2.0")
+    from gi.repository import GdkPixbuf
+
+    pixbuf = GdkPixbuf.Pixbuf.new_from_file(path)
+    channels = pixbuf.get_n_channels()
+    rowstride = pixbuf.get_rowstride()
+    height, width = pixbuf.get_height(), pixbuf.get_width()
+    data = np.frombuffer(pixbuf.get_pixels(), dtype=np.uint8)
+    rows = np.lib.stride_tricks.as_strided(data, shape=(height, width, channels),
+                                           strides=(rowstride, channels, 1))
+    return np.array(rows[:, :, :3])
+
+
+def compute_histogram(tile_path):
+    """
+    Считает нормированную гистограмму палитры миниатюры (в рабочем процессе).
+
+    Returns:
+        numpy.ndarray or None: Вектор (BINS,) float32 с суммой 1.
+    """
+    try:
+        pixels = load_rgb(tile_path)[::PIXEL_STEP, ::PIXEL_STEP].reshape(-1, 3)
+        q = (pixels.astype(np.uint16) * BINS_PER_CHANNEL) // 256
+        bins = (q[:, 0] * BINS_PER_CHANNEL + q[:, 1]) * BINS_PER_CHANNEL + q[:, 2]
+        hist = np.bincount(bins, minlength=BINS).astype(np.float32)
+        return hist / max(1.0, hist.sum())
+    except Exception as e:
+        print(f"Ошибка анализа цвета {tile_path}: {e}")
+        return None
+
+
+class ColorIndex:
+    """
+    Цветовой индекс библиотеки: ID обоев, время изменения оригинала
+    и матрица гистограмм (N, BINS).
+
+    Файлы, для которых не удалось получить миниатюру или гистограмму,
+    запоминаются в `failed` (ID → время изменения) и не пересчитываются,
+    пока файл не изменится.
+    """
+
+    def __init__(self, ids=None, mtimes=None, histograms=None, failed=None):
+        self.ids = list(ids) if ids is not None else []
+        self.mtimes = np.asarray(mtimes if mtimes is not None else [], dtype=np.float64)
+        self.histograms = (np.asarray(histograms, dtype=np.float32) if histograms is not None
+                           else np.zeros((0, BINS), dtype=np.float32))
+        self.failed = dict(failed or {})
+        self._bin_centers = get_bin_centers()
+
+    @classmethod
+    def load(cls, path=None):
+        """Загружает индекс с диска; при отсутствии или ошибке — пустой индекс."""
+        path = path or get_index_path()
+        if not path or not os.path.exists(path):
+            return cls()
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if data['histograms'].shape[1:] != (BINS,):
+                    return cls()
+                failed = {}
+                if 'failed_ids' in data.files:
+                    failed = dict(zip(data['failed_ids'].tolist(), data['failed_mtimes'].tolist()))
+                return cls(data['ids'].tolist(), data['mtimes'], data['histograms'], failed)
+        except Exception as e:
+            print(f"Ошибка чтения цветового индекса {path}: {e}")
+            return cls()
+
+    def save(self, path=None):
+        """Атомарно сохраняет индекс в .npz."""
+        path = path or get_index_path()
+        if not path:
+            return
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(tmp_path, ids=np.array(self.ids, dtype=str),
+                            mtimes=self.mtimes, histograms=self.histograms,
+                            failed_ids=np.array(list(self.failed), dtype=str),
+                            failed_mtimes=np.array(list(self.failed.values()), dtype=np.float64))
+        os.replace(tmp_path, path)
+
+    def update(self, download_path, workers=None, on_progress=None, library=None):
+        """
+        Приводит индекс в соответствие с библиотекой: удаляет пропавшие файлы,
+        досчитывает новые и изменённые (миниатюры готовятся заранее).
+
+        Args:
+            library (dict, optional): Готовый результат `scan_library`, чтобы
+                не сканировать папку повторно.
+
+        Returns:
+            int: Сколько записей индекса добавлено, пересчитано или удалено.
+        """
+        if library is None:
+            library = scan_library(download_path)
+        mtimes = {}
+        for w_id, path in library.items():
+            try:
+                mtimes[w_id] = os.path.getmtime(path)
+            except OSError:
+                continue
+
+        known = {w_id: i for i, w_id in enumerate(self.ids)}
+        keep = [i for w_id, i in known.items() if w_id in mtimes and self.mtimes[i] >= mtimes[w_id]]
+        stale = [w_id for w_id in mtimes
+                 if (w_id not in known or self.mtimes[known[w_id]] < mtimes[w_id])
+                 and self.failed.get(w_id, -1.0) < mtimes[w_id]]
+        failed = {w_id: mtime for w_id, mtime in self.failed.items()
+                  if w_id in mtimes and mtime >= mtimes[w_id]}
+
+        removed = len(self.ids) - len(keep) - sum(1 for w_id in stale if w_id in known)
+        removed += len(self.failed) - len(failed)
+        ids = [self.ids[i] for i in keep]
+        kept_mtimes = [self.mtimes[i] for i in keep]
+        histograms = [self.histograms[keep]] if keep else []
+
+        if stale:
+            warm_library(download_path, workers=workers)
+            jobs = []
+            for w_id in stale:
+                tile = get_tile_path(w_id)
+                if tile and is_tile_fresh(tile, library[w_id]):
+                    jobs.append((w_id, tile))
+                else:
+                    failed[w_id] = mtimes[w_id]
+            new_rows = []
+            with process_pool(workers) as pool:
+                results = pool.map(compute_histogram, [tile for _w_id, tile in jobs], chunksize=64)
+                for done, ((w_id, _tile), hist) in enumerate(zip(jobs, results), 1):
+                    if hist is not None:
+                        ids.append(w_id)
+                        kept_mtimes.append(mtimes[w_id])
+                        new_rows.append(hist)
+                    else:
+                        failed[w_id] = mtimes[w_id]
+                    if on_progress:
+                        on_progress(done, len(jobs))
+            if new_rows:
+                histograms.append(np.stack(new_rows))
+
+        self.ids = ids
+        self.failed = failed
+        self.mtimes = np.asarray(kept_mtimes, dtype=np.float64)
+        self.histograms = np.concatenate(histograms) if histograms else np.zeros((0, BINS), dtype=np.float32)
+        return len(stale) + removed
+
+    def query_colors(self, colors, limit=100):
+        """
+        Находит обои, в палитре которых больше всего цветов, близких к заданным.
+
+        Args:
+            colors (list): Цвета (r, g, b); для нескольких цветов учитывается ближайший.
+            limit (int): Сколько результатов вернуть.
+
+        Returns:
+            list: Пары (wallpaper_id, score) по убыванию score (0..1).
+        """
+        if not colors or not self.ids:
+            return []
+        targets = np.asarray(colors, dtype=np.float32)
+        # Близость каждой ячейки палитры к ближайшему из цветов запроса: (BINS,)
+        dist2 = ((self._bin_centers[:, None, :] - targets[None, :, :]) ** 2).sum(axis=2)
+        weights = np.exp(-dist2 / (2 * COLOR_SIGMA ** 2)).max(axis=1)
+        scores = self.histograms @ weights
+        return self._top(scores, limit)
+
+    def query_similar(self, wallpaper_id, limit=100):
+        """
+        Находит обои с похожей палитрой (пересечение гистограмм).
+
+        Returns:
+            list: Пары (wallpaper_id, score) по убыванию score, без самого образца.
+        """
+        try:
+            row = self.ids.index(wallpaper_id)
+        except ValueError:
+            return []
+        scores = np.minimum(self.histograms, self.histograms[row]).sum(axis=1)
+        scores[row] = -1.0
+        return self._top(scores, limit)
+
+    def _top(self, scores, limit):
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[i], float(scores[i])) for i in top if scores[i] >= 0]
@@ -0,0 +1,9 @@
+"""
+Список подкоманд консольного режима.
+
+Вынесен из `cli` без зависимостей: `__main__` проверяет по нему argv,
+не импортируя консольный режим при запуске GUI.
+"""
+
+# Подкоманды, по которым `python -m wallhaven_viewer` выбирает консольный режим
+COMMANDS = ("search", "download", "scan", "sync", "warmup", "colors", "rotate", "recompress")
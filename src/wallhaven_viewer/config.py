@@ -3,12 +3,16 @@
 """
 
 import os
+import threading
 import configparser
-from gi.repository import GLib
+from wallhaven_viewer.utils import get_user_config_dir
 
-# API константы
-API_URL = "https://wallhaven.cc/api/v1/search"
-WALLPAPER_API_URL = "https://wallhaven.cc/api/v1/w"
+# API константы. Базовый адрес переопределяется переменной окружения
+# WALLHAVEN_API_BASE (например, для бенчмарков с локальным сервером).
+API_BASE = os.environ.get("WALLHAVEN_API_BASE", "https://wallhaven.cc/api/v1").rstrip("/")
+API_URL = f"{API_BASE}/search"
+WALLPAPER_API_URL = f"{API_BASE}/w"
+COLLECTIONS_API_URL = f"{API_BASE}/collections"
 
 # Опции разрешений
 RESOLUTION_OPTIONS = [
@@ -39,6 +43,8 @@ SORT_OPTIONS = ["Relevance", "Random", "Date Added", "Views", "Favorites", "Topl
 # Настройки по умолчанию
 DEFAULT_SETTINGS = {
     'api_key': '',
+    # Имя пользователя Wallhaven: нужно для просмотра коллекций
+    'username': '',
     'download_path': '',
     'columns': '4',
     'last_query': '',
@@ -50,16 +56,28 @@ DEFAULT_SETTINGS = {
     'purity_nsfw': 'false',
     'sort_index': '5',
     'resolution_index': '0',
-    'ratio_index': '0'
+    'ratio_index': '0',
+    'download_parallelism': '3',
+    'download_bandwidth_kbps': '0',
+    # Подгонка обоев под экран (см. rendition.FIT_MODES)
+    'wallpaper_fit': 'original',
+    # Последние установленные обои: оригинал и файл, переданный рабочему столу
+    'wallpaper_source': '',
+    'wallpaper_applied': ''
 }
 
 
-def get_config_path():
-    """Возвращает путь к config.ini в папке ~/.config пользователя."""
-    config_dir = os.path.join(GLib.get_user_config_dir(), "wallhaven-viewer")
+def get_config_dir():
+    """Возвращает путь к папке настроек приложения в ~/.config пользователя."""
+    config_dir = os.path.join(get_user_config_dir(), "wallhaven-viewer")
     if not os.path.exists(config_dir):
         os.makedirs(config_dir, exist_ok=True)
-    return os.path.join(config_dir, "config.ini")
+    return config_dir
+
+
+def get_config_path():
+    """Возвращает путь к config.ini в папке ~/.config пользователя."""
+    return os.path.join(get_config_dir(), "config.ini")
 
 
 def load_settings():
@@ -86,12 +104,84 @@ def save_settings(settings_dict):
     """
     Сохраняет переданный словарь настроек в INI-файл.
 
+    Запись атомарная: файл пишется во временный и переименовывается,
+    поэтому при аварийном завершении config.ini не остаётся обрезанным.
+
     Args:
         settings_dict (dict): Словарь настроек, которые необходимо сохранить.
     """
+    with _write_lock:
+        _write_settings_file(settings_dict)
+
+
+def _write_settings_file(settings_dict):
+    """Атомарно записывает config.ini (вызывается под _write_lock)."""
     config = configparser.ConfigParser()
     config['Settings'] = {k: v for k, v in settings_dict.items() if k in DEFAULT_SETTINGS}
     config_path = get_config_path()
-    with open(config_path, 'w') as configfile:
+    tmp_path = config_path + '.tmp'
+    with open(tmp_path, 'w') as configfile:
         config.write(configfile)
+    os.replace(tmp_path, config_path)
+
+
+# Задержка отложенной записи настроек, секунд
+SAVE_DELAY = 0.5
+
+_write_lock = threading.Lock()
+_pending_lock = threading.Lock()
+_pending_settings = None
+_pending_timer = None
+# Номера снимков: последний взятый на запись (под _pending_lock) и последний записанный (под _write_lock)
+_snapshot_seq = 0
+_written_seq = 0
 
+
+def save_settings_async(settings_dict, delay=SAVE_DELAY):
+    """
+    Откладывает запись настроек и выполняет её в фоновом потоке.
+
+    Несколько вызовов подряд в пределах `delay` объединяются в одну запись
+    последнего состояния, поэтому главный поток не ждёт диск.
+
+    Args:
+        settings_dict (dict): Словарь настроек.
+        delay (float): Задержка перед записью, секунд.
+    """
+    global _pending_settings, _pending_timer
+    with _pending_lock:
+        _pending_settings = dict(settings_dict)
+        if _pending_timer is not None:
+            _pending_timer.cancel()
+        _pending_timer = threading.Timer(delay, flush_settings)
+        _pending_timer.daemon = True
+        _pending_timer.start()
+
+
+def flush_settings():
+    """
+    Немедленно записывает отложенные настройки (например, при закрытии окна).
+
+    Снимок берётся под `_pending_lock`, а запись идёт только под `_write_lock`,
+    поэтому `save_settings_async` в главном потоке не ждёт диск. Снимки
+    нумеруются: более старый не перезапишет уже записанный новый. Если
+    снимка нет, функция всё равно дожидается записи, начатой таймером.
+    """
+    global _pending_settings, _pending_timer, _snapshot_seq, _written_seq
+    with _pending_lock:
+        settings_dict = _pending_settings
+        _pending_settings = None
+        if _pending_timer is not None:
+            _pending_timer.cancel()
+            _pending_timer = None
+        if settings_dict is not None:
+            _snapshot_seq += 1
+            seq = _snapshot_seq
+    with _write_lock:
+        if settings_dict is None or seq < _written_seq:
+            return
+        try:
+            _write_settings_file(settings_dict)
+            _written_seq = seq
+        except Exception as e:
+            print(f"Ошибка сохранения настроек: {e}")
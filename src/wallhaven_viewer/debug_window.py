@@ -0,0 +1,114 @@
+"""
+Модуль окна «Диагностика»: сводка метрик и экспорт трасс.
+"""
+
+import gi
+gi.require_version("Gtk", "4.0")
+from gi.repository import Gtk, GLib
+
+from wallhaven_viewer import metrics, stall_monitor
+
+
+class DiagnosticsWindow(Gtk.Window):
+    """
+    Окно со сводкой метрик: задержки API, загрузки и декодирования миниатюр,
+    попадания в кэш, длины очередей и зависания главного цикла.
+
+    Args:
+        parent (Gtk.Window): Родительское окно.
+    """
+
+    def __init__(self, parent):
+        super().__init__(title="Диагностика")
+        self.set_transient_for(parent)
+        self.set_default_size(720, 480)
+
+        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        vbox.set_margin_start(12)
+        vbox.set_margin_end(12)
+        vbox.set_margin_top(12)
+        vbox.set_margin_bottom(12)
+        self.set_child(vbox)
+
+        self.text_view = Gtk.TextView(editable=False, monospace=True, cursor_visible=False)
+        scrolled = Gtk.ScrolledWindow(vexpand=True)
+        scrolled.set_child(self.text_view)
+        vbox.append(scrolled)
+
+        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
+        hbox.set_halign(Gtk.Align.END)
+        vbox.append(hbox)
+
+        btn_reset = Gtk.Button(label="Сбросить")
+        btn_reset.connect("clicked", self.on_reset_clicked)
+        hbox.append(btn_reset)
+
+        btn_json = Gtk.Button(label="Экспорт JSON")
+        btn_json.connect("clicked", self.on_export_clicked, "wallhaven-metrics.json", metrics.export_json)
+        hbox.append(btn_json)
+
+        btn_trace = Gtk.Button(label="Экспорт Chrome trace")
+        btn_trace.connect("clicked", self.on_export_clicked, "wallhaven-trace.json", metrics.export_chrome_trace)
+        hbox.append(btn_trace)
+
+        # Зависания главного цикла отслеживаются, пока окно открыто
+        self._stall_monitor = getattr(parent, 'stall_monitor', None)
+        if self._stall_monitor:
+            self._stall_monitor.start()
+
+        self.refresh()
+        self._timer_id = GLib.timeout_add_seconds(1, self.refresh)
+        self.connect("close-request", self.on_close_request)
+
+    def refresh(self):
+        """Перерисовывает сводку метрик."""
+        data = metrics.snapshot()
+        lines = [f"{'интервал (мс)':<24}{'count':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"]
+        for name, h in data['histograms'].items():
+            lines.append(f"{name:<24}{h['count']:>8}{h['mean']:>9.1f}{h['p50']:>9.1f}"
+                         f"{h['p95']:>9.1f}{h['p99']:>9.1f}{h['max']:>9.1f}")
+
+        hit_rate = metrics.get_cache_hit_rate("thumb")
+        lines.append("")
+        lines.append("Кэш миниатюр: " + (f"{hit_rate * 100:.1f}% попаданий" if hit_rate is not None else "нет данных"))
+
+        if data['counters']:
+            lines.append("")
+            lines.append("Счётчики:")
+            lines += [f"  {name:<30}{value:>10}" for name, value in sorted(data['counters'].items())]
+        if data['gauges']:
+            lines.append("")
+            lines.append("Очереди и текущие значения:")
+            lines += [f"  {name:<30}{value:>10}" for name, value in sorted(data['gauges'].items())]
+
+        self.text_view.get_buffer().set_text("\n".join(lines))
+        return True
+
+    def on_reset_clicked(self, button):
+        """Сбрасывает накопленные метрики."""
+        metrics.reset()
+        self.refresh()
+
+    def on_export_clicked(self, button, default_name, exporter):
+        """Сохраняет метрики в файл, выбранный пользователем."""
+        d = Gtk.FileDialog()
+        d.set_initial_name(default_name)
+
+        def on_finish(dialog, res):
+            try:
+                f = dialog.save_finish(res)
+                if f:
+                    exporter(f.get_path())
+            except Exception as e:
+                print(f"Ошибка экспорта метрик: {e}")
+
+        d.save(self, None, on_finish)
+
+    def on_close_request(self, window):
+        """Останавливает обновление и наблюдение за зависаниями при закрытии окна."""
+        if self._timer_id:
+            GLib.source_remove(self._timer_id)
+            self._timer_id = None
+        if self._stall_monitor and not stall_monitor.is_enabled():
+            self._stall_monitor.stop()
+        return False
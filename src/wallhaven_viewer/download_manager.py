@@ -0,0 +1,321 @@
+"""
+Модуль очереди массовой загрузки обоев.
+
+Не зависит от GTK: используется и главным окном, и консольным режимом.
+"""
+
+import os
+import json
+import queue
+import threading
+import time
+
+from wallhaven_viewer.api import WallhavenAPI
+from wallhaven_viewer.library import find_existing_file
+from wallhaven_viewer.net import get_session, BandwidthLimiter
+from wallhaven_viewer import metrics
+from wallhaven_viewer.sidecar import build_meta_info, write_sidecar
+
+# Сколько раз повторять неудачную загрузку
+MAX_ATTEMPTS = 3
+# Как часто (в секундах) сообщать о прогрессе внутри одной загрузки
+PROGRESS_INTERVAL = 0.25
+# Сколько секунд простаивающий поток ждёт новую задачу перед завершением
+WORKER_IDLE_TIMEOUT = 5
+# Как часто (в секундах) журнал записывается на диск при смене статусов
+JOURNAL_INTERVAL = 1.0
+
+
+class DownloadManager:
+    """
+    Очередь параллельной загрузки обоев по ID с журналом на диске.
+
+    Каждая задача: запрос метаданных, загрузка оригинала в `<файл>.part`,
+    переименование и запись sidecar. Состояние задач сохраняется в JSON-журнал,
+    поэтому незавершённые загрузки продолжаются после перезапуска (`resume`).
+
+    Колбэки вызываются из рабочих потоков; GUI должен оборачивать их в GLib.idle_add.
+
+    Args:
+        parallelism (int): Число одновременных загрузок.
+        bandwidth_kbps (int): Общий лимит скорости в КБ/с; 0 — без ограничения.
+        journal_path (str, optional): Путь к журналу; None — журнал не ведётся.
+        on_progress (callable, optional): Вызывается со словарём статистики (см. `get_stats`).
+        on_job_finished (callable, optional): Вызывается с копией задачи после её завершения.
+    """
+
+    def __init__(self, parallelism=3, bandwidth_kbps=0, journal_path=None,
+                 on_progress=None, on_job_finished=None):
+        self.parallelism = max(1, int(parallelism))
+        self.limiter = BandwidthLimiter(bandwidth_kbps)
+        self.journal_path = journal_path
+        self.on_progress = on_progress
+        self.on_job_finished = on_job_finished
+
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = []
+        self._last_progress = 0.0
+        self._journal_dirty = False
+        self._journal_timer = None
+
+    def configure(self, parallelism=None, bandwidth_kbps=None):
+        """Меняет число потоков и лимит скорости без перезапуска очереди."""
+        if parallelism is not None:
+            self.parallelism = max(1, int(parallelism))
+            if not self._queue.empty():
+                self._ensure_workers()
+        if bandwidth_kbps is not None:
+            self.limiter.set_rate(bandwidth_kbps)
+
+    def enqueue(self, wallpaper_ids, download_path):
+        """
+        Ставит обои в очередь загрузки.
+
+        Args:
+            wallpaper_ids (iterable): ID обоев.
+            download_path (str): Папка, куда сохранять файлы.
+
+        Returns:
+            int: Количество добавленных задач (уже стоящие в очереди пропускаются).
+        """
+        added = 0
+        with self._lock:
+            for w_id in wallpaper_ids:
+                job = self.jobs.get(w_id)
+                if job and job['status'] in ('queued', 'active'):
+                    continue
+                self.jobs[w_id] = {
+                    'id': w_id,
+                    'download_path': download_path,
+                    'status': 'queued',
+                    'path': None,
+                    'error': None,
+                    'bytes': 0,
+                    'total': 0,
+                }
+                self._queue.put(w_id)
+                added += 1
+            if added:
+                self._mark_journal_dirty()
+        if added:
+            self._ensure_workers()
+            self._notify_progress(force=True)
+        return added
+
+    def resume(self):
+        """
+        Загружает журнал и возобновляет незавершённые задачи.
+
+        Returns:
+            int: Количество возобновлённых задач.
+        """
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return 0
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f).get('jobs', [])
+        except Exception as e:
+            print(f"Ошибка чтения журнала загрузок: {e}")
+            return 0
+
+        pending = {}
+        for job in saved:
+            if job.get('status') in ('queued', 'active') and job.get('id') and job.get('download_path'):
+                pending.setdefault(job['download_path'], []).append(job['id'])
+        resumed = 0
+        for download_path, ids in pending.items():
+            resumed += self.enqueue(ids, download_path)
+        if resumed:
+            print(f"🔁 Возобновлено загрузок из журнала: {resumed}")
+        return resumed
+
+    def get_stats(self):
+        """
+        Возвращает агрегированный прогресс очереди.
+
+        Returns:
+            dict: total, queued, active, done, failed, bytes, total_bytes.
+        """
+        with self._lock:
+            stats = {'total': len(self.jobs), 'queued': 0, 'active': 0, 'done': 0, 'failed': 0,
+                     'bytes': 0, 'total_bytes': 0}
+            for job in self.jobs.values():
+                stats[job['status']] += 1
+                stats['bytes'] += job['bytes']
+                stats['total_bytes'] += job['total']
+            return stats
+
+    def is_idle(self):
+        """True, если в очереди нет ожидающих и выполняющихся задач."""
+        stats = self.get_stats()
+        return stats['queued'] == 0 and stats['active'] == 0
+
+    def wait(self, poll_interval=0.2):
+        """Блокирует поток до опустошения очереди (для консольного режима)."""
+        while not self.is_idle():
+            time.sleep(poll_interval)
+        self.flush_journal()
+
+    def clear_finished(self):
+        """Убирает завершённые и неудачные задачи из статистики и журнала."""
+        with self._lock:
+            self.jobs = {k: j for k, j in self.jobs.items() if j['status'] in ('queued', 'active')}
+            self._save_journal()
+
+    def flush_journal(self):
+        """Немедленно записывает отложенные изменения журнала."""
+        with self._lock:
+            if self._journal_dirty:
+                self._save_journal()
+
+    def _mark_journal_dirty(self):
+        """
+        Откладывает запись журнала (вызывается под self._lock).
+
+        Смены статусов за JOURNAL_INTERVAL объединяются в одну запись: иначе
+        большая очередь переписывала бы весь журнал на каждой задаче.
+        """
+        if not self.journal_path:
+            return
+        self._journal_dirty = True
+        if self._journal_timer is None:
+            self._journal_timer = threading.Timer(JOURNAL_INTERVAL, self.flush_journal)
+            self._journal_timer.daemon = True
+            self._journal_timer.start()
+
+    def _save_journal(self):
+        """Атомарно записывает журнал (вызывается под self._lock)."""
+        self._journal_dirty = False
+        if self._journal_timer is not None:
+            self._journal_timer.cancel()
+            self._journal_timer = None
+        if not self.journal_path:
+            return
+        tmp_path = self.journal_path + '.tmp'
+        try:
+            jobs = [{k: v for k, v in job.items() if k not in ('bytes', 'total')}
+                    for job in self.jobs.values()]
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'jobs': jobs}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.journal_path)
+        except Exception as e:
+            print(f"Ошибка записи журнала загрузок: {e}")
+
+    def _set_status(self, job, status, **fields):
+        with self._lock:
+            job['status'] = status
+            job.update(fields)
+            self._mark_journal_dirty()
+        self._notify_progress(force=True)
+
+    def _notify_progress(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        stats = self.get_stats()
+        metrics.gauge("downloads.queued", stats['queued'])
+        metrics.gauge("downloads.active", stats['active'])
+        if not self.on_progress:
+            return
+        try:
+            self.on_progress(stats)
+        except Exception as e:
+            print(f"Ошибка колбэка прогресса загрузок: {e}")
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._workers = [t for t in self._workers if t.is_alive()]
+            while len(self._workers) < self.parallelism:
+                t = threading.Thread(target=self._worker, daemon=True)
+                self._workers.append(t)
+                t.start()
+
+    def _worker(self):
+        me = threading.current_thread()
+        while True:
+            with self._lock:
+                if len(self._workers) > self.parallelism and me in self._workers:
+                    self._workers.remove(me)
+                    return
+            try:
+                w_id = self._queue.get(timeout=WORKER_IDLE_TIMEOUT)
+            except queue.Empty:
+                with self._lock:
+                    # Задача могла прийти после таймаута, а enqueue — счесть поток живым
+                    if not self._queue.empty():
+                        continue
+                    if me in self._workers:
+                        self._workers.remove(me)
+                return
+
+            job = self.jobs.get(w_id)
+            if not job or job['status'] != 'queued':
+                continue
+            self._run_job(job)
+
+    def _run_job(self, job):
+        self._set_status(job, 'active', error=None)
+        error = None
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                with metrics.span("download.job", id=job['id']):
+                    path = self._download(job)
+                self._set_status(job, 'done', path=path)
+                break
+            except Exception as e:
+                error = str(e)
+                print(f"Ошибка загрузки {job['id']} (attempt {attempt}): {e}")
+                if attempt < MAX_ATTEMPTS:
+                    time.sleep(attempt)
+        else:
+            self._set_status(job, 'failed', error=error)
+
+        if self.on_job_finished:
+            try:
+                self.on_job_finished(dict(job))
+            except Exception as e:
+                print(f"Ошибка колбэка завершения загрузки: {e}")
+
+    def _download(self, job):
+        """Скачивает одну задачу: метаданные, оригинал и sidecar. Возвращает путь к файлу."""
+        w_id = job['id']
+        download_path = job['download_path']
+        existing = find_existing_file(download_path, w_id)
+        if existing:
+            return existing
+
+        info = WallhavenAPI.fetch_wallpaper_info(w_id)
+        if not info or not info.get('path'):
+            raise RuntimeError("нет данных об обоях")
+
+        url = info['path']
+        ext = os.path.splitext(url)[1].lower() or '.jpg'
+        if ext == '.jpeg':
+            ext = '.jpg'
+        dest_path = os.path.join(download_path, w_id + ext)
+        part_path = dest_path + '.part'
+
+        try:
+            resp = get_session().get(url, stream=True, timeout=60)
+            resp.raise_for_status()
+            job['total'] = int(resp.headers.get('content-length', 0)) or int(info.get('file_size') or 0)
+            job['bytes'] = 0
+            with open(part_path, 'wb') as f:
+                for chunk in resp.iter_content(chunk_size=65536):
+                    f.write(chunk)
+                    job['bytes'] += len(chunk)
+                    self.limiter.consume(len(chunk))
+                    self._notify_progress()
+            os.replace(part_path, dest_path)
+        finally:
+            if os.path.exists(part_path):
+                try:
+                    os.remove(part_path)
+                except OSError:
+                    pass
+
+        write_sidecar(dest_path, build_meta_info(info), info.get('tags', []) or [])
+        return dest_path
@@ -2,55 +2,65 @@
 Модуль окна полноразмерного просмотра обоев.
 """
 import os
+import shutil
 import threading
-import time
 import gi
 gi.require_version("Gtk", "4.0")
 from gi.repository import Gtk, Gdk, Gio, GLib, GdkPixbuf
 
-from wallhaven_viewer.utils import resolve_path, wallpaper_portal_available
+from wallhaven_viewer.resources import new_builder
 from wallhaven_viewer.image_loader import ImageLoader
-from wallhaven_viewer.api import WallhavenAPI
+from wallhaven_viewer import metrics
+from wallhaven_viewer.sidecar import write_sidecar
+from wallhaven_viewer.preloader import PRELOAD_RADIUS, create_staging_file, load_wallpaper_info
+from wallhaven_viewer.tiled_view import TiledImageView, get_screen_size
 from gi.repository import Gtk as _Gtk
 
+# Расширение сохраняемого оригинала по формату из заголовка
+SAVE_EXTENSIONS = {'jpeg': '.jpg', 'png': '.png', 'webp': '.webp'}
+
 class FullImageWindow(Gtk.Window):
     """
     Окно для полноразмерного просмотра и управления обоями.
 
     Осуществляет загрузку полного изображения, его сохранение на диск
-    и установку в качестве обоев рабочего стола.
+    и установку в качестве обоев рабочего стола. Поддерживает переход
+    к соседним элементам текущей выдачи (стрелки, PageUp/PageDown,
+    свайп), соседи предзагружаются через `parent.preloader`.
 
     Args:
         parent: Ссылка на родительское окно.
         image_url (str): URL-адрес полноразмерного изображения.
         download_path (str): Путь для сохранения файлов по умолчанию.
         local_path (str, optional): Локальный путь к файлу, если он уже скачан.
+        items (list, optional): Живой список выдачи родителя — кортежи
+            (thumb_url, full_url, wallpaper_id, local_path).
+        index (int): Позиция открываемого элемента в `items`.
     """
 
-    def __init__(self, parent, image_url, download_path, local_path=None):
+    def __init__(self, parent, image_url, download_path, local_path=None, items=None, index=0):
         super().__init__(transient_for=parent)
         self.parent_window = parent
-        self.image_url = image_url
         self.download_path = download_path
-        self.local_path = local_path
-        # Если локальный путь не передан, попробуем найти файл в списке скачанных у родителя
-        try:
-            if not self.local_path and hasattr(self.parent_window, 'downloaded_files'):
-                found = self.parent_window.downloaded_files.get(self.wallpaper_id)
-                if found and os.path.exists(found):
-                    self.local_path = found
-        except Exception:
-            pass
-        self.image_data = None
-        # Из url вида .../wallhaven-<id>.<ext> извлекаем чистый id (без префикса "wallhaven-")
-        raw_name = image_url.split('/')[-1].split('.')[0]
-        if raw_name.startswith('wallhaven-'):
-            self.wallpaper_id = raw_name[len('wallhaven-'):]
-        else:
-            self.wallpaper_id = raw_name
+        self.items = items if items is not None else []
+        self.index = index
+
+        # Номер текущей загрузки: ответы фоновых потоков для прежних элементов игнорируются
+        self._generation = 0
+        self.image_url = None
+        self.local_path = None
+        self.wallpaper_id = None
+        # Файл с оригиналом: локальный файл или временный файл в staging.
+        # Сами байты в памяти не держим.
+        self.image_file = None
+        self._staging_file = None
+        self._resolution = ''
+        self._preview = None
+        self._pending_tags = []
+        self._meta_info = None
 
-        # Создаем новый экземпляр Gtk.Builder для каждого окна
-        builder = Gtk.Builder.new_from_file(resolve_path("fullimage.ui"))
+        # Создаем новый экземпляр Gtk.Builder для каждого окна (UI берётся из бандла ресурсов)
+        builder = new_builder("fullimage.ui")
 
         # Загружаем root из нового экземпляра
         content = builder.get_object("root")
@@ -64,7 +74,6 @@ class FullImageWindow(Gtk.Window):
 
         w, h = xml_window.get_default_size()
         self.set_default_size(w, h)
-        self.set_title(f"Wallhaven - ID: {self.wallpaper_id}")
 
         content = xml_window.get_child()
         if content:
@@ -72,14 +81,25 @@ class FullImageWindow(Gtk.Window):
             self.set_child(content)
 
         self.picture = builder.get_object("picture")
+        # Тайловый просмотрщик для оригиналов больше экрана; живёт рядом с picture
+        self._screen_size = get_screen_size(parent)
+        self.tiled_view = TiledImageView()
+        self.tiled_view.set_visible(False)
+        self.picture.get_parent().insert_child_after(self.tiled_view, self.picture)
         self.spinner = builder.get_object("spinner")
         self.save_btn = builder.get_object("save_btn")
         self.progress_bar = builder.get_object("progress_bar")
 
         self.set_wp_btn = builder.get_object("set_wp_btn")
+        self.prev_btn = builder.get_object("prev_btn")
+        self.next_btn = builder.get_object("next_btn")
 
         self.save_btn.connect("clicked", self.on_save_clicked)
         self.set_wp_btn.connect("clicked", self.on_set_wallpaper_clicked)
+        if self.prev_btn:
+            self.prev_btn.connect("clicked", lambda _b: self.navigate(-1))
+        if self.next_btn:
+            self.next_btn.connect("clicked", lambda _b: self.navigate(1))
         # Метаданные и теги
         self.meta_label = builder.get_object("meta_label")
         self.meta_box = builder.get_object("meta_box")
@@ -93,52 +113,21 @@ class FullImageWindow(Gtk.Window):
                 GLib.idle_add(self.update_tag_columns)
         except Exception:
             pass
-        try:
-            if self.meta_box:
-                self.meta_box.set_visible(False)
-        except Exception:
-            pass
         if not self.meta_label:
             print("⚠️ meta_label не найден в UI")
         if not self.tags_flowbox:
             print("⚠️ tags_flowbox не найден в UI")
 
-        # Если локальный файл передан — сразу загружаем его и помечаем как скачанный
-        if self.local_path:
-            self.load_image_and_info(local_mode=True)
-            try:
-                self.set_wp_btn.set_sensitive(True)
-            except Exception:
-                pass
-            try:
-                self.save_btn.set_sensitive(False)
-                pixbuf = None
-                if getattr(self, 'image_data', None):
-                    try:
-                        pixbuf = ImageLoader.load_pixbuf_from_bytes(self.image_data)
-                    except Exception:
-                        pixbuf = None
-
-                if pixbuf:
-                    resolution = ''
-                    try:
-                        if isinstance(self._meta_info, dict):
-                            resolution = self._meta_info.get('resolution', '')
-                    except Exception:
-                        resolution = ''
-
-                    GLib.idle_add(self._apply_loaded_image, pixbuf, resolution, self._meta_info, self._pending_tags)
+        # Навигация по выдаче: клавиатура и свайп (только сенсор — мышью панорамируется тайловый вид)
+        key_controller = Gtk.EventControllerKey()
+        key_controller.connect("key-pressed", self.on_key_pressed)
+        self.add_controller(key_controller)
 
-                self.save_btn.set_label("Скачано")
-            except Exception:
-                pass
-        else:
-            # Запускаем в потоке, так как делаем API запрос и загрузку изображения
-            threading.Thread(target=self.load_image_and_info, daemon=True, args=(False,)).start()
+        swipe = Gtk.GestureSwipe()
+        swipe.set_touch_only(True)
+        swipe.connect("swipe", self.on_swipe)
+        self.add_controller(swipe)
 
-        # Инициализируем контейнеры для отложенного показа мета/тегов
-        self._pending_tags = []
-        self._meta_info = None
         # Поддерживаем кликабельные ссылки в мета-лейбле (для автора)
         try:
             if self.meta_label:
@@ -146,12 +135,213 @@ class FullImageWindow(Gtk.Window):
                 self.meta_label.connect('activate-link', self.on_meta_activate_link)
         except Exception:
             pass
-    def update_progress(self, current_bytes, total_bytes):
+        # Удаляем несохранённый временный файл при закрытии окна
+        self.connect("destroy", self.on_destroy)
+
+        self.load_wallpaper(image_url, local_path)
+
+    @staticmethod
+    def wallpaper_id_from_url(image_url):
+        """Из url вида .../wallhaven-<id>.<ext> извлекает чистый id (без префикса "wallhaven-")."""
+        raw_name = image_url.split('/')[-1].split('.')[0]
+        if raw_name.startswith('wallhaven-'):
+            return raw_name[len('wallhaven-'):]
+        return raw_name
+
+    def load_wallpaper(self, image_url, local_path=None):
+        """
+        Показывает в окне другой элемент: сбрасывает состояние и запускает загрузку.
+
+        Если элемент предзагружен, он отображается сразу; текущий элемент при
+        этом возвращается в кэш предзагрузки.
+
+        Args:
+            image_url (str): URL-адрес полноразмерного изображения.
+            local_path (str, optional): Локальный путь к файлу, если он уже скачан.
+        """
+        self._release_current()
+        self._generation += 1
+        generation = self._generation
+
+        self.image_url = image_url
+        self.wallpaper_id = self.wallpaper_id_from_url(image_url)
+        self.local_path = local_path
+        # Если локальный путь не передан, попробуем найти файл в списке скачанных у родителя
+        try:
+            if not self.local_path and hasattr(self.parent_window, 'downloaded_files'):
+                found = self.parent_window.downloaded_files.get(self.wallpaper_id)
+                if found and os.path.exists(found):
+                    self.local_path = found
+        except Exception:
+            pass
+        self._resolution = ''
+        self._pending_tags = []
+        self._meta_info = None
+
+        self.set_title(f"Wallhaven - ID: {self.wallpaper_id}")
+        self.picture.set_paintable(None)
+        self.tiled_view.clear()
+        self.spinner.set_visible(True)
+        self.progress_bar.set_visible(False)
+        self.set_wp_btn.set_sensitive(bool(self.local_path))
+        self.save_btn.set_sensitive(False)
+        self.save_btn.set_label("Скачано" if self.local_path else "Скачать")
+        try:
+            if self.meta_box:
+                self.meta_box.set_visible(False)
+        except Exception:
+            pass
+        self._update_nav_buttons()
+
+        preloader = getattr(self.parent_window, 'preloader', None)
+        entry = preloader.take(self.wallpaper_id) if preloader else None
+        if entry and (entry.get('staging') or entry.get('path') == self.local_path):
+            self._apply_entry(entry, generation)
+        elif entry:
+            preloader.put(self.wallpaper_id, entry)
+            entry = None
+
+        if entry is None:
+            w_id = self.wallpaper_id
+            if preloader and preloader.wait_for(w_id, lambda e: self._on_preloaded(e, generation, w_id)):
+                pass
+            else:
+                threading.Thread(target=self.load_image_and_info, daemon=True,
+                                 args=(generation, self.wallpaper_id, self.image_url, self.local_path)).start()
+
+        self._schedule_preload()
+
+    def _release_current(self):
+        """Отдаёт текущий элемент в кэш предзагрузки или удаляет его временный файл."""
+        preloader = getattr(self.parent_window, 'preloader', None)
+        if preloader and self.wallpaper_id and self.image_file:
+            preloader.put(self.wallpaper_id, {
+                'path': self.image_file,
+                'staging': self.image_file == self._staging_file,
+                'meta': self._meta_info,
+                'tags': self._pending_tags,
+                'resolution': self._resolution,
+                'preview': self._preview,
+            })
+            self._staging_file = None
+        else:
+            self._discard_staging_file()
+        self.image_file = None
+        self._preview = None
+
+    def _on_preloaded(self, entry, generation, wallpaper_id):
+        """Вызывается, когда ожидаемый элемент закончил предзагружаться."""
+        if generation != self._generation:
+            preloader = getattr(self.parent_window, 'preloader', None)
+            if entry and preloader:
+                preloader.put(wallpaper_id, entry)
+            return False
+        if entry:
+            self._apply_entry(entry, generation)
+        else:
+            threading.Thread(target=self.load_image_and_info, daemon=True,
+                             args=(generation, self.wallpaper_id, self.image_url, self.local_path)).start()
+        return False
+
+    def _apply_entry(self, entry, generation):
+        """Отображает предзагруженную запись без обращения к сети."""
+        self.image_file = entry.get('path')
+        if entry.get('staging'):
+            self._staging_file = self.image_file
+        self._apply_info(generation, entry.get('resolution', ''), entry.get('meta'), entry.get('tags'))
+        preview = entry.get('preview')
+        if preview:
+            self._show_decoded(generation, *preview)
+        else:
+            threading.Thread(target=self._decode_and_show, args=(generation, self.image_file), daemon=True).start()
+
+    def _schedule_preload(self):
+        """Планирует предзагрузку соседей текущего элемента, ближайшие — первыми."""
+        preloader = getattr(self.parent_window, 'preloader', None)
+        if not preloader or not self.items:
+            return
+        neighbours = []
+        for distance in range(1, PRELOAD_RADIUS + 1):
+            for i in (self.index + distance, self.index - distance):
+                if 0 <= i < len(self.items):
+                    _thumb, full_url, w_id, local_path = self.items[i]
+                    neighbours.append((full_url, w_id, local_path))
+        preloader.schedule(neighbours)
+
+    def navigate(self, delta):
+        """
+        Переходит к соседнему элементу выдачи.
+
+        Args:
+            delta (int): Смещение (-1 — предыдущий, 1 — следующий).
+        """
+        new_index = self.index + delta
+        if not self.items or not 0 <= new_index < len(self.items):
+            return
+        # Подгружаем следующую страницу выдачи заранее, пока пользователь листает
+        try:
+            if new_index >= len(self.items) - PRELOAD_RADIUS - 1:
+                self.parent_window.check_if_can_load_next_page(force=True)
+        except Exception:
+            pass
+        self.index = new_index
+        _thumb, full_url, _w_id, local_path = self.items[new_index]
+        self.load_wallpaper(full_url, local_path)
+
+    def show_item(self, index):
+        """Показывает элемент выдачи с указанным индексом."""
+        if not 0 <= index < len(self.items):
+            return
+        self.index = index
+        _thumb, full_url, _w_id, local_path = self.items[index]
+        self.load_wallpaper(full_url, local_path)
+
+    def _update_nav_buttons(self):
+        if self.prev_btn:
+            self.prev_btn.set_sensitive(self.index > 0)
+        if self.next_btn:
+            self.next_btn.set_sensitive(self.index < len(self.items) - 1)
+
+    def on_key_pressed(self, controller, keyval, keycode, state):
+        if keyval in (Gdk.KEY_Right, Gdk.KEY_Page_Down, Gdk.KEY_space):
+            self.navigate(1)
+            return True
+        if keyval in (Gdk.KEY_Left, Gdk.KEY_Page_Up, Gdk.KEY_BackSpace):
+            self.navigate(-1)
+            return True
+        if keyval == Gdk.KEY_Escape:
+            self.close()
+            return True
+        return False
+
+    def on_swipe(self, gesture, velocity_x, velocity_y):
+        if abs(velocity_x) > abs(velocity_y) and abs(velocity_x) > 300:
+            self.navigate(1 if velocity_x < 0 else -1)
+
+    def on_destroy(self, _widget):
+        self._generation += 1
+        self._release_current()
+
+    def release_memory(self, critical=False):
+        """
+        Освобождает буферы изображения при нехватке памяти (вызывается главным окном).
+
+        Args:
+            critical (bool): Освободить и копию preview, которая иначе уходит
+                в кэш предзагрузки при переходе к соседним обоям.
+        """
+        self.tiled_view.release_memory()
+        if critical:
+            self._preview = None
+
+    def update_progress(self, current_bytes, total_bytes, generation=None):
         """
         Обновляет прогресс-бар во время загрузки полноразмерного изображения.
         Вызывается из фонового потока — выполняет обновление через GLib.idle_add.
         """
         try:
+            if generation is not None and generation != self._generation:
+                return
             if total_bytes and total_bytes > 0:
                 fraction = float(current_bytes) / float(total_bytes)
                 percent = int(fraction * 100)
@@ -169,183 +359,143 @@ class FullImageWindow(Gtk.Window):
                 self.spinner.set_visible(False)
         except Exception:
             pass
-    def load_image_and_info(self, local_mode=False):
-        """Загружает полноразмерное изображение и метаданные.
 
-        Если передан `local_mode`, пытается загрузить из `self.local_path`.
-        Иначе запрашивает метаданные у API (с ретраями) и запускает загрузку изображения по сети.
-        """
-        resolution = ""
+    def load_image_and_info(self, generation, wallpaper_id, image_url, local_path=None):
+        """Загружает полноразмерное изображение и метаданные (в фоновом потоке).
 
-        # 1) Локальная загрузка
-        if local_mode and self.local_path:
-            try:
-                with open(self.local_path, 'rb') as f:
-                    self.image_data = f.read()
+        Если передан `local_path`, берёт изображение из него, а метаданные —
+        из sidecar (при его отсутствии запрашивает API и записывает sidecar).
+        Иначе запрашивает метаданные у API (с ретраями) и загружает изображение
+        по сети во временный файл.
 
-                # Попробуем сначала прочитать sidecar рядом с локальным файлом
-                resolution = ""
-                try:
-                    import json
-                    sidecar = self.local_path + '.meta.json'
-                    if os.path.exists(sidecar):
-                        #print(f"✅ sidecar found for local image: {sidecar} (instance id={id(self)})")
-                        with open(sidecar, 'r', encoding='utf-8') as sf:
-                            j = json.load(sf)
-                            meta = j.get('meta')
-                            tags = j.get('tags')
-                            self._meta_info = meta
-                            self._pending_tags = tags or []
-                            resolution = meta.get('resolution', '') if isinstance(meta, dict) else ''
-                            #print(f"🔖 sidecar loaded (instance id={id(self)}): meta={'set' if self._meta_info else 'empty'}, tags_count={len(self._pending_tags)}; meta_repr={repr(self._meta_info)}")
-                    else:
-                        # Если sidecar отсутствует — делаем запрос к API и записываем sidecar
-                        #print(f"⚠️ sidecar not found for {self.local_path}, querying API")
-                        wallpaper_info = None
-                        for attempt in range(1, 4):
-                            try:
-                                wallpaper_info = WallhavenAPI.get_wallpaper_info(self.wallpaper_id)
-                                if wallpaper_info:
-                                    break
-                                else:
-                                    print(f"⚠️ wallpaper_info empty on attempt {attempt}")
-                            except Exception as e:
-                                print(f"Ошибка при запросе wallpaper_info (local_mode attempt {attempt}): {e}")
-                            if attempt < 3:
-                                time.sleep(0.6)
-
-                        resolution = wallpaper_info.get('resolution', '') if wallpaper_info else ''
+        Данные элемента передаются аргументами, а не читаются из self: при
+        быстром переходе между обоями окно уже показывает другой элемент.
 
-                        if wallpaper_info:
-                            try:
-                                file_size = wallpaper_info.get('file_size') or wallpaper_info.get('size') or 0
-                                try:
-                                    size_mb = float(file_size) / (1024 * 1024)
-                                    size_str = f"{size_mb:.2f} MB"
-                                except Exception:
-                                    size_str = str(file_size)
-
-                                uploader = wallpaper_info.get('uploaded_by') or wallpaper_info.get('uploader') or wallpaper_info.get('user') or ''
-                                views = wallpaper_info.get('views', '')
-                                favorites = wallpaper_info.get('favorites', '') or wallpaper_info.get('favourites', '')
-
-                                self._meta_info = {
-                                    'size': size_str,
-                                    'uploader': uploader,
-                                    'views': views,
-                                    'favorites': favorites,
-                                    'resolution': resolution,
-                                }
-                            except Exception:
-                                self._meta_info = None
+        Args:
+            generation (int): Номер загрузки; результаты устаревших загрузок отбрасываются.
+            wallpaper_id (str): ID обоев.
+            image_url (str): URL оригинала.
+            local_path (str, optional): Локальный файл, если обои уже скачаны.
+        """
+        # 1) Локальная загрузка
+        if local_path:
+            if not os.path.isfile(local_path):
+                print(f"Ошибка чтения локального файла: {local_path} не найден")
+                GLib.idle_add(self._hide_loading, generation)
+                return
 
-                            try:
-                                tags = wallpaper_info.get('tags', []) or []
-                                self._pending_tags = tags
-                            except Exception:
-                                self._pending_tags = []
+            meta, tags, resolution = load_wallpaper_info(wallpaper_id, local_path)
+            GLib.idle_add(self._apply_info, generation, resolution, meta, tags, local_path)
+            self._decode_and_show(generation, local_path)
+            return
 
-                            # Записываем sidecar рядом с файлом, чтобы в следующий раз не дергать API
-                            try:
-                                with open(sidecar, 'w', encoding='utf-8') as sf:
-                                    json.dump({'meta': self._meta_info, 'tags': self._pending_tags}, sf, ensure_ascii=False, indent=2)
-                                print(f"✅ Wrote sidecar for local image: {sidecar} (instance id={id(self)})")
-                            except Exception as e:
-                                print(f"Не удалось записать sidecar: {e}")
-                        else:
-                            self._pending_tags = []
-                except Exception as e:
-                    print(f"Ошибка при чтении/записи sidecar для локального файла: {e}")
+        # 2) Получаем метаданные от API с ретраем
+        meta, tags, resolution = load_wallpaper_info(wallpaper_id)
+        GLib.idle_add(self._apply_info, generation, resolution, meta, tags)
 
-                GLib.idle_add(self.update_title, resolution)
-                #print(f"load_image_and_info finished (instance id={id(self)}), _meta_info set={'yes' if self._meta_info else 'no'}, tags_count={len(self._pending_tags) if self._pending_tags else 0}")
-            except Exception as e:
-                print(f"Ошибка чтения локального файла: {e}")
-                self.image_data = None
-        else:
-            # 2) Получаем метаданные от API с ретраем
-            wallpaper_info = None
-            for attempt in range(1, 4):
-                try:
-                    wallpaper_info = WallhavenAPI.get_wallpaper_info(self.wallpaper_id)
-                    if wallpaper_info:
-                        break
-                except Exception as e:
-                    print(f"Ошибка при запросе wallpaper_info (attempt {attempt}): {e}")
-                if attempt < 3:
-                    time.sleep(0.6)
-
-            resolution = wallpaper_info.get('resolution', '') if wallpaper_info else ''
+        # Загрузка изображения по сети сразу во временный файл
+        staging_path = create_staging_file(wallpaper_id, os.path.splitext(image_url)[1] or '.jpg')
+        if not staging_path:
+            GLib.idle_add(self._hide_loading, generation)
+            return
 
-            # Собираем метаданные
-            if wallpaper_info:
-                try:
-                    file_size = wallpaper_info.get('file_size') or wallpaper_info.get('size') or 0
+        def on_image_loaded(path):
+            if generation != self._generation:
+                # Пользователь уже перешёл к другому элементу
+                if path:
                     try:
-                        size_mb = float(file_size) / (1024 * 1024)
-                        size_str = f"{size_mb:.2f} MB"
-                    except Exception:
-                        size_str = str(file_size)
-
-                    uploader = wallpaper_info.get('uploaded_by') or wallpaper_info.get('uploader') or wallpaper_info.get('user') or ''
-                    views = wallpaper_info.get('views', '')
-                    favorites = wallpaper_info.get('favorites', '') or wallpaper_info.get('favourites', '')
-
-                    self._meta_info = {
-                        'size': size_str,
-                        'uploader': uploader,
-                        'views': views,
-                        'favorites': favorites,
-                    }
-                except Exception:
-                    self._meta_info = None
-
-                # Теги
-                try:
-                    tags = wallpaper_info.get('tags', []) or []
-                    self._pending_tags = tags
-                except Exception:
-                    self._pending_tags = []
-            else:
-                self._pending_tags = []
-
-            if wallpaper_info is None:
-                GLib.idle_add(self.update_title, resolution)
+                        os.remove(path)
+                    except OSError:
+                        pass
+                return False
+            if path:
+                self.image_file = path
+                self._staging_file = path
+                threading.Thread(target=self._decode_and_show, args=(generation, path), daemon=True).start()
             else:
-                GLib.idle_add(self.update_title, resolution)
+                self.spinner.set_visible(False)
+                self.progress_bar.set_visible(False)
+            return False
+
+        ImageLoader.download_to_file(
+            image_url,
+            staging_path,
+            on_image_loaded,
+            progress_callback=lambda cur, total: self.update_progress(cur, total, generation),
+            timeout=60,
+        )
+
+    def _apply_info(self, generation, resolution, meta, tags, image_file=None):
+        """
+        Вызывается в main thread: устанавливает мета/теги и обновляет заголовок.
+        Выполняется раньше показа изображения, поэтому `show_meta_and_tags`
+        видит уже заполненные данные.
+        """
+        if generation != self._generation:
+            return False
+        self._meta_info = meta
+        self._pending_tags = tags or []
+        self._resolution = resolution or ''
+        if image_file:
+            self.image_file = image_file
+        try:
+            self.update_title(self._resolution)
+        except Exception:
+            pass
+        return False
 
-            # Загрузка изображения по сети
-            def on_image_loaded(img_data):
-                if img_data:
-                    self.image_data = img_data
-                    try:
-                        pixbuf = ImageLoader.load_pixbuf_from_bytes(img_data)
-                        if pixbuf:
-                            GLib.idle_add(self.update_image, pixbuf)
-                    except Exception as e:
-                        print(f"Ошибка при обработке изображения: {e}")
-                        GLib.idle_add(lambda: self.progress_bar.set_visible(False))
-                else:
-                    GLib.idle_add(lambda: self.spinner.set_visible(False))
-                    GLib.idle_add(lambda: self.progress_bar.set_visible(False))
-
-            ImageLoader.download_image(
-                self.image_url,
-                on_image_loaded,
-                progress_callback=self.update_progress,
-                timeout=60,
-            )
-            
-
-        # 2. Обновление UI для локального режима
-        if local_mode and self.image_data:
+    def _discard_staging_file(self):
+        """Удаляет временный файл оригинала, если он не был сохранён."""
+        path, self._staging_file = self._staging_file, None
+        if path and os.path.exists(path):
             try:
-                pixbuf = ImageLoader.load_pixbuf_from_bytes(self.image_data)
-                if pixbuf:
-                    GLib.idle_add(self.update_image, pixbuf)
-            except Exception as e:
-                print(f"Ошибка: {e}")
-                GLib.idle_add(lambda: self.progress_bar.set_visible(False))
+                os.remove(path)
+            except OSError as e:
+                print(f"Не удалось удалить временный файл {path}: {e}")
+        if path and self.image_file == path:
+            self.image_file = None
+
+    def _decode_and_show(self, generation, path):
+        """
+        Декодирует изображение не больше размера экрана и планирует его показ.
+
+        Оригиналы, превышающие экран, отображаются через TiledImageView:
+        полное разрешение декодируется только при увеличении.
+        Может вызываться из фонового потока.
+        """
+        try:
+            screen_w, screen_h = self._screen_size
+            with metrics.span("image.decode"):
+                pixbuf, width, height = ImageLoader.load_scaled_pixbuf_from_file(path, screen_w, screen_h)
+            if not pixbuf:
+                GLib.idle_add(self._hide_loading, generation)
+                return
+            GLib.idle_add(self._show_decoded, generation, pixbuf, width, height)
+        except Exception as e:
+            print(f"Ошибка при обработке изображения: {e}")
+            GLib.idle_add(self._hide_loading, generation)
+
+    def _hide_loading(self, generation):
+        """Скрывает индикаторы загрузки после ошибки (в главном потоке)."""
+        if generation != self._generation:
+            return False
+        self.spinner.set_visible(False)
+        self.progress_bar.set_visible(False)
+        return False
+
+    def _show_decoded(self, generation, pixbuf, width, height):
+        """Показывает декодированный preview текущего элемента (в главном потоке)."""
+        if generation != self._generation:
+            return False
+        # Текстура разделяет пиксели с pixbuf, поэтому ссылка на preview не удваивает память,
+        # а при переходе к соседу позволяет вернуть элемент в кэш без повторного декодирования
+        self._preview = (pixbuf, width, height)
+        screen_w, screen_h = self._screen_size
+        if width > screen_w or height > screen_h:
+            self.update_image_tiled(pixbuf, width, height)
+        else:
+            self.update_image(pixbuf)
+        return False
 
     def populate_tags(self, tags):
         """
@@ -373,10 +523,13 @@ class FullImageWindow(Gtk.Window):
                     btn = Gtk.Button.new_with_label(name)
                     btn.add_css_class('pill')
 
-                    def make_on_click(tag_name):
+                    def make_on_click(tag_name, tag_id):
                         def on_click(_btn):
                             try:
-                                if hasattr(self.parent_window, 'search_and_present'):
+                                if tag_id and hasattr(self.parent_window, 'search_tag'):
+                                    # Точный поиск по ID тега вместо поиска по тексту имени
+                                    self.parent_window.search_tag(tag_id, tag_name)
+                                elif hasattr(self.parent_window, 'search_and_present'):
                                     self.parent_window.search_and_present(tag_name)
                                 else:
                                     self.parent_window.start_new_search(tag_name)
@@ -385,7 +538,7 @@ class FullImageWindow(Gtk.Window):
                                 print(f"Ошибка при клике по тегу: {e}")
                         return on_click
 
-                    btn.connect('clicked', make_on_click(name))
+                    btn.connect('clicked', make_on_click(name, t.get('id') if isinstance(t, dict) else None))
 
                     try:
                         fb_child = Gtk.FlowBoxChild()
@@ -433,13 +586,47 @@ class FullImageWindow(Gtk.Window):
         """
         texture = Gdk.Texture.new_for_pixbuf(pixbuf)
 
+        self.tiled_view.clear()
+        self.tiled_view.set_visible(False)
+        self.picture.set_visible(True)
         self.picture.set_paintable(texture)
+        self._on_image_shown()
+
+    def update_image_tiled(self, preview_pixbuf, width, height):
+        """
+        Отображает очень большое изображение через тайловый просмотрщик.
+
+        Args:
+            preview_pixbuf (GdkPixbuf.Pixbuf): Копия, уменьшенная до размера экрана.
+            width (int): Ширина оригинала.
+            height (int): Высота оригинала.
+        """
+        image_file = self.image_file
+        self.picture.set_paintable(None)
+        self.picture.set_visible(False)
+
+        # Область просмотра — в пределах окна, с сохранением пропорций
+        win_w = self.get_width() or self.get_default_size()[0]
+        win_h = self.get_height() or self.get_default_size()[1]
+        scale = min((win_w - 40) / width, (win_h * 0.75) / height, 1.0)
+        self.tiled_view.set_size_request(max(100, int(width * scale)), max(100, int(height * scale)))
+
+        self.tiled_view.set_image(
+            preview_pixbuf, width, height,
+            lambda: ImageLoader.load_pixbuf_from_file(image_file),
+        )
+        self.tiled_view.set_visible(True)
+        self._on_image_shown()
+
+    def _on_image_shown(self):
+        """Общая часть показа изображения: кнопки, индикаторы, мета и теги."""
         self.spinner.set_visible(False)
         self.progress_bar.set_visible(False)
 
         if not self.local_path:
             self.save_btn.set_sensitive(True)
-        self.set_wp_btn.set_sensitive(True)
+        # Установить обои можно только из сохранённого файла
+        self.set_wp_btn.set_sensitive(bool(self.local_path))
 
         # После отображения изображения показываем сохранившиеся метаданные и теги
         import threading as _th
@@ -448,41 +635,20 @@ class FullImageWindow(Gtk.Window):
         # Всегда показываем блок мета/тегов после отображения изображения
         GLib.idle_add(self.show_meta_and_tags)
 
-    def _apply_loaded_image(self, pixbuf, resolution, meta, tags):
-        """
-        Вызывается в main thread: устанавливает мета/теги, обновляет заголовок и отображает изображение.
-        Это гарантирует корректный порядок действий и отсутствие гонок между
-        присвоением `_meta_info/_pending_tags` и `update_image`.
-        """
-        try:
-            self._meta_info = meta
-            self._pending_tags = tags or []
-            try:
-                self.update_title(resolution)
-            except Exception:
-                pass
-            try:
-                self.update_image(pixbuf)
-            except Exception:
-                pass
-        except Exception as e:
-            print(f"Ошибка в _apply_loaded_image: {e}")
-
     def on_save_clicked(self, btn):
         """Обработчик нажатия кнопки сохранения. Сохраняет файл либо по умолчанию, либо через диалог."""
-        if not self.image_data:
+        if not self.image_file:
             return
 
-        # Определение формата
-        content_type = ImageLoader.get_image_format_from_bytes(self.image_data)
-        ext = '.jpg' if 'jpeg' in content_type else '.png'
+        # Определение формата по заголовку файла
+        content_type = ImageLoader.get_image_format_from_file(self.image_file)
+        ext = SAVE_EXTENSIONS.get(content_type, '.png')
         name = self.wallpaper_id + ext
 
         if self.download_path and os.path.exists(self.download_path):
             try:
                 local_path = os.path.join(self.download_path, name)
-                with open(local_path, "wb") as f:
-                    f.write(self.image_data)
+                self._store_image_file(local_path)
 
                 try:
                     self._write_sidecar(local_path)
@@ -515,8 +681,7 @@ class FullImageWindow(Gtk.Window):
             f = d.save_finish(res)
             if f:
                 local_path = f.get_path()
-                with open(local_path, "wb") as file:
-                    file.write(self.image_data)
+                self._store_image_file(local_path)
 
                 # Сохраняем сопутствующие метаданные рядом с файлом (sidecar)
                 try:
@@ -535,91 +700,38 @@ class FullImageWindow(Gtk.Window):
         except Exception as e:
             print(f"Ошибка сохранения: {e}")
 
-    def _write_sidecar(self, image_path):
+    def _store_image_file(self, dest_path):
         """
-        Записывает sidecar JSON-файл рядом с изображением, содержащий
-        `_meta_info` и `_pending_tags`, чтобы при открытии локального файла
-        можно было восстановить метаданные без обращения к API.
+        Сохраняет оригинал в `dest_path`.
+
+        Временный файл переносится (rename, при необходимости — копирование
+        между файловыми системами), локальный файл копируется.
+
+        Args:
+            dest_path (str): Путь назначения.
         """
-        try:
-            import json
-            meta = {
-                'meta': self._meta_info,
-                'tags': self._pending_tags,
-            }
-            sidecar_path = image_path + '.meta.json'
-            with open(sidecar_path, 'w', encoding='utf-8') as sf:
-                json.dump(meta, sf, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Не удалось записать sidecar: {e}")
+        if self._staging_file and self.image_file == self._staging_file:
+            shutil.move(self._staging_file, dest_path)
+            self._staging_file = None
+        else:
+            shutil.copyfile(self.image_file, dest_path)
+        self.image_file = dest_path
 
-    from wallhaven_viewer.utils import wallpaper_portal_available
+    def _write_sidecar(self, image_path):
+        """Записывает sidecar с `_meta_info` и `_pending_tags` рядом с изображением."""
+        write_sidecar(image_path, self._meta_info, self._pending_tags)
 
     def on_set_wallpaper_clicked(self, _btn):
+        """Устанавливает открытые обои на рабочий стол, не блокируя интерфейс."""
         if not self.local_path or not os.path.exists(self.local_path):
             print("❌ Нет локального файла — нельзя установить обои")
             return
+        self.set_wp_btn.set_sensitive(False)
 
-        used_portal = False
-        if wallpaper_portal_available() and os.getenv("FLATPAK_ID"):
-            # пробуем портал ТОЛЬКО внутри Flatpak и если backend отвечает
-            try:
-                import dbus, dbus.types
-                bus = dbus.SessionBus()
-                iface = dbus.Interface(
-                    bus.get_object("org.freedesktop.portal.Desktop",
-                                "/org/freedesktop/portal/desktop"),
-                    "org.freedesktop.portal.Wallpaper")
-                fd = os.open(self.local_path, os.O_RDONLY)
-                try:
-                    iface.SetWallpaperFile(
-                        "",
-                        dbus.types.UnixFd(fd),
-                        {'show-preview': dbus.Boolean(False, variant_level=1)}
-                    )
-                    print(f"✅ Обои установлены через портал: {self.local_path}")
-                    used_portal = True
-                finally:
-                    os.close(fd)
-            except Exception as e:
-                print(f"⚠️  Портал недоступен ({e}); fallback на GSettings")
-
-        if not used_portal:
-            self._set_wallpaper_worker(self.local_path)
-
-    def _set_wallpaper_worker(self, path):
-        """
-        Устанавливает обои через GSettings.
-        Безопасно проверяет доступность ключей.
-        """
-        try:
-            # Преобразуем путь в file:// URI (экранируем пробелы и спецсимволы)
-            file_uri = Gio.File.new_for_path(os.path.abspath(path)).get_uri()
-
-            # Создаём Settings
-            settings = Gio.Settings.new('org.gnome.desktop.background')
+        def on_done(ok):
+            self.set_wp_btn.set_sensitive(True)
 
-            # Проверяем схему
-            schema_source = Gio.SettingsSchemaSource.get_default()
-            schema = schema_source.lookup('org.gnome.desktop.background', True)
-
-            if not schema:
-                print("❌ Схема org.gnome.desktop.background не найдена")
-                return
-
-            # Устанавливаем обои
-            if schema.has_key('picture-uri-dark'):
-                settings.set_string('picture-uri', file_uri)
-                settings.set_string('picture-uri-dark', file_uri)
-                print(f"✅ Обои установлены (с поддержкой тёмного режима): {file_uri}")
-            else:
-                settings.set_string('picture-uri', file_uri)
-                print(f"✅ Обои установлены: {file_uri}")
-
-        except Exception as e:
-            print(f"❌ Ошибка установки обоев: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
+        self.parent_window.set_desktop_wallpaper(self.local_path, on_done)
 
     def show_meta_and_tags(self):
         """
@@ -4,11 +4,39 @@
 
 import os
 import threading
-import requests
+from concurrent.futures import ThreadPoolExecutor
 import gi
 gi.require_version("Gtk", "4.0")
 from gi.repository import GdkPixbuf, GLib, Gdk, Gtk
 from wallhaven_viewer.utils import get_cache_path, get_cache_dir
+from wallhaven_viewer.net import get_session
+from wallhaven_viewer.probe import probe_file
+from wallhaven_viewer import metrics
+
+
+# Сколько миниатюр загружается одновременно
+THUMBNAIL_WORKERS = 12
+
+_thumbnail_pool = None
+_thumbnail_pool_lock = threading.Lock()
+
+
+def get_thumbnail_pool():
+    """Возвращает общий пул потоков загрузки миниатюр (создаётся при первом вызове)."""
+    global _thumbnail_pool
+    with _thumbnail_pool_lock:
+        if _thumbnail_pool is None:
+            _thumbnail_pool = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumb")
+        return _thumbnail_pool
+
+
+def shutdown_thumbnail_pool():
+    """Отменяет ожидающие загрузки миниатюр (при выходе, чтобы не ждать очередь)."""
+    global _thumbnail_pool
+    with _thumbnail_pool_lock:
+        pool, _thumbnail_pool = _thumbnail_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
 
 
 class ImageLoader:
@@ -37,40 +65,115 @@ class ImageLoader:
             return None
 
     @staticmethod
-    def download_image(url, callback, progress_callback=None, timeout=60):
+    def load_pixbuf_from_file(path):
+        """
+        Создает GdkPixbuf из файла на диске.
+
+        Args:
+            path (str): Путь к изображению.
+
+        Returns:
+            GdkPixbuf.Pixbuf or None: Созданный Pixbuf или None в случае ошибки.
+        """
+        try:
+            return GdkPixbuf.Pixbuf.new_from_file(path)
+        except Exception as e:
+            print(f"Ошибка создания Pixbuf из файла {path}: {e}")
+            return None
+
+    @staticmethod
+    def load_scaled_pixbuf_from_file(path, max_width, max_height):
         """
-        Загружает изображение по URL с поддержкой прогресса.
+        Декодирует файл изображения сразу в уменьшенном виде, не больше max_width x max_height.
+
+        Args:
+            path (str): Путь к изображению.
+            max_width (int): Максимальная ширина результата.
+            max_height (int): Максимальная высота результата.
+
+        Returns:
+            tuple: (pixbuf, ширина_оригинала, высота_оригинала) или (None, 0, 0) в случае ошибки.
+        """
+        try:
+            info = probe_file(path)
+            if info:
+                width, height = info.width, info.height
+            else:
+                _fmt, width, height = GdkPixbuf.Pixbuf.get_file_info(path)
+            if not width or not height:
+                return None, 0, 0
+            if width <= max_width and height <= max_height:
+                return GdkPixbuf.Pixbuf.new_from_file(path), width, height
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(path, max_width, max_height, True)
+            return pixbuf, width, height
+        except Exception as e:
+            print(f"Ошибка создания уменьшенного Pixbuf из файла {path}: {e}")
+            return None, 0, 0
+
+    @staticmethod
+    def fetch_to_file(url, dest_path, progress_callback=None, timeout=60):
+        """
+        Синхронно загружает изображение по URL потоково прямо в файл.
+
+        Данные пишутся во временный `<dest_path>.part`, который после успешной
+        загрузки переименовывается в `dest_path`. Вызывается из фонового потока.
 
         Args:
             url (str): URL изображения.
-            callback (callable): Функция обратного вызова с аргументом (bytes или None).
-            progress_callback (callable, optional): Функция для обновления прогресса (current, total).
+            dest_path (str): Путь итогового файла.
+            progress_callback (callable, optional): Функция (current, total), вызывается в главном потоке.
             timeout (int): Таймаут запроса в секундах.
+
+        Returns:
+            bool: True, если файл успешно загружен.
         """
-        def worker():
-            try:
-                resp = requests.get(url, stream=True, timeout=timeout)
-                resp.raise_for_status()
+        part_path = dest_path + '.part'
+        try:
+            resp = get_session().get(url, stream=True, timeout=timeout)
+            resp.raise_for_status()
 
-                total_bytes = int(resp.headers.get('content-length', 0))
-                current_bytes = 0
-                image_data = b''
+            total_bytes = int(resp.headers.get('content-length', 0))
+            current_bytes = 0
 
-                for chunk in resp.iter_content(chunk_size=8192):
-                    image_data += chunk
+            with open(part_path, 'wb') as f:
+                for chunk in resp.iter_content(chunk_size=65536):
+                    f.write(chunk)
                     current_bytes += len(chunk)
                     if progress_callback and total_bytes > 0:
                         GLib.idle_add(progress_callback, current_bytes, total_bytes)
 
-                GLib.idle_add(callback, image_data)
-            except Exception as e:
-                print(f"Ошибка загрузки изображения {url}: {e}")
-                GLib.idle_add(callback, None)
+            os.replace(part_path, dest_path)
+            return True
+        except Exception as e:
+            print(f"Ошибка загрузки изображения {url}: {e}")
+            try:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+            except OSError:
+                pass
+            return False
+
+    @staticmethod
+    def download_to_file(url, dest_path, callback, progress_callback=None, timeout=60):
+        """
+        Асинхронно загружает изображение по URL прямо в файл, не держа его в памяти.
+
+        Args:
+            url (str): URL изображения.
+            dest_path (str): Путь итогового файла.
+            callback (callable): Функция обратного вызова с аргументом (путь или None).
+            progress_callback (callable, optional): Функция для обновления прогресса (current, total).
+            timeout (int): Таймаут запроса в секундах.
+        """
+        def worker():
+            ok = ImageLoader.fetch_to_file(url, dest_path, progress_callback, timeout)
+            GLib.idle_add(callback, dest_path if ok else None)
 
         threading.Thread(target=worker, daemon=True).start()
 
     @staticmethod
-    def load_thumbnail(local_path=None, cache_path=None, thumb_url=None, target_size=None, callback=None):
+    def load_thumbnail(local_path=None, cache_path=None, thumb_url=None, target_size=None, callback=None,
+                       is_cancelled=None):
         """
         Загружает миниатюру обоев, пробуя несколько источников.
 
@@ -85,11 +188,27 @@ class ImageLoader:
             thumb_url (str, optional): URL миниатюры.
             target_size (tuple, optional): Целевой размер (width, height).
             callback (callable, optional): Функция обратного вызова (pixbuf, wallpaper_id).
+            is_cancelled (callable, optional): Возвращает True, если результат уже не нужен
+                (например, начат новый поиск) — тогда загрузка и колбэк пропускаются.
 
         Returns:
-            None (загрузка выполняется асинхронно).
+            None (загрузка выполняется асинхронно в общем пуле потоков).
         """
         def worker():
+            if is_cancelled and is_cancelled():
+                metrics.count("thumb.cancelled")
+                return
+            pixbuf = None
+            metrics.gauge_add("thumb.in_flight", 1)
+            try:
+                with metrics.span("thumb.total"):
+                    pixbuf = load()
+            finally:
+                metrics.gauge_add("thumb.in_flight", -1)
+            if callback and not (is_cancelled and is_cancelled()):
+                GLib.idle_add(callback, pixbuf)
+
+        def load():
             pixbuf = None
             target_width, target_height = target_size if target_size else (300, 200)
 
@@ -100,15 +219,16 @@ class ImageLoader:
                     if file_size < 100:
                         raise ValueError("Файл слишком мал")
 
-                    loader = GdkPixbuf.PixbufLoader()
-                    with open(local_path, "rb") as f:
-                        chunk = f.read(1024)
-                        while chunk:
-                            loader.write(chunk)
+                    with metrics.span("thumb.decode", source="local"):
+                        loader = GdkPixbuf.PixbufLoader()
+                        with open(local_path, "rb") as f:
                             chunk = f.read(1024)
-                    loader.close()
+                            while chunk:
+                                loader.write(chunk)
+                                chunk = f.read(1024)
+                        loader.close()
+                        original_pixbuf = loader.get_pixbuf()
 
-                    original_pixbuf = loader.get_pixbuf()
                     if original_pixbuf:
                         width = original_pixbuf.get_width()
                         height = original_pixbuf.get_height()
@@ -117,14 +237,14 @@ class ImageLoader:
                         new_width = max(1, int(width * scale_factor))
                         new_height = max(1, int(height * scale_factor))
 
-                        pixbuf = original_pixbuf.scale_simple(
-                            new_width,
-                            new_height,
-                            GdkPixbuf.InterpType.BILINEAR
-                        )
-                        if pixbuf and callback:
-                            GLib.idle_add(callback, pixbuf)
-                            return
+                        with metrics.span("thumb.scale"):
+                            pixbuf = original_pixbuf.scale_simple(
+                                new_width,
+                                new_height,
+                                GdkPixbuf.InterpType.BILINEAR
+                            )
+                        if pixbuf:
+                            return pixbuf
                 except Exception as e:
                     print(f"❌ Ошибка локальной загрузки {local_path}: {type(e).__name__}: {e}")
 
@@ -133,26 +253,33 @@ class ImageLoader:
                 try:
                     img_data = open(cache_path, "rb").read()
                     if len(img_data) >= 100:
-                        p = ImageLoader.load_pixbuf_from_bytes(img_data)
+                        with metrics.span("thumb.decode", source="cache"):
+                            p = ImageLoader.load_pixbuf_from_bytes(img_data)
                         if p:
-                            pixbuf = p.scale_simple(
-                                target_width, target_height, GdkPixbuf.InterpType.BILINEAR
-                            )
+                            with metrics.span("thumb.scale"):
+                                pixbuf = p.scale_simple(
+                                    target_width, target_height, GdkPixbuf.InterpType.BILINEAR
+                                )
                 except Exception as e:
                     print(f"❌ Ошибка кэша {cache_path}: {e}")
+            if cache_path and not (local_path and os.path.exists(local_path)):
+                metrics.count("thumb.cache_hit" if pixbuf is not None else "thumb.cache_miss")
 
             # 3. СЕТЬ
             if pixbuf is None and thumb_url:
                 try:
-                    resp = requests.get(thumb_url, timeout=15)
-                    resp.raise_for_status()
-                    img_data = resp.content
+                    with metrics.span("thumb.fetch"):
+                        resp = get_session().get(thumb_url, timeout=15)
+                        resp.raise_for_status()
+                        img_data = resp.content
                     if len(img_data) >= 100:
-                        p = ImageLoader.load_pixbuf_from_bytes(img_data)
+                        with metrics.span("thumb.decode", source="network"):
+                            p = ImageLoader.load_pixbuf_from_bytes(img_data)
                         if p:
-                            pixbuf = p.scale_simple(
-                                target_width, target_height, GdkPixbuf.InterpType.BILINEAR
-                            )
+                            with metrics.span("thumb.scale"):
+                                pixbuf = p.scale_simple(
+                                    target_width, target_height, GdkPixbuf.InterpType.BILINEAR
+                                )
 
                             # Сохраняем в кэш
                             if cache_path:
@@ -162,31 +289,30 @@ class ImageLoader:
                                 except Exception as e:
                                     print(f"⚠️ Не удалось сохранить кэш: {e}")
                 except Exception as e:
+                    metrics.count("thumb.errors")
                     print(f"❌ Ошибка сети {thumb_url}: {e}")
 
-            # Финальный вызов
-            if callback:
-                GLib.idle_add(callback, pixbuf if pixbuf else None)
+            return pixbuf if pixbuf else None
 
-        threading.Thread(target=worker, daemon=True).start()
+        get_thumbnail_pool().submit(worker)
 
     @staticmethod
-    def get_image_format_from_bytes(img_bytes):
+    def get_image_format_from_file(path):
         """
-        Определяет формат изображения по его байтам.
+        Определяет формат изображения по файлу без полного декодирования.
 
         Args:
-            img_bytes (bytes): Байты изображения.
+            path (str): Путь к изображению.
 
         Returns:
-            str: Имя формата ('jpeg', 'png', и т.д.) или 'jpeg' по умолчанию.
+            str: Имя формата ('jpeg', 'png', 'webp' и т.д.) или 'jpeg' по умолчанию.
         """
+        info = probe_file(path)
+        if info:
+            return info.format
+        # Прочие форматы — через загрузчики GdkPixbuf
         try:
-            loader = GdkPixbuf.PixbufLoader()
-            loader.write(img_bytes)
-            content_type = loader.get_format().get_name()
-            loader.close()
-            return content_type
+            fmt, _w, _h = GdkPixbuf.Pixbuf.get_file_info(path)
+            return fmt.get_name() if fmt else "jpeg"
         except Exception:
             return "jpeg"
-
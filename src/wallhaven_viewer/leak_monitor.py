@@ -0,0 +1,153 @@
+"""
+Модуль поиска утечек памяти в долгих сессиях.
+
+Включается переменной окружения WALLHAVEN_LEAK_MONITOR (значение — период
+отчёта в секундах, например 60). Периодически печатает:
+    - RSS процесса;
+    - число живых объектов по видам (миниатюры-кнопки, текстуры);
+    - число потоков по именам;
+    - рост памяти по местам выделения (tracemalloc) с прошлого отчёта.
+"""
+
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+
+from wallhaven_viewer import metrics
+
+LEAK_MONITOR_ENV = "WALLHAVEN_LEAK_MONITOR"
+# Глубина стека для tracemalloc
+TRACE_FRAMES = 8
+# Сколько мест выделения показывать в отчёте
+TOP_SITES = 10
+
+_live = Counter()
+_live_lock = threading.Lock()
+
+
+def is_enabled():
+    """True, если мониторинг утечек включён."""
+    return bool(os.environ.get(LEAK_MONITOR_ENV))
+
+
+def _release(kind):
+    with _live_lock:
+        _live[kind] -= 1
+    metrics.gauge_add("live." + kind, -1)
+
+
+def track(kind, gobject):
+    """
+    Учитывает GObject (кнопку, текстуру) до его финализации.
+
+    Используется слабая ссылка GObject, поэтому учёт не продлевает жизнь
+    объекта и ловит именно утечки на стороне GTK, а не Python-обёрток.
+    """
+    if not is_enabled():
+        return
+    with _live_lock:
+        _live[kind] += 1
+    metrics.gauge_add("live." + kind, 1)
+    gobject.weak_ref(_release, kind)
+
+
+def get_live_counts():
+    """Возвращает число живых отслеживаемых объектов по видам."""
+    with _live_lock:
+        return dict(_live)
+
+
+def get_rss_bytes():
+    """Возвращает резидентную память процесса в байтах (0, если недоступно)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        try:
+            import resource
+            # ru_maxrss — пиковое значение (КБ в Linux, байты в macOS)
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return rss if sys.platform == "darwin" else rss * 1024
+        except Exception:
+            return 0
+
+
+def get_thread_counts():
+    """Возвращает число живых потоков по префиксу имени."""
+    return dict(Counter(t.name.split("_")[0].rstrip("-0123456789") for t in threading.enumerate()))
+
+
+class LeakMonitor:
+    """
+    Периодический отчёт о памяти на базе tracemalloc.
+
+    Args:
+        interval (int): Период отчёта в секундах.
+    """
+
+    def __init__(self, interval=60):
+        self.interval = max(5, int(interval))
+        self._previous = None
+        self._source_id = None
+
+    @classmethod
+    def from_env(cls):
+        """Создаёт и запускает монитор, если он включён переменной окружения."""
+        if not is_enabled():
+            return None
+        try:
+            interval = int(os.environ.get(LEAK_MONITOR_ENV) or 60)
+        except ValueError:
+            interval = 60
+        monitor = cls(interval)
+        monitor.start()
+        return monitor
+
+    def start(self):
+        """Включает tracemalloc и периодические отчёты в главном цикле."""
+        from gi.repository import GLib
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        self._previous = self._take_snapshot()
+        self._source_id = GLib.timeout_add_seconds(self.interval, self._on_timer)
+
+    def stop(self):
+        """Останавливает отчёты и tracemalloc."""
+        if self._source_id is not None:
+            from gi.repository import GLib
+            GLib.source_remove(self._source_id)
+            self._source_id = None
+        tracemalloc.stop()
+
+    def _on_timer(self):
+        print(self.report())
+        return True
+
+    def _take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def report(self):
+        """Формирует отчёт и делает новый снимок для следующего сравнения."""
+        snapshot = self._take_snapshot()
+        rss = get_rss_bytes()
+        metrics.gauge("process.rss_mb", round(rss / (1024 * 1024), 1))
+
+        lines = [f"🧪 RSS: {rss / (1024 * 1024):.1f} MB"]
+        lines.append("   Живые объекты: " + (", ".join(f"{k}={v}" for k, v in sorted(get_live_counts().items())) or "нет данных"))
+        lines.append("   Потоки: " + ", ".join(f"{k}={v}" for k, v in sorted(get_thread_counts().items())))
+        if self._previous is not None:
+            lines.append("   Рост по местам выделения:")
+            for stat in snapshot.compare_to(self._previous, "traceback")[:TOP_SITES]:
+                if stat.size_diff <= 0:
+                    continue
+                frame = stat.traceback[0]
+                lines.append(f"     +{stat.size_diff / 1024:.1f} KB ({stat.count_diff:+d} блоков) "
+                             f"{frame.filename}:{frame.lineno}")
+        self._previous = snapshot
+        return "\n".join(lines)
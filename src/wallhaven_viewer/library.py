@@ -0,0 +1,84 @@
+"""
+Модуль индексации локальной библиотеки обоев (папки загрузок) и путей
+к её миниатюрам (сами миниатюры готовит `thumbnailer`).
+
+Не зависит от GTK: используется и главным окном, и консольным режимом.
+"""
+
+import os
+from wallhaven_viewer.utils import extract_wallpaper_id, get_cache_dir
+
+# Расширения файлов библиотеки
+LIBRARY_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def scan_library(download_path):
+    """
+    Сканирует папку загрузок и индексирует все изображения по ID.
+    Поддерживает: wallhaven-<id>.jpg, <id>.jpg, full-<id>.png и т.д.
+
+    Args:
+        download_path (str): Папка загрузок.
+
+    Returns:
+        dict: {ID: путь к файлу}; пустой словарь, если папка не существует.
+    """
+    files = {}
+    if not download_path or not os.path.isdir(download_path):
+        return files
+
+    with os.scandir(download_path) as it:
+        for entry in it:
+            if os.path.splitext(entry.name)[1].lower() not in LIBRARY_EXTENSIONS:
+                continue
+            if not entry.is_file():
+                continue
+            wallpaper_id = extract_wallpaper_id(entry.name)
+            if wallpaper_id:
+                files[wallpaper_id] = entry.path
+    return files
+
+
+def find_existing_file(download_path, wallpaper_id):
+    """
+    Ищет уже скачанный файл обоев в папке загрузок.
+
+    Args:
+        download_path (str): Папка загрузок.
+        wallpaper_id (str): ID обоев.
+
+    Returns:
+        str or None: Путь к файлу или None.
+    """
+    for ext in LIBRARY_EXTENSIONS:
+        for prefix in ('', 'wallhaven-'):
+            path = os.path.join(download_path, f"{prefix}{wallpaper_id}{ext}")
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def get_tiles_dir():
+    """Возвращает папку миниатюр библиотеки в кэше или None."""
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return None
+    tiles_dir = os.path.join(cache_dir, "tiles")
+    os.makedirs(tiles_dir, exist_ok=True)
+    return tiles_dir
+
+
+def get_tile_path(wallpaper_id, tiles_dir=None):
+    """Возвращает путь к миниатюре обоев (файл может ещё не существовать)."""
+    tiles_dir = tiles_dir or get_tiles_dir()
+    if not tiles_dir:
+        return None
+    return os.path.join(tiles_dir, f"{wallpaper_id}.jpg")
+
+
+def is_tile_fresh(tile_path, source_path):
+    """True, если миниатюра существует и не старше исходного файла."""
+    try:
+        return os.path.getmtime(tile_path) >= os.path.getmtime(source_path)
+    except OSError:
+        return False
@@ -2,20 +2,48 @@
 Модуль главного окна приложения.
 """
 
+import gc
 import os
-import glob
+import re
 import threading
 import time
 import gi
 gi.require_version("Gtk", "4.0")
 gi.require_version("Adw", "1")
 from gi.repository import Gtk, Gdk, Gio, GLib, GdkPixbuf, Adw
-from wallhaven_viewer.utils import resolve_path, get_cache_path, extract_wallpaper_id, clean_cache
-from wallhaven_viewer.config import load_settings, save_settings, RESOLUTION_OPTIONS, RATIO_OPTIONS, SORT_OPTIONS
-from wallhaven_viewer.api import WallhavenAPI
-from wallhaven_viewer.image_loader import ImageLoader
-from wallhaven_viewer.settings_window import SettingsWindow
-from wallhaven_viewer.full_image_window import FullImageWindow
+from wallhaven_viewer.utils import get_cache_path, clean_cache
+from wallhaven_viewer.config import load_settings, save_settings_async, flush_settings, get_config_dir, RESOLUTION_OPTIONS, RATIO_OPTIONS, SORT_OPTIONS
+from wallhaven_viewer.resources import new_builder
+from wallhaven_viewer.api import WallhavenAPI, SORT_MODES
+from wallhaven_viewer.image_loader import ImageLoader, shutdown_thumbnail_pool
+from wallhaven_viewer.preloader import Preloader
+from wallhaven_viewer.download_manager import DownloadManager
+from wallhaven_viewer.library import scan_library, get_tile_path, is_tile_fresh
+from wallhaven_viewer.tiled_view import get_screen_size
+from wallhaven_viewer.timeline import mark
+from wallhaven_viewer.session import load_session, save_session
+from wallhaven_viewer import leak_monitor, metrics, stall_monitor
+from wallhaven_viewer.tag_index import get_tag_index, peek_tag_index, preload_tag_index, save_tag_index, format_tag_query
+from wallhaven_viewer.wallpaper import get_wallpaper_backends
+from wallhaven_viewer.rendition import make_rendition, prune_renditions
+from wallhaven_viewer.collections_cache import CollectionCache, load_collection_list, fetch_collection_list
+
+# Окно (мс), в котором изменения фильтров объединяются в один поиск
+FILTER_DEBOUNCE_MS = 350
+# Сколько обоев показывать при поиске по цвету в режиме «Только скачанные»
+COLOR_SEARCH_LIMIT = 200
+# Пауза (мс) после изменения мониторов перед пересозданием копии обоев
+MONITORS_SETTLE_MS = 1000
+# Автодополнение тегов: минимальная длина ввода и число подсказок
+SUGGEST_MIN_CHARS = 2
+SUGGEST_LIMIT = 8
+# Сколько экранов сетки выше и ниже видимой области сохраняют текстуры
+# миниатюр при предупреждении о нехватке памяти (по уровню предупреждения)
+MEMORY_KEEP_SCREENS = {'low': 2.0, 'medium': 0.5, 'critical': 0.0}
+# В каких пределах (в экранах) выгруженные миниатюры загружаются снова при прокрутке
+RELOAD_SCREENS = 1.0
+# Сколько плиток восстановленной выдачи создаётся за один проход главного цикла
+RESTORE_CHUNK = 60
 
 
 class MainWindow(Adw.ApplicationWindow):
@@ -51,17 +79,61 @@ class MainWindow(Adw.ApplicationWindow):
         self.downloaded_files = {}
         # Множество ID для быстрых проверок в UI
         self.downloaded_ids = set()
+        # Сканирование библиотеки идёт в фоне; режим «Только скачанные» ждёт его завершения
+        self.library_ready = False
+        self._waiting_for_library = False
+        self._scan_added = {}
+        # Цветовой индекс библиотеки (NumPy) загружается при первом поиске по цвету
+        self._color_index = None
+        self._color_index_lock = threading.Lock()
+        # Индекс сверяется с библиотекой после её сканирования и новых загрузок, а не на каждый запрос
+        self._color_index_fresh = False
 
         self.is_downloaded_mode = False
-
-        # ЗАГРУЗКА UI
-        ui_path = resolve_path("mainwindow.ui")
-        if not os.path.exists(ui_path):
-            print(f"КРИТИЧЕСКАЯ ОШИБКА: Файл {ui_path} не найден!")
+        # Открытая коллекция Wallhaven ({'id', 'label'}) или None; её содержимое
+        # кэшируется локально (`_collection_cache`) и ревалидируется при открытии
+        self.collection_mode = None
+        self._collection_cache = None
+        self.collections = []
+
+        # Текущая выдача в порядке отображения: (thumb_url, full_url, wallpaper_id, local_path).
+        # Используется окном просмотра для перехода к соседним обоям.
+        self.result_items = []
+        # Кнопки-миниатюры текущей выдачи по ID обоев
+        self.tile_buttons = {}
+        # Основной цвет обоев по ID (фон заглушки, пока грузится миниатюра)
+        self.result_colors = {}
+        self._swatch_classes = set()
+        self._swatch_provider = None
+        # Поколение выдачи: увеличивается при каждом новом поиске, чтобы
+        # загрузки миниатюр старой выдачи не трогали удалённые кнопки
+        self.search_generation = 0
+        # Seed случайной выдачи: все страницы одного поиска берутся из одной перестановки
+        self.search_seed = None
+        # Токен восстановленной сессии; сбрасывается новым поиском
+        self._session_token = None
+        # Отложенный поиск после изменения фильтров
+        self._filter_timeout_id = None
+        # Текст в поле поиска → точный запрос по тегу (id:NNN) для выбранных подсказок
+        self._tag_query = None
+        self._suppress_suggestions = False
+        self.preloader = Preloader(get_screen_size())
+        self._monitors_timeout_id = None
+        # Миниатюры, выгруженные при нехватке памяти или отложенные при
+        # восстановлении сессии, загружаются при прокрутке к ним
+        self._unloaded_tiles = 0
+        # Хвост восстановленной выдачи, плитки которого ещё создаются в idle
+        self._restore_pending = []
+        self._reload_idle_id = None
+        self._memory_monitor = None
+
+        # ЗАГРУЗКА UI (из бандла ресурсов, в dev-режиме — с диска)
+        try:
+            builder = new_builder("mainwindow.ui")
+        except GLib.Error as e:
+            print(f"КРИТИЧЕСКАЯ ОШИБКА: не удалось загрузить mainwindow.ui: {e}")
             return
 
-        builder = Gtk.Builder.new_from_file(ui_path)
-
         content = builder.get_object("root")
         if not content:
             raise RuntimeError("root container not found in mainwindow.ui")
@@ -70,6 +142,7 @@ class MainWindow(Adw.ApplicationWindow):
 
         self.builder = builder
         self.entry = builder.get_object("entry")
+        self._entry_placeholder = self.entry.get_placeholder_text()
         self.btn_search = builder.get_object("btn_search")
 
         self.primary_menu_btn = builder.get_object("primary_menu_btn")
@@ -92,11 +165,18 @@ class MainWindow(Adw.ApplicationWindow):
         self.bottom_spinner = builder.get_object("bottom_spinner")
 
         self.btn_downloaded = builder.get_object("btn_downloaded")
+        self.download_progress = builder.get_object("download_progress")
 
         self.flowbox.set_valign(Gtk.Align.START)
+        # Множественный выбор миниатюр (Ctrl+клик) для массовой загрузки
+        self.flowbox.set_selection_mode(Gtk.SelectionMode.MULTIPLE)
+        self.flowbox.set_activate_on_single_click(False)
 
         # Настройка виджетов
-        self.entry.set_text(self.current_query)
+        # Словарь тегов разбирается в фоне, а не при первой подсказке в главном потоке
+        preload_tag_index(lambda index: GLib.idle_add(self.on_tag_index_loaded))
+        self.setup_tag_suggestions()
+        self.set_entry_query(self.current_query)
         self.btn_general.set_active(self.settings['cat_general'].lower() == 'true')
         self.btn_anime.set_active(self.settings['cat_anime'].lower() == 'true')
         self.btn_people.set_active(self.settings['cat_people'].lower() == 'true')
@@ -139,6 +219,14 @@ class MainWindow(Adw.ApplicationWindow):
         self.flowbox.set_max_children_per_line(cols)
 
         # --- ЗАПУСК ---
+        # Наблюдение за зависаниями главного цикла: при открытом окне «Диагностика»
+        # или всё время при WALLHAVEN_STALL_MONITOR
+        self.stall_monitor = stall_monitor.StallMonitor()
+        if stall_monitor.is_enabled():
+            self.stall_monitor.start()
+        # Отчёты об утечках памяти (WALLHAVEN_LEAK_MONITOR=<секунды>)
+        self.leak_monitor = leak_monitor.LeakMonitor.from_env()
+
         # Асинхронный запуск очистки кэша (файлы старше 7 дней)
         try:
             import threading
@@ -146,19 +234,506 @@ class MainWindow(Adw.ApplicationWindow):
         except Exception:
             pass
 
+        # Очередь массовой загрузки; незавершённые задачи продолжаются после перезапуска
+        self.download_manager = DownloadManager(
+            parallelism=int(self.settings.get('download_parallelism', 3)),
+            bandwidth_kbps=int(self.settings.get('download_bandwidth_kbps', 0)),
+            journal_path=os.path.join(get_config_dir(), "downloads.json"),
+            on_progress=lambda stats: GLib.idle_add(self.on_download_progress, stats),
+            on_job_finished=lambda job: GLib.idle_add(self.on_download_finished, job),
+        )
+
+        # Копия обоев под экран пересоздаётся при смене мониторов или их разрешения
+        self.watch_monitors()
+        GLib.idle_add(self.refresh_wallpaper_rendition)
+        self.watch_memory_pressure()
+
+        # Сканирование библиотеки не блокирует первый поиск: результаты применяются по готовности
         self.scan_downloaded_wallpapers()
-        self.start_new_search(self.current_query)
+        self.load_collections()
+        if not self.restore_session():
+            self.start_new_search(self.current_query)
+        self.download_manager.resume()
+        mark("ui_built")
+
+    def restore_session(self):
+        """
+        Восстанавливает выдачу, страницы и прокрутку из снимка прошлой сессии.
+
+        Миниатюры берутся из дискового кэша; первая страница затем
+        перепроверяется через API в фоне. Сразу создаются плитки до сохранённой
+        позиции прокрутки, а миниатюры загружаются только для видимых; хвост
+        выдачи добавляется порциями по RESTORE_CHUNK в idle.
+
+        Returns:
+            bool: True, если снимок подошёл к текущему запросу и фильтрам.
+        """
+        snapshot = load_session(self.current_query, self.get_current_search_state())
+        if not snapshot:
+            return False
+
+        self.current_page = snapshot['page']
+        self.has_more_pages = snapshot['has_more']
+        self.search_seed = snapshot['seed'] or WallhavenAPI.new_seed()
+        items = snapshot['items']
+        load_range = self.get_restore_range(snapshot['scroll'])
+        self._restore_pending = items[load_range[1]:]
+        self.create_placeholders_and_load(items[:load_range[1]], snapshot['colors'], load_range)
+        if self._restore_pending:
+            # Следующие страницы подгружаются только после всей восстановленной выдачи
+            self.is_loading = True
+            GLib.idle_add(self.restore_next_chunk, self.search_generation, snapshot['colors'])
+        self.restore_scroll(snapshot['scroll'])
+        self._session_token = token = object()
+        self.revalidate_session(token, [item[2] for item in snapshot['items']])
+        mark("session_restored")
+        return True
+
+    def get_restore_range(self, scroll):
+        """
+        Оценивает по сохранённой прокрутке диапазон индексов [начало, конец)
+        плиток, видимых после восстановления, с запасом RELOAD_SCREENS экранов.
+        """
+        cols = max(1, int(self.settings.get('columns', 4)))
+        _width, height = self.get_thumbnail_size()
+        row_height = height + 10  # поля плитки сверху и снизу
+        view_height = self.get_height() if self.get_height() > 1 else self.get_default_size()[1]
+        first_row = int(max(0.0, scroll - view_height * RELOAD_SCREENS) // row_height)
+        last_row = int((scroll + view_height * (1 + RELOAD_SCREENS)) // row_height) + 1
+        return first_row * cols, last_row * cols
+
+    def restore_next_chunk(self, generation, colors):
+        """Добавляет очередную порцию плиток восстановленной выдачи (без загрузки миниатюр)."""
+        if generation != self.search_generation:
+            return False
+        chunk = self._restore_pending[:RESTORE_CHUNK]
+        self._restore_pending = self._restore_pending[RESTORE_CHUNK:]
+        self.create_placeholders_and_load(chunk, colors, (0, 0))
+        if self._restore_pending:
+            return True
+        self.is_loading = False
+        # Оценка видимого диапазона могла промахнуться — догружаем то, что на экране
+        self.schedule_tile_reload()
+        GLib.idle_add(self.check_if_can_load_next_page)
+        return False
+
+    def restore_scroll(self, value, timeout_ms=2000):
+        """Прокручивает сетку к `value`, как только высота содержимого это позволит."""
+        if value <= 0:
+            return
+        state = {'handler': None}
+
+        def disconnect():
+            if state['handler'] is not None:
+                self.v_adj.disconnect(state['handler'])
+                state['handler'] = None
+            return False
+
+        def on_changed(adj):
+            if adj.get_upper() - adj.get_page_size() >= value:
+                disconnect()
+                adj.set_value(value)
+
+        state['handler'] = self.v_adj.connect("changed", on_changed)
+        GLib.timeout_add(timeout_ms, disconnect)
+
+    def revalidate_session(self, token, restored_ids):
+        """
+        Проверяет в фоне, не изменилась ли первая страница восстановленной выдачи.
+
+        Если изменилась, а пользователь ещё не прокрутил сетку, — выдача
+        перезагружается; иначе показывается подсказка.
+        """
+        search_settings = {**self.settings, **self.get_current_search_state()}
+        if WallhavenAPI.build_search_params(search_settings, self.current_query, 1).get('sorting') == SORT_MODES[1]:
+            # Случайная выдача при каждом запросе разная — сравнивать нечего
+            return
+        query = self.current_query
+
+        def worker():
+            data, _meta = WallhavenAPI.search_wallpapers(query, 1, search_settings)
+            if data is None:
+                return
+            fresh_ids = [w.get('id') for w in data if w.get('id')]
+            if fresh_ids != restored_ids[:len(fresh_ids)]:
+                GLib.idle_add(on_changed)
+
+        def on_changed():
+            if self._session_token is not token:
+                return False
+            if self.v_adj.get_value() < 1:
+                self.start_new_search(query)
+            else:
+                self.show_infobar("Выдача обновилась — нажмите «Поиск», чтобы увидеть новые обои")
+            return False
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def save_session(self):
+        """Сохраняет снимок текущей выдачи для восстановления при следующем запуске."""
+        if self.is_downloaded_mode or self.collection_mode or not self.result_items:
+            return
+        save_session(
+            self.current_query,
+            self.get_current_search_state(),
+            self.result_items + self._restore_pending,
+            self.result_colors,
+            self.current_page,
+            self.has_more_pages,
+            self.v_adj.get_value(),
+            self.search_seed,
+        )
 
-    def search_and_present(self, query):
+    def apply_swatch(self, btn, color):
+        """
+        Окрашивает заглушку миниатюры в основной цвет обоев.
+
+        Палитра Wallhaven ограничена, поэтому на каждый цвет заводится один
+        CSS-класс в общем провайдере.
+        """
+        if not color or not re.fullmatch(r'#?[0-9a-fA-F]{6}', color):
+            return
+        css_class = "swatch-" + color.lstrip('#').lower()
+        if css_class not in self._swatch_classes:
+            self._swatch_classes.add(css_class)
+            css = "".join(
+                f".thumbnail.skeleton.{c} {{ background-color: #{c[len('swatch-'):]}; }}\n"
+                for c in sorted(self._swatch_classes)
+            )
+            if self._swatch_provider is None:
+                self._swatch_provider = Gtk.CssProvider()
+                Gtk.StyleContext.add_provider_for_display(
+                    Gdk.Display.get_default(),
+                    self._swatch_provider,
+                    Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
+                )
+            if hasattr(self._swatch_provider, 'load_from_string'):
+                self._swatch_provider.load_from_string(css)
+            else:
+                self._swatch_provider.load_from_data(css, -1)
+        btn.add_css_class(css_class)
+
+    def search_and_present(self, query, display=None):
         """Внешний вызов поиска — устанавливает текст в строке поиска и запускает поиск."""
         try:
-            self.entry.set_text(query)
+            self.collection_mode = None
+            self.set_entry_query(query, display)
             self.entry.grab_focus()
             self.start_new_search(query)
             self.present()
         except Exception as e:
             print(f"Ошибка при запуске поиска по тегу: {e}")
 
+    def search_tag(self, tag_id, name):
+        """Точный поиск по ID тега; в строке поиска остаётся имя тега."""
+        self.search_and_present(format_tag_query(tag_id), name)
+
+    def setup_tag_suggestions(self):
+        """Создаёт всплывающий список подсказок тегов под строкой поиска."""
+        self.suggest_list = Gtk.ListBox()
+        self.suggest_list.set_selection_mode(Gtk.SelectionMode.BROWSE)
+        self.suggest_list.connect("row-activated", self.on_suggestion_activated)
+
+        self.suggest_popover = Gtk.Popover()
+        # Без autohide popover не забирает фокус у поля ввода
+        self.suggest_popover.set_autohide(False)
+        self.suggest_popover.set_has_arrow(False)
+        self.suggest_popover.set_position(Gtk.PositionType.BOTTOM)
+        self.suggest_popover.set_child(self.suggest_list)
+        self.suggest_popover.set_parent(self.entry)
+
+        self.entry.connect("changed", self.on_entry_changed)
+        keys = Gtk.EventControllerKey()
+        keys.connect("key-pressed", self.on_entry_key_pressed)
+        self.entry.add_controller(keys)
+
+    def set_entry_query(self, query, display=None):
+        """
+        Показывает запрос в строке поиска; id:NNN известного тега — его именем
+        (или `display`, если имя уже известно вызывающему).
+        """
+        text = display or query
+        match = re.fullmatch(r"id:(\d+)", query or "")
+        if match and not display:
+            # Пока словарь грузится в фоне, запрос показывается как есть (см. on_tag_index_loaded)
+            index = peek_tag_index()
+            record = index.get(int(match.group(1))) if index else None
+            if record:
+                text = record['name']
+        self._suppress_suggestions = True
+        self.entry.set_text(text)
+        self._suppress_suggestions = False
+        # Подмена имени на id:NNN действует, только пока текст в строке не правили
+        self._tag_query = (text, query) if text != query else None
+
+    def on_tag_index_loaded(self):
+        """Показывает имя тега вместо id:NNN, если словарь догрузился после заполнения строки поиска."""
+        text = self.entry.get_text().strip()
+        if re.fullmatch(r"id:\d+", text):
+            self.set_entry_query(text)
+        return False
+
+    def get_search_query(self):
+        """Возвращает запрос для API: имя выбранного тега заменяется на id:NNN."""
+        text = self.entry.get_text().strip()
+        if self._tag_query and self._tag_query[0] == text:
+            return self._tag_query[1]
+        return text
+
+    def on_entry_changed(self, entry):
+        """Обновляет подсказки тегов по введённому началу."""
+        prefix = entry.get_text().strip()
+        if not self._suppress_suggestions:
+            # Пользователь правит текст — выбранный ранее тег больше не действует
+            self._tag_query = None
+        if (self._suppress_suggestions or self.is_downloaded_mode
+                or len(prefix) < SUGGEST_MIN_CHARS or prefix.startswith("id:")):
+            self.suggest_popover.popdown()
+            return
+
+        index = peek_tag_index()
+        if index is None:
+            # Словарь ещё загружается в фоне
+            return
+        with metrics.span("tags.suggest"):
+            records = index.suggest(prefix, SUGGEST_LIMIT)
+        if not records or (len(records) == 1 and records[0]['name'].lower() == prefix.lower()):
+            self.suggest_popover.popdown()
+            return
+
+        self.suggest_list.remove_all()
+        for record in records:
+            row = Gtk.ListBoxRow()
+            box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
+            box.set_margin_start(6)
+            box.set_margin_end(6)
+            name = Gtk.Label(label=record['name'], xalign=0)
+            name.set_hexpand(True)
+            box.append(name)
+            details = Gtk.Label(label=f"{record['category']} · {record['count']}".strip(" ·"), xalign=1)
+            details.add_css_class("dim-label")
+            box.append(details)
+            row.set_child(box)
+            row.wallhaven_tag = record
+            self.suggest_list.append(row)
+        self.suggest_popover.popup()
+
+    def on_entry_key_pressed(self, controller, keyval, keycode, state):
+        """Стрелка вниз переводит фокус в подсказки, Escape их скрывает."""
+        if not self.suggest_popover.get_visible():
+            return False
+        if keyval == Gdk.KEY_Down:
+            row = self.suggest_list.get_row_at_index(0)
+            if row:
+                row.grab_focus()
+            return True
+        if keyval == Gdk.KEY_Escape:
+            self.suggest_popover.popdown()
+            return True
+        return False
+
+    def on_suggestion_activated(self, listbox, row):
+        """Выбор подсказки: точный поиск по ID тега."""
+        record = row.wallhaven_tag
+        self.suggest_popover.popdown()
+        self.set_entry_query(format_tag_query(record['id']), record['name'])
+        self.entry.grab_focus()
+        self.on_search_clicked(None)
+
+    def set_desktop_wallpaper(self, source_path, on_done=None):
+        """
+        Устанавливает обои рабочего стола, при включённой подгонке — через
+        копию под размер экрана (готовится в фоне).
+
+        Args:
+            source_path (str): Оригинал обоев.
+            on_done (callable, optional): on_done(success) в главном потоке.
+        """
+        if not source_path or not os.path.exists(source_path):
+            print("❌ Нет локального файла — нельзя установить обои")
+            if on_done:
+                on_done(False)
+            return
+        mode = self.settings.get('wallpaper_fit', 'original')
+        size = get_screen_size(self)
+
+        def on_applied(ok, backend, applied_path):
+            if ok:
+                self.settings = {**self.settings, 'wallpaper_source': source_path,
+                                 'wallpaper_applied': applied_path}
+                save_settings_async(self.settings)
+            else:
+                self.show_infobar("Не удалось установить обои")
+            if on_done:
+                on_done(ok)
+
+        def apply(path):
+            get_wallpaper_backends().apply(path, lambda ok, backend: on_applied(ok, backend, path))
+            return False
+
+        def fail():
+            on_applied(False, None, None)
+            return False
+
+        def worker():
+            try:
+                path = make_rendition(source_path, size, mode)
+            except Exception as e:
+                print(f"Ошибка подготовки обоев: {e}")
+                GLib.idle_add(fail)
+                return
+            GLib.idle_add(apply, path)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def watch_monitors(self):
+        """Подписывается на подключение мониторов и смену их разрешения."""
+        monitors = Gdk.Display.get_default().get_monitors()
+        monitors.connect("items-changed", self.on_monitors_changed)
+        self.on_monitors_changed(monitors, 0, 0, monitors.get_n_items())
+
+    def on_monitors_changed(self, monitors, position, removed, added):
+        """Следит за геометрией новых мониторов и откладывает пересоздание копии обоев."""
+        for i in range(position, position + added):
+            monitor = monitors.get_item(i)
+            monitor.connect("notify::geometry", lambda *args: self.schedule_wallpaper_refresh())
+            monitor.connect("notify::scale-factor", lambda *args: self.schedule_wallpaper_refresh())
+        if removed or added:
+            self.schedule_wallpaper_refresh()
+
+    def schedule_wallpaper_refresh(self):
+        """Объединяет серию изменений мониторов в одно пересоздание копии."""
+        if self._monitors_timeout_id is not None:
+            GLib.source_remove(self._monitors_timeout_id)
+        self._monitors_timeout_id = GLib.timeout_add(MONITORS_SETTLE_MS, self.refresh_wallpaper_rendition)
+
+    def watch_memory_pressure(self):
+        """Подписывается на предупреждения системы о нехватке памяти."""
+        try:
+            self._memory_monitor = Gio.MemoryMonitor.dup_default()
+            self._memory_monitor.connect("low-memory-warning", self.on_low_memory_warning)
+        except Exception as e:
+            print(f"Мониторинг памяти недоступен: {e}")
+
+    def on_low_memory_warning(self, monitor, level):
+        """
+        Освобождает память по уровню предупреждения:
+          - low      — миниатюры дальше двух экранов от видимой области,
+                       предзагрузка вне окна соседей;
+          - medium   — плюс миниатюры за пределами полуэкрана, полное
+                       разрешение в окне просмотра, цветовой индекс;
+          - critical — все невидимые миниатюры, весь кэш предзагрузки.
+        Выгруженные миниатюры снова загружаются при прокрутке к ним.
+        """
+        if level >= Gio.MemoryMonitorWarningLevel.CRITICAL:
+            severity = 'critical'
+        elif level >= Gio.MemoryMonitorWarningLevel.MEDIUM:
+            severity = 'medium'
+        else:
+            severity = 'low'
+        metrics.count("memory.warnings")
+
+        unloaded = self.unload_offscreen_tiles(MEMORY_KEEP_SCREENS[severity])
+        if severity == 'critical':
+            self.preloader.clear()
+            released = "весь кэш предзагрузки"
+        else:
+            released = f"записей предзагрузки: {self.preloader.trim()}"
+        if severity != 'low':
+            full_window = getattr(self, '_full_image_window', None)
+            if full_window:
+                full_window.release_memory(critical=severity == 'critical')
+            # Индекс загрузится снова при следующем поиске по цвету;
+            # если он сейчас занят поиском, не ждём
+            if self._color_index_lock.acquire(blocking=False):
+                self._color_index = None
+                self._color_index_lock.release()
+        if severity == 'critical':
+            gc.collect()
+        print(f"⚠️  Мало памяти ({severity}): выгружено миниатюр {unloaded}, {released}")
+
+    def get_view_range(self, screens):
+        """Возвращает границы (верх, низ) видимой области сетки, расширенной на `screens` экранов."""
+        top = self.v_adj.get_value()
+        page = self.v_adj.get_page_size()
+        return top - page * screens, top + page * (1 + screens)
+
+    def is_tile_in_range(self, btn, view_range):
+        """True, если миниатюра пересекает область `view_range` (координаты сетки)."""
+        child = btn.get_parent()
+        if child is None:
+            return False
+        alloc = child.get_allocation()
+        top, bottom = view_range
+        return alloc.y + alloc.height >= top and alloc.y <= bottom
+
+    def unload_offscreen_tiles(self, screens):
+        """
+        Возвращает миниатюры вдали от видимой области к заглушкам, освобождая текстуры.
+
+        Returns:
+            int: Сколько миниатюр выгружено.
+        """
+        view_range = self.get_view_range(screens)
+        unloaded = 0
+        for btn in self.tile_buttons.values():
+            if not getattr(btn, 'wallhaven_loaded', False) or self.is_tile_in_range(btn, view_range):
+                continue
+            btn.set_child(None)
+            btn.add_css_class("skeleton")
+            btn.wallhaven_loaded = False
+            btn.wallhaven_unloaded = True
+            unloaded += 1
+        self._unloaded_tiles += unloaded
+        if unloaded:
+            metrics.count("memory.tiles_unloaded", unloaded)
+        return unloaded
+
+    def schedule_tile_reload(self):
+        """Планирует загрузку выгруженных миниатюр, оказавшихся рядом с видимой областью."""
+        if self._unloaded_tiles and self._reload_idle_id is None:
+            self._reload_idle_id = GLib.idle_add(self.reload_visible_tiles)
+
+    def reload_visible_tiles(self):
+        """Снова загружает выгруженные миниатюры в пределах RELOAD_SCREENS от видимой области."""
+        self._reload_idle_id = None
+        view_range = self.get_view_range(RELOAD_SCREENS)
+        for btn in self.tile_buttons.values():
+            if not getattr(btn, 'wallhaven_unloaded', False) or not self.is_tile_in_range(btn, view_range):
+                continue
+            index = getattr(btn, 'wallhaven_index', -1)
+            if not 0 <= index < len(self.result_items):
+                continue
+            btn.wallhaven_unloaded = False
+            self._unloaded_tiles -= 1
+            thumb_url, full_url, wallpaper_id, local_path = self.result_items[index]
+            # Миниатюры лежат в дисковом кэше, повторная загрузка обычно обходится без сети
+            self.load_thumbnail_async(btn, thumb_url, full_url, wallpaper_id, local_path)
+        return False
+
+    def refresh_wallpaper_rendition(self):
+        """
+        Переустанавливает обои, если копия под текущий экран отличается от
+        установленной (другое разрешение или режим подгонки).
+        """
+        self._monitors_timeout_id = None
+        source = self.settings.get('wallpaper_source', '')
+        mode = self.settings.get('wallpaper_fit', 'original')
+        applied = self.settings.get('wallpaper_applied', '')
+        if not source or not os.path.exists(source) or (mode == 'original' and applied in ('', source)):
+            return False
+        size = get_screen_size(self)
+
+        def worker():
+            path = make_rendition(source, size, mode)
+            if mode != 'original':
+                prune_renditions(size)
+            if path != applied:
+                GLib.idle_add(self.set_desktop_wallpaper, source)
+
+        threading.Thread(target=worker, daemon=True).start()
+        return False
+
     def setup_menu_actions(self):
         """Создает меню и привязывает действия (Actions)."""
         # 1. Создаем группу действий для окна
@@ -175,40 +750,224 @@ class MainWindow(Adw.ApplicationWindow):
         action_about.connect("activate", self.show_about_dialog)
         action_group.add_action(action_about)
 
+        # Массовая загрузка: выбранные миниатюры или вся текущая выдача
+        action_download_selected = Gio.SimpleAction.new("download-selected", None)
+        action_download_selected.connect("activate", self.on_download_selected)
+        action_group.add_action(action_download_selected)
+
+        action_download_page = Gio.SimpleAction.new("download-page", None)
+        action_download_page.connect("activate", self.on_download_page)
+        action_group.add_action(action_download_page)
+
+        action_warm_tiles = Gio.SimpleAction.new("warm-tiles", None)
+        action_warm_tiles.connect("activate", self.on_warm_tiles)
+        action_group.add_action(action_warm_tiles)
+
+        action_diagnostics = Gio.SimpleAction.new("diagnostics", None)
+        action_diagnostics.connect("activate", self.open_diagnostics)
+        action_group.add_action(action_diagnostics)
+
+        # Коллекции пользователя: параметр — ID коллекции
+        action_open_collection = Gio.SimpleAction.new("open-collection", GLib.VariantType.new("s"))
+        action_open_collection.connect("activate", self.on_open_collection)
+        action_group.add_action(action_open_collection)
+
         # 4. Создаем модель меню
         menu = Gio.Menu()
+        downloads_section = Gio.Menu()
+        downloads_section.append("Скачать выбранные (Ctrl+клик)", "win.download-selected")
+        downloads_section.append("Скачать всю выдачу", "win.download-page")
+        downloads_section.append("Подготовить миниатюры библиотеки", "win.warm-tiles")
+        menu.append_section(None, downloads_section)
+        # Заполняется после загрузки списка коллекций (см. load_collections)
+        self.collections_menu = Gio.Menu()
+        menu.append_submenu("Коллекции", self.collections_menu)
         menu.append("Настройки", "win.preferences")
+        menu.append("Диагностика", "win.diagnostics")
         menu.append("О приложении", "win.about")
 
         # 5. Привязываем меню к кнопке
         self.primary_menu_btn.set_menu_model(menu)
 
+    def load_collections(self):
+        """
+        Показывает в меню коллекции пользователя: сначала из кэша, затем
+        обновлённый список от API (в фоновом потоке).
+        """
+        settings = dict(self.settings)
+        if not settings.get('api_key') and not settings.get('username'):
+            self.update_collections_menu([])
+            return
+
+        def worker():
+            cached = load_collection_list(settings.get('username', ''))
+            if cached:
+                GLib.idle_add(self.update_collections_menu, cached)
+            collections = fetch_collection_list(settings)
+            if collections is not None:
+                GLib.idle_add(self.update_collections_menu, collections)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def update_collections_menu(self, collections):
+        """Перестраивает подменю «Коллекции» (в главном потоке)."""
+        self.collections = collections
+        self.collections_menu.remove_all()
+        for collection in collections:
+            item = Gio.MenuItem.new(f"{collection.get('label', '')} ({collection.get('count', 0)})", None)
+            item.set_action_and_target_value("win.open-collection", GLib.Variant("s", str(collection['id'])))
+            self.collections_menu.append_item(item)
+        if not collections:
+            # Пункт без действия показывается неактивным
+            self.collections_menu.append("Нет коллекций (нужны API-ключ или имя пользователя)", None)
+        return False
+
+    def on_open_collection(self, action, param):
+        """Открывает коллекцию в сетке вместо выдачи поиска."""
+        collection_id = param.get_string()
+        if not self.settings.get('username'):
+            self.show_infobar("Укажите имя пользователя Wallhaven в настройках, чтобы открывать коллекции")
+            return
+        label = next((c.get('label', '') for c in self.collections if str(c['id']) == collection_id), '')
+        self.cancel_pending_filter_change()
+        if self.is_downloaded_mode:
+            self.is_downloaded_mode = False
+            self.btn_downloaded.set_active(False)
+            self.entry.set_placeholder_text(self._entry_placeholder)
+        self.collection_mode = {'id': collection_id, 'label': label}
+        self._collection_cache = None
+        self.start_new_search(self.current_query)
+        self.show_infobar(f"Коллекция «{label}». Нажмите «Поиск», чтобы вернуться к выдаче.")
+
+    def load_collection_page(self, page):
+        """
+        Загружает страницу открытой коллекции: при открытии кэш сверяется с API
+        (обычно одним запросом), дальше страницы берутся из кэша, а недостающие
+        дозапрашиваются и дописываются в него.
+        """
+        if page > 1:
+            self.bottom_spinner.set_visible(True)
+        settings = {**self.settings, **self.get_current_search_state()}
+        username = settings.get('username', '')
+        collection = self.collection_mode
+        cache = None if page == 1 else self._collection_cache
+        generation = self.search_generation
+
+        def deliver(func, *args):
+            def apply():
+                if generation == self.search_generation:
+                    func(*args)
+                return False
+            GLib.idle_add(apply)
+
+        def worker():
+            nonlocal cache
+            if cache is None:
+                cache = CollectionCache.load(username, collection['id'], WallhavenAPI.build_purity(settings))
+                changed = cache.revalidate(settings)
+                if changed is None and cache.items:
+                    deliver(self.show_infobar, "Коллекция недоступна — показана сохранённая копия")
+                elif changed:
+                    cache.save()
+                deliver(self.set_collection_cache, cache)
+
+            cached_count = len(cache.items)
+            items, more = cache.get_page(page, settings)
+            if items is None:
+                deliver(self.show_infobar, "Ошибка API")
+                deliver(self.finish_loading_page, False)
+                return
+            if len(cache.items) != cached_count:
+                cache.save()
+            if not items and page == 1:
+                deliver(self.show_infobar, f"Коллекция «{collection['label']}» пуста")
+
+            items_to_add = []
+            colors = {}
+            for item in items:
+                if item.get('thumb') and item.get('path'):
+                    items_to_add.append((item['thumb'], item['path'], item['id'], None))
+                    if item.get('color'):
+                        colors[item['id']] = item['color']
+            deliver(self.create_placeholders_and_load, items_to_add, colors)
+            deliver(self.finish_loading_page, more)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def set_collection_cache(self, cache):
+        """Запоминает кэш открытой коллекции для следующих страниц."""
+        self._collection_cache = cache
+
     def scan_downloaded_wallpapers(self):
         """
-        Сканирует папку загрузок и индексирует все изображения по ID.
+        Сканирует папку загрузок в фоновом потоке и индексирует все изображения по ID.
         Поддерживает: wallhaven-<id>.jpg, <id>.jpg, full-<id>.png и т.д.
         """
-        self.downloaded_files = {}
-        self.downloaded_ids.clear()
-
         download_path = self.settings.get('download_path', '')
         if not download_path or not os.path.isdir(download_path):
             print(f"❌ Папка для загрузок не задана или не существует: {download_path}")
+            self.apply_library_scan({})
             return
 
-        print(f"🔍 Сканируем папку: {download_path}")
+        self._scan_added = {}
+        self._color_index_fresh = False
 
-        # Поддержка разных расширений
-        for ext in ['*.jpg', '*.jpeg', '*.png']:
-            pattern = os.path.join(download_path, ext)
-            for file_path in glob.glob(pattern):
-                filename = os.path.basename(file_path)
-                wallpaper_id = extract_wallpaper_id(filename)
-                if wallpaper_id:
-                    self.downloaded_files[wallpaper_id] = file_path
+        def worker():
+            print(f"🔍 Сканируем папку: {download_path}")
+            files = scan_library(download_path)
+            GLib.idle_add(self.apply_library_scan, files)
+            # Теги из sidecar пополняют словарь автодополнения
+            if get_tag_index().index_library(files):
+                save_tag_index()
+            self.refresh_color_index(download_path, files)
+
+        threading.Thread(target=worker, daemon=True).start()
 
-        self.downloaded_ids = set(self.downloaded_files.keys())
+    def refresh_color_index(self, download_path, files):
+        """
+        Досчитывает цветовой индекс после сканирования библиотеки (в фоновом потоке).
+
+        Индекс обновляется, только если уже есть на диске: кто не пользуется
+        поиском по цвету, не платит за миниатюры и гистограммы.
+        """
+        try:
+            from wallhaven_viewer.color_index import ColorIndex, get_index_path
+        except ImportError:
+            return
+        index_path = get_index_path()
+        if not index_path or not os.path.exists(index_path):
+            return
+        with self._color_index_lock:
+            if self._color_index is None:
+                self._color_index = ColorIndex.load()
+            if self._color_index.update(download_path, library=files):
+                self._color_index.save()
+            self._color_index_fresh = True
+
+    def apply_library_scan(self, files):
+        """
+        Применяет результаты сканирования библиотеки (в главном потоке):
+        отмечает уже показанные миниатюры и обновляет режим «Только скачанные».
+        """
+        # Загрузки, завершившиеся во время сканирования, тоже учитываем
+        files = {**files, **self._scan_added}
+        self.downloaded_files = files
+        self.downloaded_ids = set(files.keys())
+        self.library_ready = True
         print(f"✅ Найдено скачанных обоев: {len(self.downloaded_ids)}")
+        mark("library_scanned")
+
+        for w_id, btn in self.tile_buttons.items():
+            local_path = files.get(w_id)
+            if not local_path or getattr(btn, 'wallhaven_local_path', None):
+                continue
+            self.mark_tile_downloaded(btn, w_id, local_path)
+
+        if self._waiting_for_library:
+            self._waiting_for_library = False
+            if self.is_downloaded_mode:
+                self.start_new_search(self.current_query)
+        return False
 
     def on_downloaded_toggle(self, btn):
         """
@@ -217,16 +976,144 @@ class MainWindow(Adw.ApplicationWindow):
         Переключает режим отображения между API-поиском и локальной библиотекой.
         """
         self.is_downloaded_mode = btn.get_active()
-        self.entry.set_sensitive(not self.is_downloaded_mode)
+        self.collection_mode = None
 
+        # В режиме библиотеки поле поиска принимает цвета (#rrggbb), а не запрос API
         if self.is_downloaded_mode:
-            self.show_infobar("Отображаются только скачанные обои. Фильтры временно отключены.")
+            self.show_infobar("Отображаются только скачанные обои. Введите цвет #rrggbb для поиска по цвету.")
+            self.entry.set_placeholder_text("#rrggbb — поиск по цвету")
             self.current_query = ""
         else:
+            self.entry.set_placeholder_text(self._entry_placeholder)
             self.current_query = self.settings.get('last_query', '')
+        self.set_entry_query(self.current_query)
 
         self.start_new_search(self.current_query)
 
+    def enqueue_downloads(self, wallpaper_ids):
+        """
+        Ставит обои в очередь массовой загрузки.
+
+        Args:
+            wallpaper_ids (list): ID обоев.
+        """
+        download_path = self.settings.get('download_path', '')
+        if not download_path or not os.path.isdir(download_path):
+            self.show_infobar("Укажите папку для сохранения в настройках")
+            self.open_settings(None, None)
+            return
+        ids = [w_id for w_id in wallpaper_ids if w_id not in self.downloaded_ids]
+        added = self.download_manager.enqueue(ids, download_path)
+        if not added:
+            self.show_infobar("Нечего скачивать: всё уже скачано или в очереди")
+
+    def on_download_selected(self, action, param):
+        """Скачивает миниатюры, выбранные через Ctrl+клик."""
+        ids = []
+        for child in self.flowbox.get_selected_children():
+            btn = child.get_child()
+            w_id = getattr(btn, 'wallhaven_id', None)
+            if w_id:
+                ids.append(w_id)
+        if not ids:
+            self.show_infobar("Выберите обои Ctrl+кликом по миниатюрам")
+            return
+        self.flowbox.unselect_all()
+        self.enqueue_downloads(ids)
+
+    def on_download_page(self, action, param):
+        """Скачивает всю загруженную выдачу."""
+        self.enqueue_downloads([w_id for _t, _f, w_id, _l in self.result_items])
+
+    def on_warm_tiles(self, action, param):
+        """Запускает фоновую подготовку миниатюр всей библиотеки в пуле процессов."""
+        download_path = self.settings.get('download_path', '')
+        if not download_path or not os.path.isdir(download_path):
+            self.show_infobar("Укажите папку для сохранения в настройках")
+            return
+        if getattr(self, '_warm_thread', None) and self._warm_thread.is_alive():
+            self.show_infobar("Миниатюры библиотеки уже готовятся")
+            return
+
+        def on_progress(done, total):
+            GLib.idle_add(self.on_warm_tiles_progress, done, total)
+
+        def worker():
+            # Пул процессов нужен только здесь: не тянем multiprocessing в запуск GUI
+            from wallhaven_viewer.thumbnailer import warm_library
+
+            report = warm_library(download_path, on_progress=on_progress)
+            GLib.idle_add(self.on_warm_tiles_finished, report)
+
+        self.show_infobar("Подготовка миниатюр библиотеки…")
+        self._warm_thread = threading.Thread(target=worker, daemon=True)
+        self._warm_thread.start()
+
+    def on_warm_tiles_progress(self, done, total):
+        """Показывает прогресс подготовки миниатюр, если индикатор не занят загрузками."""
+        if self.download_progress and self.download_manager.is_idle():
+            self.download_progress.set_fraction(done / total if total else 1.0)
+            self.download_progress.set_text(f"Миниатюры {done} из {total}")
+            self.download_progress.set_visible(done < total)
+        return False
+
+    def on_warm_tiles_finished(self, report):
+        """Сообщает итог подготовки миниатюр."""
+        if self.download_progress and self.download_manager.is_idle():
+            self.download_progress.set_visible(False)
+        message = f"Миниатюры готовы: {report['generated']} новых, {report['skipped']} уже были"
+        if report['failed']:
+            message += f", ошибок: {report['failed']}"
+        self.show_infobar(message)
+        return False
+
+    def on_download_progress(self, stats):
+        """Отображает агрегированный прогресс очереди загрузок (в главном потоке)."""
+        if not self.download_progress:
+            return False
+        finished = stats['done'] + stats['failed']
+        if stats['queued'] or stats['active']:
+            fraction = finished / stats['total'] if stats['total'] else 0.0
+            if stats['total_bytes'] and stats['active']:
+                fraction = max(fraction, stats['bytes'] / stats['total_bytes'] * (stats['active'] + finished) / stats['total'])
+            self.download_progress.set_fraction(min(1.0, fraction))
+            self.download_progress.set_text(f"Скачано {finished} из {stats['total']}")
+            self.download_progress.set_visible(True)
+        elif self.download_progress.get_visible():
+            self.download_progress.set_visible(False)
+            message = f"Скачано обоев: {stats['done']}"
+            if stats['failed']:
+                message += f", ошибок: {stats['failed']}"
+            self.show_infobar(message)
+            self.download_manager.clear_finished()
+        return False
+
+    def on_download_finished(self, job):
+        """Отмечает скачанные обои в библиотеке и на миниатюре (в главном потоке)."""
+        if job['status'] != 'done' or not job.get('path'):
+            return False
+        w_id = job['id']
+        self._scan_added[w_id] = job['path']
+        self.downloaded_files[w_id] = job['path']
+        self._color_index_fresh = False
+        self.downloaded_ids.add(w_id)
+        btn = self.tile_buttons.get(w_id)
+        if btn is not None:
+            self.mark_tile_downloaded(btn, w_id, job['path'])
+        return False
+
+    def mark_tile_downloaded(self, btn, wallpaper_id, local_path):
+        """
+        Отмечает миниатюру как скачанную и запоминает локальный файл в выдаче:
+        окно просмотра и предзагрузка берут путь из `result_items`.
+        """
+        btn.add_css_class("downloaded")
+        btn.wallhaven_local_path = local_path
+        index = getattr(btn, 'wallhaven_index', -1)
+        if 0 <= index < len(self.result_items):
+            thumb_url, full_url, _w_id, _local = self.result_items[index]
+            self.result_items[index] = (thumb_url, full_url, wallpaper_id, local_path)
+
     def get_thumbnail_size(self):
         """
         Рассчитывает оптимальный размер миниатюры на основе ширины окна
@@ -271,7 +1158,7 @@ class MainWindow(Adw.ApplicationWindow):
             dict: Словарь с текущими параметрами поиска.
         """
         return {
-            'last_query': self.entry.get_text().strip(),
+            'last_query': self.get_search_query(),
             'cat_general': str(self.btn_general.get_active()).lower(),
             'cat_anime': str(self.btn_anime.get_active()).lower(),
             'cat_people': str(self.btn_people.get_active()).lower(),
@@ -285,13 +1172,32 @@ class MainWindow(Adw.ApplicationWindow):
 
     def on_filter_changed(self, widget, *args):
         """
-        Обработчик изменения фильтров и выпадающих списков. Сохраняет состояние и начинает новый поиск.
+        Обработчик изменения фильтров и выпадающих списков.
+
+        Поиск откладывается на FILTER_DEBOUNCE_MS: несколько переключений
+        подряд дают один поиск по итоговому состоянию фильтров.
         """
+        if self._filter_timeout_id is not None:
+            GLib.source_remove(self._filter_timeout_id)
+        self._filter_timeout_id = GLib.timeout_add(FILTER_DEBOUNCE_MS, self.apply_filter_change)
+
+    def apply_filter_change(self):
+        """Сохраняет состояние фильтров и начинает новый поиск, если оно изменилось."""
+        self._filter_timeout_id = None
         search_state = self.get_current_search_state()
-        final_settings = {**self.settings, **search_state}
-        save_settings(final_settings)
-        self.settings = final_settings
-        self.start_new_search(self.entry.get_text().strip())
+        if all(self.settings.get(k) == v for k, v in search_state.items()):
+            # Фильтры вернулись к уже показанному состоянию — искать заново незачем
+            return False
+        self.settings = {**self.settings, **search_state}
+        save_settings_async(self.settings)
+        self.start_new_search(self.get_search_query())
+        return False
+
+    def cancel_pending_filter_change(self):
+        """Отменяет отложенный поиск по фильтрам (например, перед явным поиском)."""
+        if self._filter_timeout_id is not None:
+            GLib.source_remove(self._filter_timeout_id)
+            self._filter_timeout_id = None
 
     def apply_settings(self, new_settings):
         """
@@ -302,9 +1208,17 @@ class MainWindow(Adw.ApplicationWindow):
         """
         old_cols = int(self.settings.get('columns', 4))
         old_key = self.settings.get('api_key', '')
+        old_username = self.settings.get('username', '')
+        old_fit = self.settings.get('wallpaper_fit', 'original')
         self.settings = new_settings
+        if new_settings.get('wallpaper_fit', 'original') != old_fit:
+            self.refresh_wallpaper_rendition()
 
         new_cols = int(self.settings.get('columns', 4))
+        self.download_manager.configure(
+            parallelism=int(self.settings.get('download_parallelism', 3)),
+            bandwidth_kbps=int(self.settings.get('download_bandwidth_kbps', 0)),
+        )
         self.flowbox.set_min_children_per_line(new_cols)
         self.flowbox.set_max_children_per_line(new_cols)
 
@@ -312,13 +1226,23 @@ class MainWindow(Adw.ApplicationWindow):
         self.ratio_dropdown.set_selected(int(self.settings.get('ratio_index', 0)))
         self.sort_dropdown.set_selected(int(self.settings.get('sort_index', 5)))
 
+        if old_key != new_settings['api_key'] or old_username != new_settings.get('username', ''):
+            self.load_collections()
         if old_cols != new_cols or old_key != new_settings['api_key']:
             self.start_new_search(self.current_query)
 
     def open_settings(self, action, param):
         """Открывает окно настроек (SettingsWindow)."""
+        from wallhaven_viewer.settings_window import SettingsWindow
+
         SettingsWindow(self).present()
 
+    def open_diagnostics(self, action, param):
+        """Открывает окно метрик (DiagnosticsWindow)."""
+        from wallhaven_viewer.debug_window import DiagnosticsWindow
+
+        DiagnosticsWindow(self).present()
+
     def show_about_dialog(self, action, param):
         """Максимально совместимое окно 'О приложении'."""
         # Регистрируем путь к иконке, чтобы GTK нашел её по короткому имени
@@ -357,6 +1281,7 @@ class MainWindow(Adw.ApplicationWindow):
         приближается к концу списка (на расстоянии одной строки).
         """
         GLib.idle_add(self.check_if_can_load_next_page)
+        self.schedule_tile_reload()
         if self.is_loading or not self.has_more_pages or self.is_downloaded_mode:
             return
 
@@ -370,14 +1295,22 @@ class MainWindow(Adw.ApplicationWindow):
         if max_height - current_pos < row_height * 1.5:
             self.load_next_page()
 
-    def check_if_can_load_next_page(self):
+    def check_if_can_load_next_page(self, force=False):
         """
         Проверяет, нужно ли подгрузить следующую страницу.
         Работает как при активной прокрутке, так и при её отсутствии.
+
+        Args:
+            force (bool): Подгрузить независимо от положения прокрутки
+                (например, когда окно просмотра дошло до конца выдачи).
         """
         if self.is_loading or not self.has_more_pages or self.is_downloaded_mode:
             return False
 
+        if force:
+            self.load_next_page()
+            return True
+
         adj = self.v_adj
         current_pos = adj.get_value() + adj.get_page_size()
         max_height = adj.get_upper()
@@ -407,19 +1340,32 @@ class MainWindow(Adw.ApplicationWindow):
         """Асинхронно загружает миниатюру для кнопки."""
         target_size = self.get_thumbnail_size()
         cache_path = get_cache_path(thumb_url) if thumb_url else None
+        generation = self.search_generation
+        if local_path:
+            # Готовая миниатюра библиотеки намного дешевле декодирования оригинала
+            tile_path = get_tile_path(wallpaper_id)
+            if tile_path and is_tile_fresh(tile_path, local_path):
+                local_path = tile_path
+
+        def is_cancelled():
+            return generation != self.search_generation
 
         def on_thumbnail_loaded(pixbuf):
+            if is_cancelled():
+                return False
             if pixbuf:
                 self.update_thumbnail_ui(placeholder_btn, pixbuf, wallpaper_id)
             else:
                 self.show_error_indicator(placeholder_btn, wallpaper_id)
+            return False
 
         ImageLoader.load_thumbnail(
             local_path=local_path,
             cache_path=cache_path,
             thumb_url=thumb_url,
             target_size=target_size,
-            callback=on_thumbnail_loaded
+            callback=on_thumbnail_loaded,
+            is_cancelled=is_cancelled
         )
 
     def update_thumbnail_ui(self, btn, pixbuf, wallpaper_id):
@@ -442,6 +1388,7 @@ class MainWindow(Adw.ApplicationWindow):
 
             overlay = Gtk.Overlay()
             texture = Gdk.Texture.new_for_pixbuf(pixbuf)
+            leak_monitor.track("texture", texture)
             picture = Gtk.Picture.new_for_paintable(texture)
             picture.set_content_fit(Gtk.ContentFit.COVER)
             picture.set_size_request(-1, target_height)
@@ -457,6 +1404,8 @@ class MainWindow(Adw.ApplicationWindow):
                 overlay.add_overlay(icon)
 
             btn.set_child(overlay)
+            btn.wallhaven_loaded = True
+            mark("first_thumbnail")
         except Exception as e:
             print(f"Ошибка обновления UI: {e}")
 
@@ -496,9 +1445,17 @@ class MainWindow(Adw.ApplicationWindow):
         if hasattr(widget, 'wallhaven_local_path') and widget.wallhaven_local_path:
             local_path = widget.wallhaven_local_path
 
-        # Проверяем, существует ли уже окно FullImageWindow
+        index = getattr(widget, 'wallhaven_index', 0)
+
+        # Проверяем, существует ли уже окно FullImageWindow — показываем в нём выбранные обои
         if hasattr(self, '_full_image_window') and self._full_image_window:
             try:
+                self._full_image_window.download_path = self.settings.get('download_path', '')
+                self._full_image_window.items = self.result_items
+                if 0 <= index < len(self.result_items) and self.result_items[index][1] == url:
+                    self._full_image_window.show_item(index)
+                else:
+                    self._full_image_window.load_wallpaper(url, local_path)
                 self._full_image_window.present()
                 return
             except Exception:
@@ -509,7 +1466,10 @@ class MainWindow(Adw.ApplicationWindow):
                     pass
 
         # Создаём новое окно и сохраняем ссылку на него
-        self._full_image_window = FullImageWindow(self, url, self.settings.get('download_path', ''), local_path)
+        from wallhaven_viewer.full_image_window import FullImageWindow
+
+        self._full_image_window = FullImageWindow(self, url, self.settings.get('download_path', ''), local_path,
+                                                  items=self.result_items, index=index)
         # Сбрасываем ссылку при уничтожении
         self._full_image_window.connect("destroy", lambda _: setattr(self, '_full_image_window', None))
 
@@ -531,11 +1491,17 @@ class MainWindow(Adw.ApplicationWindow):
 
     def on_search_clicked(self, widget):
         """Обработчик нажатия кнопки поиска или Enter в поле ввода."""
-        query = self.entry.get_text().strip()
+        self.cancel_pending_filter_change()
+        self.suggest_popover.popdown()
+        self.collection_mode = None
+        if self.is_downloaded_mode:
+            # Цветовой запрос к библиотеке не сохраняется как последний поиск
+            self.start_new_search(self.entry.get_text().strip())
+            return
+        query = self.get_search_query()
         search_state = self.get_current_search_state()
-        final_settings = {**self.settings, **search_state}
-        save_settings(final_settings)
-        self.settings = final_settings
+        self.settings = {**self.settings, **search_state}
+        save_settings_async(self.settings)
         self.start_new_search(query)
 
     def create_placeholder_btn(self, full_url, wallpaper_id, local_path=None):
@@ -554,6 +1520,14 @@ class MainWindow(Adw.ApplicationWindow):
         btn.add_css_class("thumbnail")
 
         btn.wallhaven_local_path = local_path
+        btn.wallhaven_id = wallpaper_id
+        leak_monitor.track("tile_button", btn)
+
+        # Ctrl+клик выделяет миниатюру для массовой загрузки вместо открытия
+        select_click = Gtk.GestureClick()
+        select_click.set_propagation_phase(Gtk.PropagationPhase.CAPTURE)
+        select_click.connect("pressed", self.on_tile_pressed)
+        btn.add_controller(select_click)
 
         s = Adw.Spinner()
         s.set_halign(Gtk.Align.CENTER)
@@ -562,13 +1536,36 @@ class MainWindow(Adw.ApplicationWindow):
         btn.connect("clicked", self.open_full_image, full_url, local_path)
         return btn
 
+    def on_tile_pressed(self, gesture, n_press, x, y):
+        """Переключает выделение миниатюры по Ctrl+клику."""
+        state = gesture.get_current_event_state()
+        if not state & Gdk.ModifierType.CONTROL_MASK:
+            return
+        gesture.set_state(Gtk.EventSequenceState.CLAIMED)
+        # Кнопку берём из жеста, а не из замыкания: ссылка на неё из контроллера
+        # образовала бы цикл, который не даёт освободить удалённые миниатюры
+        child = gesture.get_widget().get_parent()
+        if isinstance(child, Gtk.FlowBoxChild):
+            if child.is_selected():
+                self.flowbox.unselect_child(child)
+            else:
+                self.flowbox.select_child(child)
+
     def start_new_search(self, query):
         """
         Очищает сетку, сбрасывает счетчик страниц и начинает новый поиск.
         """
+        self.search_generation += 1
         self.current_page = 1
         self.current_query = query
         self.has_more_pages = not self.is_downloaded_mode
+        self.search_seed = WallhavenAPI.new_seed()
+        self.result_items = []
+        self.tile_buttons = {}
+        self.result_colors = {}
+        self._unloaded_tiles = 0
+        self._restore_pending = []
+        self._session_token = None
         self.infobar.set_visible(False)
         while True:
             child = self.flowbox.get_first_child()
@@ -584,6 +1581,15 @@ class MainWindow(Adw.ApplicationWindow):
         self.is_loading = True
 
         if self.is_downloaded_mode:
+            if not self.library_ready:
+                # Библиотека ещё сканируется — покажем её, когда сканирование завершится
+                self._waiting_for_library = True
+                self.bottom_spinner.set_visible(True)
+                self.is_loading = False
+                return
+            if query:
+                self.load_library_by_color(query)
+                return
             self.bottom_spinner.set_visible(False)
             items_to_add = []
             for w_id, local_path in self.downloaded_files.items():
@@ -594,24 +1600,42 @@ class MainWindow(Adw.ApplicationWindow):
             self.is_loading = False
             return
 
+        if self.collection_mode:
+            self.load_collection_page(page)
+            return
+
         if page > 1:
             self.bottom_spinner.set_visible(True)
 
+        # Состояние виджетов читаем в главном потоке, до запуска рабочего
+        search_settings = {**self.settings, **self.get_current_search_state()}
+        generation = self.search_generation
+        seed = self.search_seed
+
+        def deliver(func, *args):
+            # Результаты страницы, запрошенной до нового поиска, отбрасываются
+            def apply():
+                if generation == self.search_generation:
+                    func(*args)
+                return False
+            GLib.idle_add(apply)
+
         def worker():
-            # Используем новый API класс
-            search_state = self.get_current_search_state()
-            search_settings = {**self.settings, **search_state}
-            data, meta = WallhavenAPI.search_wallpapers(query, page, search_settings)
+            data, meta = WallhavenAPI.search_wallpapers(query, page, search_settings, seed=seed)
+            mark("first_api_response")
 
             if data is None:
-                GLib.idle_add(self.show_infobar, "Ошибка API")
-                GLib.idle_add(self.finish_loading_page, False)
+                deliver(self.show_infobar, "Ошибка API")
+                deliver(self.finish_loading_page, False)
                 return
 
             if not data and page == 1:
-                GLib.idle_add(self.show_infobar, "Ничего не найдено")
+                deliver(self.show_infobar, "Ничего не найдено")
+            if meta and meta.get("seed"):
+                deliver(self.remember_search_seed, meta["seed"])
 
             items_to_add = []
+            colors = {}
             for w in data:
                 thumbs = w.get("thumbs", {})
                 thumb = thumbs.get("large") or thumbs.get("original")
@@ -619,22 +1643,114 @@ class MainWindow(Adw.ApplicationWindow):
                 w_id = w.get("id")
                 if thumb and full and w_id:
                     items_to_add.append((thumb, full, w_id, None))
+                    if w.get("colors"):
+                        colors[w_id] = w["colors"][0]
 
-            GLib.idle_add(self.create_placeholders_and_load, items_to_add)
+            deliver(self.create_placeholders_and_load, items_to_add, colors)
             last_page = meta.get("last_page", 1) if meta else 1
             more_pages = page < last_page
-            GLib.idle_add(self.finish_loading_page, more_pages)
+            deliver(self.finish_loading_page, more_pages)
 
         threading.Thread(target=worker, daemon=True).start()
 
-    def create_placeholders_and_load(self, items):
+    def load_library_by_color(self, query):
+        """
+        Показывает скачанные обои, близкие к цветам из запроса (#rrggbb ...).
+
+        Цветовой индекс обновляется в фоне, если библиотека менялась с прошлой
+        сверки: миниатюры и гистограммы считаются только для новых и изменённых файлов.
+        """
+        download_path = self.settings.get('download_path', '')
+        downloaded_files = dict(self.downloaded_files)
+        # До конца сканирования библиотеки список файлов неполон — индекс сканирует папку сам
+        library = downloaded_files if self.library_ready else None
+        generation = self.search_generation
+        self.bottom_spinner.set_visible(True)
+
+        def deliver(func, *args):
+            def apply():
+                if generation == self.search_generation:
+                    func(*args)
+                return False
+            GLib.idle_add(apply)
+
+        def worker():
+            try:
+                from wallhaven_viewer.color_index import ColorIndex, parse_colors
+            except ImportError:
+                deliver(self.show_infobar, "Для поиска по цвету установите NumPy")
+                deliver(self.finish_loading_page, False)
+                return
+
+            colors = parse_colors(query)
+            if not colors:
+                deliver(self.show_infobar, "Введите цвет в формате #rrggbb")
+                deliver(self.finish_loading_page, False)
+                return
+
+            with self._color_index_lock:
+                if self._color_index is None:
+                    self._color_index = ColorIndex.load()
+                if download_path and not self._color_index_fresh:
+                    if self._color_index.update(download_path, library=library):
+                        self._color_index.save()
+                    self._color_index_fresh = True
+                with metrics.span("color_index.query", size=len(self._color_index.ids)):
+                    matches = self._color_index.query_colors(colors, COLOR_SEARCH_LIMIT)
+
+            items_to_add = []
+            for w_id, _score in matches:
+                local_path = downloaded_files.get(w_id)
+                if local_path:
+                    items_to_add.append((None, WallhavenAPI.build_wallpaper_url(w_id), w_id, local_path))
+            if not items_to_add:
+                deliver(self.show_infobar, "Ничего не найдено")
+            deliver(self.create_placeholders_and_load, items_to_add)
+            deliver(self.finish_loading_page, False)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def remember_search_seed(self, seed):
+        """Запоминает seed, который API вернул для текущей выдачи."""
+        self.search_seed = seed
+
+    def create_placeholders_and_load(self, items, colors=None, load_range=None):
         """
         Создает заглушки в UI и запускает асинхронную загрузку миниатюр.
+
+        Обои, уже показанные в сетке (сдвиг выдачи hot/random между страницами),
+        пропускаются: для них не создаются плитки и не качаются миниатюры.
+
+        Args:
+            items (list): Элементы (thumb_url, full_url, wallpaper_id, local_path).
+            colors (dict, optional): Основной цвет обоев по ID для заглушек.
+            load_range (tuple, optional): Индексы `items` [начало, конец), для которых
+                миниатюры загружаются сразу; остальные плитки остаются пустыми
+                до прокрутки к ним (см. `reload_visible_tiles`). None — все.
         """
-        for thumb_url, full_url, wallpaper_id, local_path in items:
+        colors = colors or {}
+        self.result_colors.update(colors)
+        duplicates = 0
+        for i, (thumb_url, full_url, wallpaper_id, local_path) in enumerate(items):
+            # tile_buttons одновременно служит множеством уже показанных ID
+            if wallpaper_id in self.tile_buttons:
+                duplicates += 1
+                continue
             btn = self.create_placeholder_btn(full_url, wallpaper_id, local_path)
+            self.apply_swatch(btn, colors.get(wallpaper_id))
+            btn.wallhaven_index = len(self.result_items)
+            self.tile_buttons[wallpaper_id] = btn
+            self.result_items.append((thumb_url, full_url, wallpaper_id, local_path))
             self.flowbox.append(btn)
-            self.load_thumbnail_async(btn, thumb_url, full_url, wallpaper_id, local_path)
+            if load_range is None or load_range[0] <= i < load_range[1]:
+                self.load_thumbnail_async(btn, thumb_url, full_url, wallpaper_id, local_path)
+            else:
+                # Плитка вдали от видимой области: без спиннера, загрузится при прокрутке
+                btn.set_child(None)
+                btn.wallhaven_unloaded = True
+                self._unloaded_tiles += 1
+        if duplicates:
+            metrics.count("search.duplicates", duplicates)
 
     def finish_loading_page(self, has_more):
         """
@@ -650,5 +1766,14 @@ class MainWindow(Adw.ApplicationWindow):
 
     def on_close_request(self, widget):
         """Вызывается при попытке закрыть окно."""
+        self.cancel_pending_filter_change()
+        flush_settings()
+        self.download_manager.flush_journal()
+        self.save_session()
+        save_tag_index()
+        # Popover привязан к полю ввода вручную и должен быть отвязан до его уничтожения
+        self.suggest_popover.unparent()
+        shutdown_thumbnail_pool()
+        self.preloader.clear()
         self.get_application().quit()
         return False  # Возвращаем False, чтобы продолжить закрытие
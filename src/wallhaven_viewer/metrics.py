@@ -0,0 +1,161 @@
+"""
+Модуль лёгкой инструментации: интервалы (spans), гистограммы, счётчики и gauge.
+
+Не зависит от GTK и безопасен для вызова из любых потоков. Данные доступны
+в окне «Диагностика» и экспортируются в JSON или формат Chrome trace
+(открывается в chrome://tracing или Perfetto).
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Сколько последних интервалов хранить для трассы
+MAX_EVENTS = 20000
+# Сколько последних значений хранить на гистограмму (для перцентилей)
+MAX_SAMPLES = 2000
+
+_lock = threading.Lock()
+_origin = time.perf_counter()
+_events = deque(maxlen=MAX_EVENTS)
+_histograms = {}
+_counters = {}
+_gauges = {}
+
+
+def now_us():
+    """Возвращает время в микросекундах от загрузки модуля (шкала трассы)."""
+    return (time.perf_counter() - _origin) * 1e6
+
+
+def observe(name, value):
+    """Добавляет значение в гистограмму `name` (например, длительность в мс)."""
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = {'count': 0, 'sum': 0.0, 'max': 0.0, 'samples': deque(maxlen=MAX_SAMPLES)}
+        hist['count'] += 1
+        hist['sum'] += value
+        hist['max'] = max(hist['max'], value)
+        hist['samples'].append(value)
+
+
+def count(name, n=1):
+    """Увеличивает счётчик `name` на `n`."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def gauge(name, value):
+    """Устанавливает текущее значение показателя `name` (например, длину очереди)."""
+    with _lock:
+        _gauges[name] = value
+
+
+def gauge_add(name, delta):
+    """Изменяет показатель `name` на `delta` (для счётчиков «в работе»)."""
+    with _lock:
+        _gauges[name] = _gauges.get(name, 0) + delta
+
+
+def record_span(name, start_us, duration_us, args=None):
+    """Записывает завершённый интервал и его длительность (мс) в гистограмму `name`."""
+    event = {
+        'name': name,
+        'ts': start_us,
+        'dur': duration_us,
+        'tid': threading.get_ident(),
+    }
+    if args:
+        event['args'] = args
+    with _lock:
+        _events.append(event)
+    observe(name, duration_us / 1000.0)
+
+
+@contextmanager
+def span(name, **args):
+    """
+    Измеряет длительность блока кода.
+
+        with metrics.span("api.search", page=page):
+            ...
+    """
+    start = now_us()
+    try:
+        yield
+    finally:
+        record_span(name, start, now_us() - start, args or None)
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def snapshot():
+    """
+    Возвращает сводку всех метрик.
+
+    Returns:
+        dict: histograms (count, mean, p50, p95, p99, max), counters, gauges.
+    """
+    with _lock:
+        histograms = {name: (h['count'], h['sum'], h['max'], sorted(h['samples']))
+                      for name, h in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    summary = {}
+    for name, (n, total, maximum, values) in sorted(histograms.items()):
+        summary[name] = {
+            'count': n,
+            'mean': total / n if n else 0.0,
+            'p50': _percentile(values, 0.50),
+            'p95': _percentile(values, 0.95),
+            'p99': _percentile(values, 0.99),
+            'max': maximum,
+        }
+    return {'histograms': summary, 'counters': counters, 'gauges': gauges}
+
+
+def get_cache_hit_rate(prefix):
+    """Возвращает долю попаданий `<prefix>.cache_hit` среди всех обращений (или None)."""
+    with _lock:
+        hits = _counters.get(prefix + ".cache_hit", 0)
+        misses = _counters.get(prefix + ".cache_miss", 0)
+    total = hits + misses
+    return hits / total if total else None
+
+
+def reset():
+    """Очищает все накопленные метрики и интервалы."""
+    with _lock:
+        _events.clear()
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
+
+
+def export_json(path):
+    """Сохраняет сводку метрик в JSON-файл."""
+    data = snapshot()
+    data['exported'] = time.time()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def export_chrome_trace(path):
+    """Сохраняет интервалы в формате Chrome trace (Trace Event Format)."""
+    pid = os.getpid()
+    with _lock:
+        events = list(_events)
+    trace = [{'name': e['name'], 'ph': 'X', 'ts': e['ts'], 'dur': e['dur'],
+              'pid': pid, 'tid': e['tid'], 'args': e.get('args', {})} for e in events]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,124 @@
+"""
+Модуль общего HTTP-подключения к Wallhaven.
+
+`requests` импортируется лениво при первом обращении, чтобы не замедлять
+старт приложения; одна сессия с пулом соединений переиспользует DNS и TLS
+для всех запросов к API и к серверам изображений.
+
+Транспорт сессии подключаемый (`set_transport`). Если задана переменная
+окружения WALLHAVEN_NET_PROFILE с путём к JSON-профилю, вместо обычного
+транспорта используется симуляция плохой сети (см. `netsim.SimulatedTransport`).
+"""
+
+import os
+import time
+import threading
+
+# Хосты Wallhaven: API, миниатюры и оригиналы
+WALLHAVEN_HOSTS = ("wallhaven.cc", "th.wallhaven.cc", "w.wallhaven.cc")
+# Размер пула соединений на хост (миниатюры грузятся параллельно)
+POOL_SIZE = 16
+# Переменная окружения с путём к профилю симуляции сети
+NET_PROFILE_ENV = "WALLHAVEN_NET_PROFILE"
+
+_session = None
+_session_lock = threading.Lock()
+_transport = None
+
+
+class BandwidthLimiter:
+    """
+    Общий для всех потоков ограничитель скорости (token bucket).
+
+    Args:
+        kbps (int): Лимит в килобайтах в секунду; 0 — без ограничения.
+    """
+
+    def __init__(self, kbps=0):
+        self._lock = threading.Lock()
+        self.set_rate(kbps)
+
+    def set_rate(self, kbps):
+        """Меняет лимит скорости на лету."""
+        with self._lock:
+            self.rate = max(0, int(kbps)) * 1024
+            self.tokens = float(self.rate)
+            self.last = time.monotonic()
+
+    def consume(self, nbytes):
+        """Учитывает `nbytes` принятых байт и при необходимости приостанавливает поток."""
+        with self._lock:
+            if not self.rate:
+                return
+            now = time.monotonic()
+            self.tokens = min(float(self.rate), self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= nbytes
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+def get_session():
+    """
+    Возвращает общую сессию `requests` (создаётся при первом вызове).
+
+    Returns:
+        requests.Session: Сессия с пулом соединений.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+
+                session = requests.Session()
+                adapter = _transport or _create_default_transport()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def set_transport(adapter):
+    """
+    Подключает собственный транспорт (`requests.adapters.HTTPAdapter` или наследник).
+
+    Следующий вызов `get_session` создаст сессию с этим транспортом;
+    None возвращает транспорт по умолчанию.
+    """
+    global _session, _transport
+    with _session_lock:
+        _transport = adapter
+        _session = None
+
+
+def _create_default_transport():
+    profile_path = os.environ.get(NET_PROFILE_ENV)
+    if profile_path:
+        try:
+            from wallhaven_viewer.netsim import SimulatedTransport
+            transport = SimulatedTransport.from_file(profile_path)
+            print(f"🐢 Симуляция сети по профилю {profile_path}")
+            return transport
+        except Exception as e:
+            print(f"Ошибка загрузки профиля сети {profile_path}: {e}")
+    from requests.adapters import HTTPAdapter
+    return HTTPAdapter(pool_connections=len(WALLHAVEN_HOSTS), pool_maxsize=POOL_SIZE)
+
+
+def preconnect(hosts=WALLHAVEN_HOSTS, timeout=5):
+    """
+    В фоне прогревает DNS и TLS-соединения к хостам, пока строится интерфейс.
+
+    Открытые соединения остаются в пуле сессии и используются первыми
+    запросами поиска и миниатюр.
+    """
+    def worker(host):
+        try:
+            get_session().head(f"https://{host}/", timeout=timeout, allow_redirects=False)
+        except Exception as e:
+            print(f"Предварительное подключение к {host} не удалось: {e}")
+
+    for host in hosts:
+        threading.Thread(target=worker, args=(host,), daemon=True).start()
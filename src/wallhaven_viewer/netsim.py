@@ -0,0 +1,170 @@
+"""
+Модуль симуляции плохой сети для тестирования производительности.
+
+Подключается через переменную окружения WALLHAVEN_NET_PROFILE (см. `net`)
+и позволяет воспроизводить медленные и нестабильные каналы без сети —
+например, вместе с локальным сервером из benchmarks/fake_server.py.
+"""
+
+import json
+import time
+import random
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError
+
+from wallhaven_viewer.net import BandwidthLimiter, WALLHAVEN_HOSTS, POOL_SIZE
+
+
+class ThrottledBody:
+    """
+    Обёртка над телом ответа urllib3: ограничивает скорость и обрывает чтение.
+
+    Args:
+        raw: Исходный `urllib3.HTTPResponse`.
+        limiter (BandwidthLimiter): Ограничитель скорости хоста.
+        truncate_at (int or None): После скольких байт оборвать тело.
+    """
+
+    def __init__(self, raw, limiter, truncate_at):
+        self._raw = raw
+        self._limiter = limiter
+        self._truncate_at = truncate_at
+        self._read = 0
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def _account(self, data):
+        if self._truncate_at is not None and self._read + len(data) > self._truncate_at:
+            raise ProtocolError("Simulated connection reset: incomplete body")
+        self._read += len(data)
+        self._limiter.consume(len(data))
+        return data
+
+    def read(self, amt=None, *args, **kwargs):
+        return self._account(self._raw.read(amt, *args, **kwargs))
+
+    def stream(self, amt=65536, decode_content=None):
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            yield self._account(chunk)
+
+
+class SimulatedTransport(HTTPAdapter):
+    """
+    Транспорт с симуляцией плохой сети по правилам для хостов и путей.
+
+    Профиль (JSON):
+
+        {
+          "seed": 1,
+          "default": {"latency_ms": 80, "jitter_ms": 40},
+          "hosts": {
+            "th.wallhaven.cc": {"bandwidth_kbps": 128, "truncate_rate": 0.05},
+            "wallhaven.cc": {"status_429_rate": 0.1, "retry_after": 2, "timeout_rate": 0.02}
+          },
+          "paths": {
+            "/th/": {"bandwidth_kbps": 128}
+          }
+        }
+
+    Правила хоста дополняют "default", правила самого длинного совпавшего
+    префикса пути ("paths") — правила хоста. Префиксы нужны для локального
+    сервера (benchmarks/fake_server.py), который отдаёт API, миниатюры и
+    оригиналы с одного адреса 127.0.0.1 под путями /api/, /th/ и /full/.
+
+    Правила:
+        latency_ms, jitter_ms — задержка перед ответом;
+        bandwidth_kbps — лимит скорости тела ответа, общий для всех соединений
+            к хосту (а для правила пути — к этому префиксу на хосте);
+        truncate_rate — доля ответов, тело которых обрывается на середине;
+        status_429_rate, retry_after — доля ответов 429 Too Many Requests;
+        timeout_rate — доля запросов, которые ждут таймаут и падают с Timeout.
+
+    Args:
+        profile (dict): Профиль симуляции.
+    """
+
+    def __init__(self, profile):
+        super().__init__(pool_connections=len(WALLHAVEN_HOSTS), pool_maxsize=POOL_SIZE)
+        self.profile = profile
+        self._random = random.Random(profile.get('seed'))
+        self._lock = threading.Lock()
+        self._limiters = {}
+
+    @classmethod
+    def from_file(cls, path):
+        """Создаёт транспорт по JSON-профилю."""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def get_rule(self, host, path=''):
+        """
+        Возвращает правила для запроса (default + хост + префикс пути).
+
+        Returns:
+            tuple: (правила, ключ ограничителя скорости — хост или хост и префикс).
+        """
+        rule = dict(self.profile.get('default', {}))
+        rule.update(self.profile.get('hosts', {}).get(host, {}))
+        key = host
+        prefixes = [prefix for prefix in self.profile.get('paths', {}) if path.startswith(prefix)]
+        if prefixes:
+            prefix = max(prefixes, key=len)
+            rule.update(self.profile['paths'][prefix])
+            key = host + prefix
+        return rule, key
+
+    def _uniform(self, a, b):
+        with self._lock:
+            return self._random.uniform(a, b)
+
+    def _chance(self, rate):
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+    def _get_limiter(self, key, kbps):
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = self._limiters[key] = BandwidthLimiter(kbps)
+            return limiter
+
+    def send(self, request, stream=False, timeout=None, **kwargs):
+        url = urlparse(request.url)
+        host = url.hostname or ''
+        rule, limiter_key = self.get_rule(host, url.path)
+
+        latency = rule.get('latency_ms', 0) + self._uniform(0, rule.get('jitter_ms', 0))
+        if latency:
+            time.sleep(latency / 1000.0)
+
+        if self._chance(rule.get('timeout_rate', 0)):
+            read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+            time.sleep(read_timeout if read_timeout is not None else 30)
+            raise requests.exceptions.ReadTimeout(f"Simulated timeout for {host}", request=request)
+
+        if self._chance(rule.get('status_429_rate', 0)):
+            response = requests.Response()
+            response.status_code = 429
+            response.reason = "Too Many Requests"
+            response.headers['Retry-After'] = str(rule.get('retry_after', 1))
+            response._content = b'{"error": "Too Many Requests"}'
+            response.url = request.url
+            response.request = request
+            response.connection = self
+            return response
+
+        response = super().send(request, stream=stream, timeout=timeout, **kwargs)
+        truncate_at = None
+        if self._chance(rule.get('truncate_rate', 0)):
+            length = int(response.headers.get('content-length', 0) or 0)
+            with self._lock:
+                truncate_at = self._random.randint(0, max(0, length // 2))
+        kbps = rule.get('bandwidth_kbps', 0)
+        if truncate_at is not None or kbps:
+            response.raw = ThrottledBody(response.raw, self._get_limiter(limiter_key, kbps), truncate_at)
+        return response
@@ -0,0 +1,290 @@
+"""
+Фоновая предзагрузка соседних обоев для окна просмотра.
+"""
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from gi.repository import GLib
+
+from wallhaven_viewer.api import WallhavenAPI
+from wallhaven_viewer.image_loader import ImageLoader
+from wallhaven_viewer import metrics
+from wallhaven_viewer.probe import probe_file, format_resolution
+from wallhaven_viewer.sidecar import build_meta_info, read_sidecar, write_sidecar
+from wallhaven_viewer.utils import get_staging_dir
+
+# Сколько соседей с каждой стороны предзагружать
+PRELOAD_RADIUS = 2
+# Общий бюджет на предзагруженные элементы (временные файлы + preview в памяти), байт
+PRELOAD_BUDGET = 256 * 1024 * 1024
+
+
+def create_staging_file(wallpaper_id, ext='.jpg'):
+    """
+    Создаёт пустой временный файл для оригинала в папке staging.
+
+    Returns:
+        str or None: Путь к файлу или None, если staging недоступен.
+    """
+    staging_dir = get_staging_dir()
+    if not staging_dir:
+        return None
+    fd, path = tempfile.mkstemp(prefix=f"{wallpaper_id}-", suffix=ext, dir=staging_dir)
+    os.close(fd)
+    return path
+
+
+def load_wallpaper_info(wallpaper_id, local_path=None, probe=True):
+    """
+    Получает метаданные обоев для окна просмотра (в фоновом потоке).
+
+    Для локального файла метаданные берутся из sidecar; если его нет —
+    запрашиваются у API, и sidecar записывается. Разрешение локального файла
+    берётся из заголовка (надёжнее sidecar), для обоев из сети — из ответа API.
+
+    Args:
+        wallpaper_id (str): ID обоев.
+        local_path (str, optional): Локальный файл, если обои уже скачаны.
+        probe (bool): Читать ли разрешение из заголовка локального файла
+            (False — вызывающий узнает его сам при декодировании).
+
+    Returns:
+        tuple: (meta, tags, resolution).
+    """
+    if local_path:
+        meta, tags = read_sidecar(local_path)
+        if meta is None and tags is None:
+            wallpaper_info = WallhavenAPI.fetch_wallpaper_info(wallpaper_id)
+            meta = build_meta_info(wallpaper_info)
+            tags = (wallpaper_info or {}).get('tags', []) or []
+            if wallpaper_info:
+                write_sidecar(local_path, meta, tags)
+                print(f"✅ Wrote sidecar for local image: {local_path}")
+        resolution = format_resolution(probe_file(local_path)) if probe else ''
+        if not resolution and isinstance(meta, dict):
+            resolution = meta.get('resolution', '')
+        return meta, tags or [], resolution
+
+    wallpaper_info = WallhavenAPI.fetch_wallpaper_info(wallpaper_id)
+    meta = build_meta_info(wallpaper_info)
+    tags = (wallpaper_info or {}).get('tags', []) or []
+    resolution = wallpaper_info.get('resolution', '') if wallpaper_info else ''
+    return meta, tags, resolution
+
+
+def get_entry_size(entry):
+    """Возвращает, сколько байт занимает запись предзагрузки (файл в staging + preview)."""
+    size = 0
+    try:
+        if entry.get('staging') and entry.get('path') and os.path.exists(entry['path']):
+            size += os.path.getsize(entry['path'])
+        preview = entry.get('preview')
+        if preview and preview[0] is not None:
+            size += preview[0].get_byte_length()
+    except Exception:
+        pass
+    return size
+
+
+def discard_entry(entry):
+    """Удаляет временный файл записи, если он принадлежит staging."""
+    path = entry.get('path')
+    if entry.get('staging') and path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Не удалось удалить временный файл {path}: {e}")
+
+
+class Preloader:
+    """
+    Предзагружает оригиналы, метаданные и экранные preview соседних элементов.
+
+    Работает в одном фоновом потоке и обрабатывает ближайшие элементы первыми.
+    Готовые записи хранятся в LRU с общим бюджетом `budget`; при его превышении
+    вытесняются самые давние записи вне текущего окна соседей.
+
+    Запись — словарь с ключами:
+        'path' (str): путь к оригиналу;
+        'staging' (bool): True, если это временный файл, которым владеет запись;
+        'meta', 'tags', 'resolution': метаданные для окна просмотра;
+        'preview' (tuple): (pixbuf, ширина_оригинала, высота_оригинала) или None.
+
+    Args:
+        max_size (tuple): Максимальный размер preview (обычно размер экрана).
+        budget (int): Бюджет в байтах.
+    """
+
+    def __init__(self, max_size=(1920, 1080), budget=PRELOAD_BUDGET):
+        self.max_size = max_size
+        self.budget = budget
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._keep = set()
+        self._in_flight = None
+        self._waiters = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def schedule(self, items):
+        """
+        Задаёт новый набор элементов для предзагрузки.
+
+        Args:
+            items (list): Кортежи (full_url, wallpaper_id, local_path) в порядке приоритета.
+        """
+        with self._lock:
+            self._keep = {w_id for _url, w_id, _local in items}
+            self._pending = [
+                item for item in items
+                if item[1] != self._in_flight and not self._is_complete(self.entries.get(item[1]))
+            ]
+        self._evict()
+        if self._pending:
+            self._ensure_thread()
+            self._wakeup.set()
+
+    def take(self, wallpaper_id):
+        """
+        Забирает готовую запись; владение временным файлом переходит к вызывающему.
+
+        Returns:
+            dict or None: Запись или None, если элемент ещё не предзагружен.
+        """
+        with self._lock:
+            return self.entries.pop(wallpaper_id, None)
+
+    def put(self, wallpaper_id, entry):
+        """Возвращает запись в кэш (например, при переходе окна к другому элементу)."""
+        with self._lock:
+            old = self.entries.pop(wallpaper_id, None)
+            if old is not None and old.get('path') != entry.get('path'):
+                discard_entry(old)
+            self.entries[wallpaper_id] = entry
+        self._evict()
+
+    def wait_for(self, wallpaper_id, callback):
+        """
+        Подписывается на завершение предзагрузки элемента, который сейчас загружается.
+
+        Args:
+            wallpaper_id (str): ID обоев.
+            callback (callable): Вызывается в главном потоке с записью (владение передаётся).
+
+        Returns:
+            bool: True, если элемент сейчас загружается и подписка оформлена.
+        """
+        with self._lock:
+            if self._in_flight != wallpaper_id:
+                return False
+            self._waiters[wallpaper_id] = callback
+            return True
+
+    def trim(self):
+        """
+        Освобождает записи вне текущего окна соседей (при нехватке памяти).
+
+        Returns:
+            int: Сколько записей удалено.
+        """
+        with self._lock:
+            removed = [self.entries.pop(w_id) for w_id in list(self.entries) if w_id not in self._keep]
+        for entry in removed:
+            discard_entry(entry)
+        return len(removed)
+
+    def clear(self):
+        """Удаляет все записи и их временные файлы."""
+        with self._lock:
+            self._pending = []
+            entries = list(self.entries.values())
+            self.entries.clear()
+        for entry in entries:
+            discard_entry(entry)
+
+    def _is_complete(self, entry):
+        return bool(entry and entry.get('path') and entry.get('preview'))
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                if not self._pending:
+                    self._wakeup.clear()
+                    continue
+                item = self._pending.pop(0)
+                metrics.gauge("preload.pending", len(self._pending))
+                self._in_flight = item[1]
+                entry = self.entries.pop(item[1], None)
+
+            try:
+                with metrics.span("preload.item", id=item[1]):
+                    entry = self._process(item, entry)
+            except Exception as e:
+                print(f"Ошибка предзагрузки {item[1]}: {e}")
+
+            with self._lock:
+                self._in_flight = None
+                waiter = self._waiters.pop(item[1], None)
+                if entry is not None and waiter is None:
+                    self.entries[item[1]] = entry
+            if waiter is not None:
+                GLib.idle_add(waiter, entry)
+            self._evict()
+
+    def _process(self, item, entry):
+        """Дозагружает недостающие части записи: метаданные, оригинал, preview."""
+        full_url, wallpaper_id, local_path = item
+        entry = entry or {}
+
+        if 'meta' not in entry:
+            is_local = bool(local_path and os.path.exists(local_path))
+            # Разрешение локального файла станет известно при декодировании preview
+            entry['meta'], entry['tags'], entry['resolution'] = load_wallpaper_info(
+                wallpaper_id, local_path if is_local else None, probe=False)
+
+        if not entry.get('path'):
+            if local_path and os.path.exists(local_path):
+                entry['path'] = local_path
+                entry['staging'] = False
+            else:
+                staging_path = create_staging_file(wallpaper_id, os.path.splitext(full_url)[1] or '.jpg')
+                if not staging_path:
+                    return None
+                if not ImageLoader.fetch_to_file(full_url, staging_path):
+                    discard_entry({'path': staging_path, 'staging': True})
+                    return None
+                entry['path'] = staging_path
+                entry['staging'] = True
+
+        if not entry.get('preview'):
+            pixbuf, width, height = ImageLoader.load_scaled_pixbuf_from_file(entry['path'], *self.max_size)
+            entry['preview'] = (pixbuf, width, height) if pixbuf else None
+            if pixbuf and width and height:
+                entry['resolution'] = f"{width}x{height}"
+
+        return entry
+
+    def _evict(self):
+        """Вытесняет давние записи вне окна соседей, пока не уложимся в бюджет."""
+        removed = []
+        with self._lock:
+            total = sum(get_entry_size(e) for e in self.entries.values())
+            for w_id in list(self.entries.keys()):
+                if total <= self.budget:
+                    break
+                if w_id in self._keep:
+                    continue
+                entry = self.entries.pop(w_id)
+                total -= get_entry_size(entry)
+                removed.append(entry)
+        for entry in removed:
+            discard_entry(entry)
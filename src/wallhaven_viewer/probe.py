@@ -0,0 +1,142 @@
+"""
+Модуль быстрого определения формата и размеров изображения по заголовку.
+
+Разбирает заголовки JPEG, PNG и WebP, не декодируя пиксели: читается
+только начало файла (для JPEG — маркеры до SOF, с пропуском EXIF/ICC
+через seek). Используется при сохранении, индексации библиотеки и показе
+разрешения локальных файлов.
+
+Не зависит от GTK.
+"""
+
+import io
+import struct
+from collections import namedtuple
+
+# Формат ('jpeg', 'png', 'webp' — как у GdkPixbuf), размеры, цветовая модель
+# ('gray', 'gray-alpha', 'rgb', 'rgba', 'palette', 'cmyk') и бит на канал
+ImageInfo = namedtuple("ImageInfo", "format width height color_type bit_depth")
+
+# Сколько байт читать из начала файла для PNG/WebP (и начала JPEG)
+PROBE_BYTES = 4096
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_COLOR_TYPES = {0: 'gray', 2: 'rgb', 3: 'palette', 4: 'gray-alpha', 6: 'rgba'}
+JPEG_COLOR_TYPES = {1: 'gray', 3: 'rgb', 4: 'cmyk'}
+# Маркеры SOF: C0–CF, кроме DHT (C4), JPG (C8) и DAC (CC)
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Маркеры без поля длины
+JPEG_STANDALONE_MARKERS = frozenset(range(0xD0, 0xD8)) | {0x01}
+
+
+def probe_file(path):
+    """
+    Определяет формат и размеры изображения по заголовку файла.
+
+    Args:
+        path (str): Путь к изображению.
+
+    Returns:
+        ImageInfo or None: None, если формат не распознан или файл недоступен.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return _probe_stream(f)
+    except (OSError, struct.error, ValueError):
+        return None
+
+
+def probe_bytes(data):
+    """
+    Определяет формат и размеры изображения по его первым байтам.
+
+    Args:
+        data (bytes): Начало файла (для JPEG с большим EXIF может понадобиться больше PROBE_BYTES).
+
+    Returns:
+        ImageInfo or None: None, если формат не распознан или данных не хватает.
+    """
+    try:
+        return _probe_stream(io.BytesIO(data))
+    except (struct.error, ValueError):
+        return None
+
+
+def format_resolution(info):
+    """Возвращает разрешение в виде 'ШxВ' (как в ответах API) или ''."""
+    return f"{info.width}x{info.height}" if info else ""
+
+
+def _probe_stream(f):
+    head = f.read(32)
+    if head.startswith(b"\xff\xd8"):
+        f.seek(2)
+        return _probe_jpeg(f)
+    if head.startswith(PNG_SIGNATURE):
+        return _probe_png(head)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        f.seek(0)
+        return _probe_webp(f.read(PROBE_BYTES))
+    return None
+
+
+def _probe_png(head):
+    # Первый чанк всегда IHDR: длина, тип, ширина, высота, глубина, тип цвета
+    if head[12:16] != b"IHDR":
+        return None
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", head[16:26])
+    return ImageInfo('png', width, height, PNG_COLOR_TYPES.get(color_type), bit_depth)
+
+
+def _probe_jpeg(f):
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        # Байты-заполнители 0xFF перед маркером
+        while marker == b"\xff":
+            marker = f.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code in JPEG_STANDALONE_MARKERS:
+            continue
+        if code in (0xD9, 0xDA):
+            # Конец изображения или начало данных скана — SOF уже не встретится
+            return None
+        (length,) = struct.unpack(">H", f.read(2))
+        if code in JPEG_SOF_MARKERS:
+            bit_depth, height, width, components = struct.unpack(">BHHB", f.read(6))
+            return ImageInfo('jpeg', width, height, JPEG_COLOR_TYPES.get(components), bit_depth)
+        # Сегменты APPn (EXIF, ICC) бывают по 64 КБ — пропускаем, не читая
+        f.seek(length - 2, io.SEEK_CUR)
+
+
+def _probe_webp(data):
+    chunk = data[12:16]
+    if chunk == b"VP8 ":
+        # Сжатие с потерями (VP8): 3 байта тега кадра, стартовый код, размеры по 14 бит
+        if data[23:26] != b"\x9d\x01\x2a":
+            return None
+        width, height = struct.unpack("<HH", data[26:30])
+        return ImageInfo('webp', width & 0x3FFF, height & 0x3FFF, 'rgb', 8)
+    if chunk == b"VP8L":
+        if data[20:21] != b"\x2f":
+            return None
+        (bits,) = struct.unpack("<I", data[21:25])
+        width = (bits & 0x3FFF) + 1
+        height = ((bits >> 14) & 0x3FFF) + 1
+        has_alpha = (bits >> 28) & 1
+        return ImageInfo('webp', width, height, 'rgba' if has_alpha else 'rgb', 8)
+    if chunk == b"VP8X":
+        if len(data) < 30:
+            return None
+        # Расширенный формат: флаги и размеры холста по 24 бита (минус один)
+        flags = data[20]
+        width = int.from_bytes(data[24:27], 'little') + 1
+        height = int.from_bytes(data[27:30], 'little') + 1
+        return ImageInfo('webp', width, height, 'rgba' if flags & 0x10 else 'rgb', 8)
+    return None
@@ -0,0 +1,211 @@
+"""
+Модуль обслуживания библиотеки: пересжатие оригиналов без потерь.
+
+  - PNG → WebP lossless (Pillow); перед заменой пиксели сверяются с оригиналом;
+  - JPEG → оптимизация таблиц Хаффмана и progressive-развёртка (`jpegtran`),
+    данные изображения не перекодируются.
+
+Файл заменяется, только если он стал меньше хотя бы на MIN_SAVING. Имя
+(а значит, и ID для `extract_wallpaper_id`) сохраняется, меняется лишь
+расширение; sidecar переименовывается вместе с файлом (размер в нём
+обновляется), время изменения переносится, поэтому миниатюры и цветовой
+индекс остаются актуальными. Файлы, на которые ссылаются настройки
+(текущие обои), не переименовываются — только оптимизируются на месте.
+
+Работа идёт в пуле процессов. Не зависит от GTK: используется консольной
+командой `recompress`.
+"""
+
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import as_completed
+
+from wallhaven_viewer.library import scan_library
+from wallhaven_viewer.sidecar import get_sidecar_path, read_sidecar, write_sidecar, format_file_size
+from wallhaven_viewer.utils import process_pool
+
+# Минимальная доля экономии, ради которой файл заменяется
+MIN_SAVING = 0.02
+# Усилие кодировщика WebP (0–6): больше — меньше файл и дольше сжатие
+WEBP_METHOD = 6
+# Режимы PNG, которые WebP хранит без потерь (16-битные каналы — нет)
+WEBP_MODES = ('RGB', 'RGBA', 'L', 'LA', 'P', '1')
+
+
+class UnsupportedImage(Exception):
+    """Файл нельзя пересжать без потерь — он остаётся как есть."""
+
+
+def has_jpegtran():
+    """True, если в системе есть jpegtran."""
+    return shutil.which("jpegtran") is not None
+
+
+def has_webp_support():
+    """True, если Pillow умеет кодировать WebP."""
+    try:
+        from PIL import features
+        return bool(features.check("webp"))
+    except ImportError:
+        return False
+
+
+def webp_viewable():
+    """
+    True, если GdkPixbuf может открыть WebP (иначе приложение не покажет
+    перекодированные файлы). Без GdkPixbuf проверить нельзя — считаем, что может.
+    """
+    try:
+        import gi
+        gi.require_version("GdkPixbuf", "2.0")
+        from gi.repository import GdkPixbuf
+    except (ImportError, ValueError):
+        return True
+    return any(fmt.get_name() == "webp" for fmt in GdkPixbuf.Pixbuf.get_formats())
+
+
+def _transcode_webp(path, tmp_path):
+    from PIL import Image
+
+    with Image.open(path) as img:
+        if img.mode not in WEBP_MODES:
+            raise UnsupportedImage(f"режим {img.mode} не поддерживается WebP без потерь")
+        img.load()
+        save_args = {'lossless': True, 'method': WEBP_METHOD, 'exact': True}
+        if img.info.get('icc_profile'):
+            save_args['icc_profile'] = img.info['icc_profile']
+        img.save(tmp_path, "WEBP", **save_args)
+        original = img.convert("RGBA").tobytes()
+    with Image.open(tmp_path) as check:
+        if check.convert("RGBA").tobytes() != original:
+            return "пиксели WebP не совпали с оригиналом"
+    return None
+
+
+def _optimize_jpeg(path, tmp_path):
+    result = subprocess.run(
+        ["jpegtran", "-copy", "all", "-optimize", "-progressive", "-outfile", tmp_path, path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=120)
+    if result.returncode != 0:
+        return result.stderr.decode(errors="replace").strip() or "jpegtran завершился с ошибкой"
+    return None
+
+
+def _update_sidecar_size(image_path, file_size):
+    meta, tags = read_sidecar(image_path)
+    if meta:
+        meta['size'] = format_file_size(file_size)
+        write_sidecar(image_path, meta, tags)
+
+
+def recompress_file(path, dry_run=False, webp=True, jpeg=True):
+    """
+    Пересжимает один файл (выполняется в рабочем процессе).
+
+    Returns:
+        dict: path, new_path, kind, before, after, status ('saved', 'kept',
+        'skipped', 'failed'), error.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    result = {'path': path, 'new_path': path, 'kind': None, 'before': 0, 'after': 0,
+              'status': 'skipped', 'error': None}
+    if ext == '.png' and webp:
+        result['kind'] = 'png→webp'
+        new_path = os.path.splitext(path)[0] + '.webp'
+        transform = _transcode_webp
+    elif ext in ('.jpg', '.jpeg') and jpeg:
+        result['kind'] = 'jpeg'
+        new_path = path
+        transform = _optimize_jpeg
+    else:
+        return result
+
+    tmp_path = new_path + '.recompress.tmp'
+    try:
+        result['before'] = result['after'] = os.path.getsize(path)
+        error = transform(path, tmp_path)
+        if error:
+            result.update(status='failed', error=error)
+            return result
+        after = os.path.getsize(tmp_path)
+        if after > result['before'] * (1 - MIN_SAVING):
+            result['status'] = 'kept'
+            return result
+
+        result.update(after=after, status='saved', new_path=new_path)
+        if dry_run:
+            return result
+        # Время изменения оригинала: миниатюры и индексы не сочтут файл новым
+        shutil.copystat(path, tmp_path)
+        os.replace(tmp_path, new_path)
+        if new_path != path:
+            sidecar = get_sidecar_path(path)
+            if os.path.exists(sidecar):
+                os.replace(sidecar, get_sidecar_path(new_path))
+            os.remove(path)
+        _update_sidecar_size(new_path, after)
+        return result
+    except UnsupportedImage as e:
+        result.update(status='skipped', error=str(e))
+        return result
+    except Exception as e:
+        result.update(status='failed', error=str(e))
+        return result
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def recompress_library(download_path, workers=None, dry_run=False, webp=True, jpeg=True,
+                       on_progress=None, keep_paths=()):
+    """
+    Пересжимает всю библиотеку без потерь.
+
+    Args:
+        download_path (str): Папка библиотеки.
+        workers (int, optional): Число процессов; по умолчанию — число ядер.
+        dry_run (bool): Только посчитать экономию, ничего не заменяя.
+        webp (bool): Перекодировать PNG в WebP lossless (нужен Pillow с WebP).
+        jpeg (bool): Оптимизировать JPEG через jpegtran.
+        on_progress (callable, optional): Вызывается с (готово, всего).
+        keep_paths (iterable): Файлы, которые нельзя переименовывать (например,
+            текущие обои из настроек): для них PNG не перекодируется в WebP.
+
+    Returns:
+        dict: total, saved, kept, skipped, failed, bytes_before, bytes_after,
+        seconds, dry_run, errors (список {path, error}).
+    """
+    start = time.perf_counter()
+    webp = webp and has_webp_support()
+    jpeg = jpeg and has_jpegtran()
+    library = scan_library(download_path)
+    report = {'total': len(library), 'saved': 0, 'kept': 0, 'skipped': 0, 'failed': 0,
+              'bytes_before': 0, 'bytes_after': 0, 'seconds': 0.0, 'dry_run': dry_run,
+              'webp': webp, 'jpegtran': jpeg, 'errors': []}
+
+    paths = list(library.values())
+    if paths and (webp or jpeg):
+        with process_pool(workers) as pool:
+            keep_paths = {os.path.abspath(p) for p in keep_paths if p}
+            futures = [pool.submit(recompress_file, path, dry_run,
+                                   webp and os.path.abspath(path) not in keep_paths, jpeg)
+                       for path in paths]
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'path': None, 'status': 'failed', 'error': str(e), 'before': 0, 'after': 0}
+                report[result['status']] += 1
+                report['bytes_before'] += result['before']
+                report['bytes_after'] += result['after']
+                if result['status'] == 'failed':
+                    report['errors'].append({'path': result['path'], 'error': result['error']})
+                if on_progress:
+                    on_progress(done, len(paths))
+    else:
+        report['skipped'] = len(paths)
+
+    report['seconds'] = time.perf_counter() - start
+    return report
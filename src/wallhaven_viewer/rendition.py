@@ -0,0 +1,159 @@
+"""
+Модуль подготовки копий обоев точно под разрешение монитора (renditions).
+
+Композитор декодирует и масштабирует файл обоев при каждом входе в сеанс и
+смене рабочего стола; 8K PNG на экране 1080p — это сотни мегабайт памяти и
+заметная задержка. Поэтому вместо оригинала можно установить заранее
+подготовленную копию нужного размера. Копии лежат в кэше и пересоздаются,
+только если изменились оригинал, размер экрана или режим подгонки.
+
+Масштабирование — Pillow (LANCZOS), если установлен, иначе GdkPixbuf (HYPER).
+
+Не зависит от Gtk: используется и окном просмотра, и фоновой сменой обоев.
+"""
+
+import os
+
+from wallhaven_viewer.utils import get_cache_dir
+
+# Режимы подгонки: 'original' — без копии, 'fill' — заполнить экран с обрезкой
+# по центру, 'fit' — вписать целиком с полями
+FIT_MODES = ("original", "fill", "fit")
+RENDITION_QUALITY = 92
+# Цвет полей в режиме 'fit'
+FIT_BACKGROUND = (0, 0, 0)
+
+
+def get_renditions_dir():
+    """Возвращает папку копий обоев в кэше или None."""
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return None
+    renditions_dir = os.path.join(cache_dir, "renditions")
+    os.makedirs(renditions_dir, exist_ok=True)
+    return renditions_dir
+
+
+def get_rendition_path(source_path, size, mode):
+    """Возвращает путь к копии обоев для размера экрана и режима подгонки."""
+    renditions_dir = get_renditions_dir()
+    if not renditions_dir:
+        return None
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    width, height = size
+    return os.path.join(renditions_dir, f"{stem}-{width}x{height}-{mode}.jpg")
+
+
+def get_placement(src_w, src_h, size, mode):
+    """
+    Вычисляет размер масштабированного изображения и его смещение на экране.
+
+    Returns:
+        tuple: (scaled_w, scaled_h, offset_x, offset_y); смещение отрицательное
+        при обрезке ('fill') и положительное при полях ('fit').
+    """
+    width, height = size
+    if mode == "fill":
+        scale = max(width / src_w, height / src_h)
+    else:
+        scale = min(width / src_w, height / src_h)
+    scaled_w = max(1, round(src_w * scale))
+    scaled_h = max(1, round(src_h * scale))
+    return scaled_w, scaled_h, (width - scaled_w) // 2, (height - scaled_h) // 2
+
+
+def make_rendition(source_path, size, mode="fill"):
+    """
+    Возвращает копию обоев под экран, создавая её при необходимости.
+
+    Args:
+        source_path (str): Оригинал.
+        size (tuple): (ширина, высота) экрана в физических пикселях.
+        mode (str): Режим подгонки (см. FIT_MODES).
+
+    Returns:
+        str: Путь к копии; путь к оригиналу, если копия не нужна
+        ('original', оригинал уже точно под экран) или не удалась.
+    """
+    if mode not in FIT_MODES or mode == "original" or not size:
+        return source_path
+    rendition_path = get_rendition_path(source_path, size, mode)
+    if not rendition_path:
+        return source_path
+    try:
+        if os.path.getmtime(rendition_path) >= os.path.getmtime(source_path):
+            return rendition_path
+    except OSError:
+        pass
+
+    tmp_path = rendition_path + ".tmp"
+    try:
+        try:
+            from PIL import Image
+        except ImportError:
+            Image = None
+        if Image is not None:
+            done = _render_pillow(Image, source_path, tmp_path, size, mode)
+        else:
+            done = _render_pixbuf(source_path, tmp_path, size, mode)
+        if not done:
+            return source_path
+        os.replace(tmp_path, rendition_path)
+        return rendition_path
+    except Exception as e:
+        print(f"Ошибка подготовки копии обоев {source_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return source_path
+
+
+def _render_pillow(Image, source_path, dest_path, size, mode):
+    with Image.open(source_path) as img:
+        if img.size == tuple(size):
+            return False
+        scaled_w, scaled_h, x, y = get_placement(img.width, img.height, size, mode)
+        # draft: JPEG декодируется сразу в уменьшенном масштабе (не меньше нужного)
+        img.draft("RGB", (scaled_w, scaled_h))
+        scaled = img.convert("RGB").resize((scaled_w, scaled_h), Image.LANCZOS)
+    canvas = Image.new("RGB", tuple(size), FIT_BACKGROUND)
+    canvas.paste(scaled, (x, y))
+    canvas.save(dest_path, "JPEG", quality=RENDITION_QUALITY, subsampling=0, optimize=True)
+    return True
+
+
+def _render_pixbuf(source_path, dest_path, size, mode):
+    import gi
+    gi.require_version("GdkPixbuf", "2.0")
+    from gi.repository import GdkPixbuf
+
+    fmt, src_w, src_h = GdkPixbuf.Pixbuf.get_file_info(source_path)
+    if fmt is None or (src_w, src_h) == tuple(size):
+        return False
+    width, height = size
+    scaled_w, scaled_h, x, y = get_placement(src_w, src_h, size, mode)
+    source = GdkPixbuf.Pixbuf.new_from_file(source_path)
+    canvas = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8, width, height)
+    r, g, b = FIT_BACKGROUND
+    canvas.fill((r << 24) | (g << 16) | (b << 8) | 0xFF)
+    # Копируем только видимую на экране часть масштабированного изображения
+    dest_x, dest_y = max(0, x), max(0, y)
+    dest_w, dest_h = min(width, scaled_w), min(height, scaled_h)
+    source.scale(canvas, dest_x, dest_y, dest_w, dest_h, x, y,
+                 scaled_w / src_w, scaled_h / src_h, GdkPixbuf.InterpType.HYPER)
+    canvas.savev(dest_path, "jpeg", ["quality"], [str(RENDITION_QUALITY)])
+    return True
+
+
+def prune_renditions(keep_size):
+    """Удаляет копии для других размеров экрана (после смены мониторов)."""
+    renditions_dir = get_renditions_dir()
+    if not renditions_dir:
+        return
+    width, height = keep_size
+    marker = f"-{width}x{height}-"
+    for name in os.listdir(renditions_dir):
+        if marker not in name:
+            try:
+                os.remove(os.path.join(renditions_dir, name))
+            except OSError:
+                continue
@@ -0,0 +1,96 @@
+"""
+Модуль ресурсов приложения (GResource).
+
+UI-файлы, CSS и иконки компилируются в один бандл, который регистрируется
+один раз при старте; окна читают их из памяти по resource-путям.
+Сборка бандла (в Flatpak выполняется автоматически):
+
+    glib-compile-resources --sourcedir=data data/cc.wallhaven.Viewer.gresource.xml \\
+        --target=data/wallhaven-viewer.gresource
+
+Если бандл не найден (dev-режим без сборки), используются отдельные файлы
+из data/ через `utils.resolve_path`.
+"""
+
+import os
+import gi
+gi.require_version("Gtk", "4.0")
+from gi.repository import Gio, Gtk
+
+from wallhaven_viewer.utils import resolve_path
+
+RESOURCE_PREFIX = "/cc/wallhaven/Viewer"
+RESOURCE_FILE = "wallhaven-viewer.gresource"
+
+# Подкаталог ресурса для каждого типа файла
+_SUBDIRS = {".ui": "ui", ".css": "css"}
+
+_registered = None
+
+
+def find_bundle():
+    """Ищет скомпилированный бандл: рядом с модулем, в Flatpak, в data/ проекта."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    candidates = [
+        os.path.join(here, RESOURCE_FILE),
+        os.path.join("/app/share/wallhaven_viewer", RESOURCE_FILE),
+        os.path.join(here, "..", "..", "data", RESOURCE_FILE),
+    ]
+    for path in candidates:
+        if os.path.isfile(path):
+            return os.path.normpath(path)
+    return None
+
+
+def register_resources():
+    """
+    Регистрирует бандл ресурсов (повторные вызовы ничего не делают).
+
+    Returns:
+        bool: True, если ресурсы доступны через resource://.
+    """
+    global _registered
+    if _registered is not None:
+        return _registered
+    _registered = False
+    path = find_bundle()
+    if not path:
+        print("Бандл ресурсов не найден, используются файлы из data/")
+        return False
+    try:
+        Gio.Resource.load(path)._register()
+        _registered = True
+    except Exception as e:
+        print(f"Ошибка загрузки ресурсов {path}: {e}")
+    return _registered
+
+
+def get_resource_path(filename):
+    """Возвращает путь внутри бандла для файла из data/ (например, 'mainwindow.ui')."""
+    subdir = _SUBDIRS.get(os.path.splitext(filename)[1])
+    if subdir:
+        return f"{RESOURCE_PREFIX}/{subdir}/{filename}"
+    return f"{RESOURCE_PREFIX}/{filename}"
+
+
+def new_builder(filename):
+    """
+    Создаёт Gtk.Builder для UI-файла из бандла или, в dev-режиме, с диска.
+
+    Args:
+        filename (str): Имя UI-файла (например, 'fullimage.ui').
+
+    Returns:
+        Gtk.Builder: Построенный builder.
+    """
+    if register_resources():
+        return Gtk.Builder.new_from_resource(get_resource_path(filename))
+    return Gtk.Builder.new_from_file(resolve_path(filename))
+
+
+def load_css(provider, filename):
+    """Загружает CSS в провайдер из бандла или, в dev-режиме, с диска."""
+    if register_resources():
+        provider.load_from_resource(get_resource_path(filename))
+    else:
+        provider.load_from_path(resolve_path(filename))
@@ -0,0 +1,321 @@
+"""
+Модуль фоновой смены обоев по расписанию.
+
+Источник обоев — локальная библиотека, сохранённый поиск или коллекция
+Wallhaven (из локального кэша коллекций). Следующие
+обои готовятся сразу после смены (скачивание, проверка, подгонка под
+экран), поэтому в момент переключения остаётся только установить готовый
+файл, а между переключениями поток просто спит.
+
+Не зависит от Gtk: запускается консольной командой `rotate` без главного окна.
+"""
+
+import os
+import json
+import random
+import threading
+import time
+
+from wallhaven_viewer.api import WallhavenAPI
+from wallhaven_viewer.collections_cache import CollectionCache
+from wallhaven_viewer.config import get_config_dir
+from wallhaven_viewer.download_manager import DownloadManager
+from wallhaven_viewer.library import scan_library, find_existing_file
+from wallhaven_viewer.rendition import make_rendition
+from wallhaven_viewer.wallpaper import is_valid_image, set_wallpaper
+
+STATE_FILE = "rotation.json"
+# Сколько последних обоев помнить, чтобы не повторять их слишком скоро
+HISTORY_SIZE = 50
+# Сколько кандидатов пробовать, прежде чем отложить смену до следующего раза
+MAX_CANDIDATES = 10
+
+
+def download_to_library(downloads, wallpaper_id, download_path):
+    """
+    Скачивает обои очередью загрузок и ждёт завершения.
+
+    Returns:
+        str or None: Путь к файлу или None при ошибке.
+    """
+    downloads.enqueue([wallpaper_id], download_path)
+    downloads.wait()
+    job = downloads.jobs.get(wallpaper_id, {})
+    path = job.get('path') if job.get('status') == 'done' else None
+    downloads.clear_finished()
+    return path
+
+
+def parse_interval(text):
+    """
+    Разбирает интервал вида 90, 90s, 15m, 2h, 1d.
+
+    Returns:
+        int: Интервал в секундах.
+    """
+    text = str(text).strip().lower()
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text))
+
+
+def get_state_path():
+    """Возвращает путь к файлу состояния смены обоев."""
+    return os.path.join(get_config_dir(), STATE_FILE)
+
+
+def load_history():
+    """Возвращает список ID последних установленных обоев."""
+    path = get_state_path()
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('history', [])
+    except Exception as e:
+        print(f"Ошибка чтения состояния смены обоев: {e}")
+        return []
+
+
+def save_history(history):
+    """Атомарно сохраняет историю установленных обоев."""
+    path = get_state_path()
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'history': history[-HISTORY_SIZE:]}, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Ошибка записи состояния смены обоев: {e}")
+
+
+class LibrarySource:
+    """
+    Источник: локальная библиотека в случайном порядке без повторов, пока
+    не будут показаны все обои («мешок» перемешанных ID).
+
+    Args:
+        download_path (str): Папка библиотеки.
+    """
+
+    def __init__(self, download_path):
+        self.download_path = download_path
+        self._bag = []
+
+    def next_candidate(self, history):
+        """Возвращает (wallpaper_id, путь) или None, если библиотека пуста."""
+        if not self._bag:
+            library = scan_library(self.download_path)
+            recent = set(history[-min(HISTORY_SIZE, len(library) // 2):]) if library else set()
+            self._bag = [w_id for w_id in library if w_id not in recent] or list(library)
+            random.shuffle(self._bag)
+        while self._bag:
+            w_id = self._bag.pop()
+            path = find_existing_file(self.download_path, w_id)
+            if path:
+                return w_id, path
+        return None
+
+
+class SearchSource:
+    """
+    Источник: сохранённый поиск Wallhaven. Выдача обходится постранично
+    (для случайной сортировки — с одним seed), недостающие обои скачиваются
+    в папку загрузок обычной очередью загрузок.
+
+    Args:
+        spec (dict): Настройки поиска (как для `build_search_params`) плюс 'query'.
+        download_path (str): Куда скачивать обои.
+    """
+
+    def __init__(self, spec, download_path):
+        self.spec = spec
+        self.download_path = download_path
+        self._ids = []
+        self._page = 0
+        self._last_page = None
+        self._total = None
+        self._seed = WallhavenAPI.new_seed()
+        self._downloads = DownloadManager(parallelism=1)
+
+    def _fetch_page(self):
+        if self._last_page is not None and self._page >= self._last_page:
+            # Выдача пройдена — начинаем заново (для random — новая перестановка)
+            self._page = 0
+            self._seed = WallhavenAPI.new_seed()
+        self._page += 1
+        data, meta = WallhavenAPI.search_wallpapers(self.spec.get('query', ''), self._page, self.spec, seed=self._seed)
+        if data is None:
+            return False
+        meta = meta or {}
+        self._seed = meta.get('seed') or self._seed
+        self._last_page = meta.get('last_page', self._page)
+        self._total = meta.get('total', self._total)
+        self._ids.extend(w['id'] for w in data if w.get('id'))
+        return bool(data)
+
+    def next_candidate(self, history):
+        """Возвращает (wallpaper_id, путь) или None, если выдача недоступна."""
+        fetched = 0
+        while True:
+            if not self._ids:
+                # Страницы без подходящих кандидатов не перебираем бесконечно
+                if fetched >= MAX_CANDIDATES or not self._fetch_page():
+                    return None
+                fetched += 1
+            # В маленькой выдаче повторы неизбежны: исключаем не больше половины
+            window = min(HISTORY_SIZE, (self._total or HISTORY_SIZE * 2) // 2)
+            w_id = self._ids.pop(0)
+            if window and w_id in history[-window:]:
+                continue
+            path = find_existing_file(self.download_path, w_id)
+            if not path:
+                path = download_to_library(self._downloads, w_id, self.download_path)
+            if path:
+                return w_id, path
+
+
+class CollectionSource:
+    """
+    Источник: коллекция Wallhaven в случайном порядке без повторов, пока не
+    будут показаны все обои. Содержимое берётся из кэша коллекций
+    (`CollectionCache`): в начале каждого прохода кэш сверяется с API, а если
+    API недоступен, используется сохранённая копия. Недостающие обои
+    скачиваются в папку загрузок.
+
+    Args:
+        spec (dict): Настройки (API-ключ и фильтр purity).
+        username (str): Владелец коллекции.
+        collection_id (str): ID коллекции.
+        download_path (str): Куда скачивать обои.
+    """
+
+    def __init__(self, spec, username, collection_id, download_path):
+        self.spec = spec
+        self.download_path = download_path
+        self.cache = CollectionCache.load(username, collection_id, WallhavenAPI.build_purity(spec))
+        self._bag = []
+        self._downloads = DownloadManager(parallelism=1)
+
+    def _collection_ids(self):
+        changed = self.cache.revalidate(self.spec)
+        if changed is None and self.cache.items:
+            print("⚠️  Коллекция недоступна — используется сохранённая копия")
+        cached_count = len(self.cache.items)
+        ids = []
+        page = 1
+        while True:
+            items, more = self.cache.get_page(page, self.spec)
+            if items is None:
+                break
+            ids.extend(item['id'] for item in items if item.get('id'))
+            if not more:
+                break
+            page += 1
+        if changed or len(self.cache.items) != cached_count:
+            self.cache.save()
+        return ids
+
+    def next_candidate(self, history):
+        """Возвращает (wallpaper_id, путь) или None, если коллекция пуста или недоступна."""
+        if not self._bag:
+            ids = self._collection_ids()
+            recent = set(history[-min(HISTORY_SIZE, len(ids) // 2):]) if ids else set()
+            self._bag = [w_id for w_id in ids if w_id not in recent] or ids
+            random.shuffle(self._bag)
+        while self._bag:
+            w_id = self._bag.pop()
+            path = find_existing_file(self.download_path, w_id)
+            if not path:
+                path = download_to_library(self._downloads, w_id, self.download_path)
+            if path:
+                return w_id, path
+        return None
+
+
+class RotationService:
+    """
+    Смена обоев по расписанию.
+
+    Args:
+        source: Источник кандидатов (`LibrarySource`, `SearchSource` или `CollectionSource`).
+        interval (int): Интервал смены в секундах.
+        screen_size (tuple, optional): (ширина, высота) для подгонки под экран;
+            None — устанавливать оригинал.
+        fit_mode (str): Режим подгонки под экран (см. `rendition.FIT_MODES`).
+        on_applied (callable, optional): Вызывается с (wallpaper_id, путь) после смены.
+    """
+
+    def __init__(self, source, interval, screen_size=None, fit_mode="fill", on_applied=None):
+        self.source = source
+        self.interval = max(1, int(interval))
+        self.screen_size = screen_size
+        self.fit_mode = fit_mode
+        self.on_applied = on_applied
+        self.history = load_history()
+        self._stop = threading.Event()
+        self._next = None
+
+    def stop(self):
+        """Останавливает цикл `run` (из любого потока)."""
+        self._stop.set()
+
+    def prepare_next(self):
+        """
+        Готовит следующие обои: выбирает кандидата, при необходимости
+        скачивает, проверяет и подгоняет под экран.
+
+        Returns:
+            tuple or None: (wallpaper_id, путь к готовому файлу).
+        """
+        for _ in range(MAX_CANDIDATES):
+            candidate = self.source.next_candidate(self.history)
+            if candidate is None:
+                return None
+            w_id, path = candidate
+            if not is_valid_image(path):
+                print(f"⚠️  Пропускаем повреждённый файл: {path}")
+                continue
+            return w_id, make_rendition(path, self.screen_size, self.fit_mode)
+        return None
+
+    def switch(self, prepare_ahead=True):
+        """
+        Устанавливает подготовленные обои (или готовит их сейчас) и сразу
+        готовит следующие.
+
+        Args:
+            prepare_ahead (bool): Готовить ли следующие обои заранее.
+
+        Returns:
+            bool: True, если обои сменились.
+        """
+        prepared = self._next or self.prepare_next()
+        self._next = None
+        applied = False
+        if prepared and set_wallpaper(prepared[1]):
+            w_id, path = prepared
+            self.history = (self.history + [w_id])[-HISTORY_SIZE:]
+            save_history(self.history)
+            applied = True
+            if self.on_applied:
+                self.on_applied(w_id, path)
+        if prepare_ahead and not self._stop.is_set():
+            self._next = self.prepare_next()
+        return applied
+
+    def run(self, once=False):
+        """
+        Цикл смены обоев; блокирует поток до `stop`.
+
+        Args:
+            once (bool): Сменить обои один раз и вернуться.
+        """
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.switch(prepare_ahead=not once)
+            if once:
+                return
+            # Между сменами поток спит, не просыпаясь по таймерам
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
@@ -0,0 +1,110 @@
+"""
+Модуль снимка сессии главного окна: выдача, страницы и позиция прокрутки.
+
+Снимок сохраняется при закрытии и позволяет при следующем запуске мгновенно
+восстановить сетку из кэша миниатюр, не дожидаясь API.
+"""
+
+import os
+import json
+import time
+
+from wallhaven_viewer.utils import get_cache_dir
+
+SESSION_FILE = "session.json"
+# Версия формата снимка; снимки другой версии игнорируются
+SESSION_VERSION = 1
+# Сколько элементов выдачи сохранять (дальше — подгрузка обычным путём)
+MAX_SESSION_ITEMS = 1000
+
+
+def get_session_path():
+    """Возвращает путь к файлу снимка сессии или None, если кэш недоступен."""
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return None
+    return os.path.join(cache_dir, SESSION_FILE)
+
+
+def save_session(query, search_state, items, colors, page, has_more, scroll, seed=None):
+    """
+    Атомарно сохраняет снимок сессии.
+
+    Args:
+        query (str): Поисковый запрос.
+        search_state (dict): Состояние фильтров (`MainWindow.get_current_search_state`).
+        items (list): Элементы выдачи (thumb_url, full_url, wallpaper_id, local_path).
+        colors (dict): Основной цвет миниатюры по ID обоев.
+        page (int): Номер последней загруженной страницы.
+        has_more (bool): Есть ли ещё страницы.
+        scroll (float): Позиция вертикальной прокрутки.
+        seed (str, optional): Seed случайной выдачи для продолжения обхода.
+    """
+    path = get_session_path()
+    if not path:
+        return
+    items = items[:MAX_SESSION_ITEMS]
+    if len(items) < MAX_SESSION_ITEMS:
+        truncated_page = page
+    else:
+        # Страницы после обрезки будут подгружены заново
+        truncated_page = max(1, page - 1)
+        has_more = True
+    snapshot = {
+        'version': SESSION_VERSION,
+        'saved': int(time.time()),
+        'query': query,
+        'search': search_state,
+        'page': truncated_page,
+        'has_more': has_more,
+        'scroll': scroll,
+        'seed': seed,
+        # Компактно: [id, миниатюра, оригинал, цвет]; local_path пересчитывается по библиотеке
+        'items': [[w_id, thumb_url, full_url, colors.get(w_id, '')]
+                  for thumb_url, full_url, w_id, _local in items],
+    }
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Ошибка сохранения сессии: {e}")
+
+
+def load_session(query, search_state):
+    """
+    Загружает снимок сессии, если он сделан для того же запроса и фильтров.
+
+    Returns:
+        dict or None: Словарь с ключами items, colors, page, has_more, scroll, seed
+        или None, если подходящего снимка нет.
+    """
+    path = get_session_path()
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except Exception as e:
+        print(f"Ошибка чтения сессии: {e}")
+        return None
+
+    if (snapshot.get('version') != SESSION_VERSION or snapshot.get('query') != query
+            or snapshot.get('search') != search_state or not snapshot.get('items')):
+        return None
+
+    items = []
+    colors = {}
+    for w_id, thumb_url, full_url, color in snapshot['items']:
+        items.append((thumb_url, full_url, w_id, None))
+        if color:
+            colors[w_id] = color
+    return {
+        'items': items,
+        'colors': colors,
+        'page': int(snapshot.get('page', 1)),
+        'has_more': bool(snapshot.get('has_more', True)),
+        'scroll': float(snapshot.get('scroll', 0.0)),
+        'seed': snapshot.get('seed'),
+    }
@@ -5,14 +5,18 @@
 import gi
 gi.require_version("Gtk", "4.0")
 from gi.repository import Gtk, Gio
-from wallhaven_viewer.config import load_settings, save_settings
+from wallhaven_viewer.config import save_settings_async
+from wallhaven_viewer.rendition import FIT_MODES
+
+# Подписи режимов подгонки обоев в порядке FIT_MODES
+FIT_LABELS = ["Оригинал", "Заполнить экран (с обрезкой)", "Вписать целиком"]
 
 
 class SettingsWindow(Gtk.Window):
     """
     Окно настроек приложения.
 
-    Позволяет пользователю настроить API-ключ, путь для сохранения обоев
+    Позволяет пользователю настроить API-ключ и имя пользователя, путь для сохранения обоев
     и количество колонок в сетке главного окна.
 
     Args:
@@ -26,7 +30,8 @@ class SettingsWindow(Gtk.Window):
         self.set_default_size(400, 300)
 
         self.parent_window = parent
-        self.current_settings = load_settings()
+        # Настройки главного окна актуальнее файла: запись на диск отложенная
+        self.current_settings = dict(parent.settings)
 
         vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=15)
         vbox.set_margin_start(20)
@@ -41,6 +46,12 @@ class SettingsWindow(Gtk.Window):
         self.entry_api.set_text(self.current_settings['api_key'])
         vbox.append(self.entry_api)
 
+        # Имя пользователя (коллекции)
+        vbox.append(Gtk.Label(label="<b>Имя пользователя Wallhaven (для коллекций):</b>", use_markup=True, xalign=0))
+        self.entry_username = Gtk.Entry()
+        self.entry_username.set_text(self.current_settings.get('username', ''))
+        vbox.append(self.entry_username)
+
         vbox.append(Gtk.Separator())
 
         # Путь сохранения
@@ -76,6 +87,37 @@ class SettingsWindow(Gtk.Window):
 
         vbox.append(Gtk.Separator())
 
+        # Массовая загрузка
+        hbox_parallel = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        vbox.append(hbox_parallel)
+        hbox_parallel.append(Gtk.Label(label="Одновременных загрузок:", xalign=0))
+
+        adj_parallel = Gtk.Adjustment(value=int(self.current_settings['download_parallelism']), lower=1, upper=8, step_increment=1)
+        self.spin_parallel = Gtk.SpinButton(adjustment=adj_parallel)
+        hbox_parallel.append(self.spin_parallel)
+
+        hbox_bandwidth = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        vbox.append(hbox_bandwidth)
+        hbox_bandwidth.append(Gtk.Label(label="Лимит скорости, КБ/с (0 — без лимита):", xalign=0))
+
+        adj_bandwidth = Gtk.Adjustment(value=int(self.current_settings['download_bandwidth_kbps']), lower=0, upper=1000000, step_increment=100)
+        self.spin_bandwidth = Gtk.SpinButton(adjustment=adj_bandwidth)
+        hbox_bandwidth.append(self.spin_bandwidth)
+
+        vbox.append(Gtk.Separator())
+
+        # Обои рабочего стола
+        hbox_fit = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        vbox.append(hbox_fit)
+        hbox_fit.append(Gtk.Label(label="Обои под размер экрана:", xalign=0))
+
+        self.fit_dropdown = Gtk.DropDown.new_from_strings(FIT_LABELS)
+        fit_mode = self.current_settings.get('wallpaper_fit', 'original')
+        self.fit_dropdown.set_selected(FIT_MODES.index(fit_mode) if fit_mode in FIT_MODES else 0)
+        hbox_fit.append(self.fit_dropdown)
+
+        vbox.append(Gtk.Separator())
+
         btn_save = Gtk.Button(label="Сохранить настройки")
         btn_save.add_css_class("suggested-action")
         btn_save.connect("clicked", self.on_save_clicked)
@@ -104,14 +146,18 @@ class SettingsWindow(Gtk.Window):
         """
         new_app_settings = {
             'api_key': self.entry_api.get_text().strip(),
+            'username': self.entry_username.get_text().strip(),
             'download_path': self.entry_path.get_text().strip(),
-            'columns': str(int(self.spin_cols.get_value()))
+            'columns': str(int(self.spin_cols.get_value())),
+            'download_parallelism': str(int(self.spin_parallel.get_value())),
+            'download_bandwidth_kbps': str(int(self.spin_bandwidth.get_value())),
+            'wallpaper_fit': FIT_MODES[self.fit_dropdown.get_selected()],
         }
 
         current_search_state = self.parent_window.get_current_search_state()
         final_settings = {**self.parent_window.settings, **new_app_settings, **current_search_state}
 
-        save_settings(final_settings)
+        save_settings_async(final_settings)
         self.parent_window.apply_settings(final_settings)
         self.parent_window.scan_downloaded_wallpapers()
         self.close()
@@ -0,0 +1,90 @@
+"""
+Модуль для работы с sidecar-файлами метаданных (<изображение>.meta.json).
+"""
+
+import os
+import json
+
+
+def get_sidecar_path(image_path):
+    """Возвращает путь к sidecar-файлу для изображения."""
+    return image_path + '.meta.json'
+
+
+def format_file_size(file_size):
+    """Возвращает размер файла в байтах строкой для sidecar ('1.23 MB')."""
+    try:
+        return f"{float(file_size) / (1024 * 1024):.2f} MB"
+    except Exception:
+        return str(file_size)
+
+
+def build_meta_info(wallpaper_info):
+    """
+    Формирует словарь метаданных для отображения и sidecar из ответа API.
+
+    Args:
+        wallpaper_info (dict): Данные обоев от `WallhavenAPI.get_wallpaper_info`.
+
+    Returns:
+        dict or None: Словарь с ключами size, uploader, views, favorites, resolution.
+    """
+    if not wallpaper_info:
+        return None
+    try:
+        file_size = wallpaper_info.get('file_size') or wallpaper_info.get('size') or 0
+        size_str = format_file_size(file_size)
+
+        uploader = wallpaper_info.get('uploaded_by') or wallpaper_info.get('uploader') or wallpaper_info.get('user') or ''
+        views = wallpaper_info.get('views', '')
+        favorites = wallpaper_info.get('favorites', '') or wallpaper_info.get('favourites', '')
+
+        return {
+            'size': size_str,
+            'uploader': uploader,
+            'views': views,
+            'favorites': favorites,
+            'resolution': wallpaper_info.get('resolution', ''),
+        }
+    except Exception:
+        return None
+
+
+def read_sidecar(image_path):
+    """
+    Читает sidecar рядом с изображением.
+
+    Args:
+        image_path (str): Путь к изображению.
+
+    Returns:
+        tuple: (meta, tags) или (None, None), если sidecar отсутствует или повреждён.
+    """
+    path = get_sidecar_path(image_path)
+    if not os.path.exists(path):
+        return None, None
+    try:
+        with open(path, 'r', encoding='utf-8') as sf:
+            j = json.load(sf)
+        return j.get('meta'), j.get('tags') or []
+    except Exception as e:
+        print(f"Ошибка чтения sidecar {path}: {e}")
+        return None, None
+
+
+def write_sidecar(image_path, meta, tags):
+    """
+    Записывает sidecar рядом с изображением, чтобы при открытии локального
+    файла можно было восстановить метаданные без обращения к API.
+
+    Args:
+        image_path (str): Путь к изображению.
+        meta (dict): Метаданные (см. `build_meta_info`).
+        tags (list): Список тегов из ответа API.
+    """
+    path = get_sidecar_path(image_path)
+    try:
+        with open(path, 'w', encoding='utf-8') as sf:
+            json.dump({'meta': meta, 'tags': tags}, sf, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"Не удалось записать sidecar: {e}")
@@ -0,0 +1,59 @@
+"""
+Модуль наблюдения за зависаниями главного цикла GTK.
+
+Таймер главного цикла работает, только пока открыто окно «Диагностика»,
+или всё время работы при заданной переменной окружения WALLHAVEN_STALL_MONITOR:
+
+    WALLHAVEN_STALL_MONITOR=1 python -m wallhaven_viewer
+"""
+
+import os
+import time
+from gi.repository import GLib
+
+from wallhaven_viewer import metrics
+
+STALL_MONITOR_ENV = "WALLHAVEN_STALL_MONITOR"
+# Период опроса главного цикла, мс
+STALL_TICK_MS = 50
+# Задержка тика сверх периода, начиная с которой она считается зависанием, мс
+STALL_THRESHOLD_MS = 50
+
+
+def is_enabled():
+    """True, если наблюдение включено на всё время работы."""
+    return bool(os.environ.get(STALL_MONITOR_ENV))
+
+
+class StallMonitor:
+    """
+    Обнаруживает зависания главного цикла GTK.
+
+    Таймер с периодом STALL_TICK_MS срабатывает в главном потоке; если
+    очередной тик опоздал больше чем на STALL_THRESHOLD_MS, главный цикл был
+    занят, и длительность опоздания пишется в гистограмму `mainloop.stall`.
+    """
+
+    def __init__(self):
+        self._last = None
+        self._source_id = None
+
+    def start(self):
+        """Запускает наблюдение (повторный вызов ничего не делает)."""
+        if self._source_id is None:
+            self._last = time.perf_counter()
+            self._source_id = GLib.timeout_add(STALL_TICK_MS, self._tick)
+
+    def stop(self):
+        """Останавливает наблюдение."""
+        if self._source_id is not None:
+            GLib.source_remove(self._source_id)
+            self._source_id = None
+
+    def _tick(self):
+        now = time.perf_counter()
+        late_ms = (now - self._last) * 1000 - STALL_TICK_MS
+        self._last = now
+        if late_ms > STALL_THRESHOLD_MS:
+            metrics.record_span("mainloop.stall", metrics.now_us() - late_ms * 1000, late_ms * 1000)
+        return True
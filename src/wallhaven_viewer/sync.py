@@ -0,0 +1,148 @@
+"""
+Модуль инкрементального зеркалирования поисковых выдач в папку загрузок.
+
+Не зависит от GTK: используется консольным режимом (`sync`).
+"""
+
+import os
+import json
+import time
+import hashlib
+
+from wallhaven_viewer.api import WallhavenAPI
+from wallhaven_viewer.download_manager import DownloadManager
+from wallhaven_viewer.library import scan_library
+
+# Файл манифеста в папке зеркала
+MANIFEST_NAME = ".wallhaven-sync.json"
+
+
+def get_spec_key(spec):
+    """
+    Возвращает стабильный ключ поисковой спецификации (без страницы и API-ключа).
+
+    Args:
+        spec (dict): Настройки поиска плюс необязательный ключ 'query'.
+
+    Returns:
+        str: Короткий хеш параметров запроса.
+    """
+    params = WallhavenAPI.build_search_params(spec, spec.get('query', ''), 1)
+    params.pop('page', None)
+    params.pop('apikey', None)
+    raw = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def load_manifest(download_path):
+    """Читает манифест зеркала; при отсутствии возвращает пустой."""
+    path = os.path.join(download_path, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Ошибка чтения манифеста {path}: {e}")
+        return {}
+
+
+def save_manifest(download_path, manifest):
+    """Атомарно записывает манифест зеркала."""
+    path = os.path.join(download_path, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def sync_collection(spec, download_path, max_pages=0, parallelism=3, bandwidth_kbps=0,
+                    on_progress=None, dry_run=False):
+    """
+    Синхронизирует выдачу поиска с папкой загрузок.
+
+    Страницы проходятся по порядку; скачиваются только ID, которых нет ни в
+    библиотеке, ни в очереди. Для сортировки по дате (новые сначала) обход
+    останавливается на первой странице, где встретились ID из прошлой полной
+    синхронизации: всё дальше уже было просмотрено.
+
+    Args:
+        spec (dict): Настройки поиска (как для `build_search_params`) плюс 'query'.
+        download_path (str): Папка зеркала.
+        max_pages (int): Ограничение числа страниц; 0 — без ограничения.
+        parallelism (int): Число одновременных загрузок.
+        bandwidth_kbps (int): Общий лимит скорости, КБ/с.
+        on_progress (callable, optional): Колбэк прогресса загрузок (см. DownloadManager).
+        dry_run (bool): Только посчитать новые элементы, ничего не скачивая.
+
+    Returns:
+        dict: Отчёт: pages, found, new, downloaded, failed, stopped_early.
+    """
+    os.makedirs(download_path, exist_ok=True)
+    query = spec.get('query', '')
+    params = WallhavenAPI.build_search_params(spec, query, 1)
+    date_sorted = params.get('sorting') == 'date_added'
+
+    key = get_spec_key(spec)
+    manifest = load_manifest(download_path)
+    state = manifest.get(key, {})
+    seen = set(state.get('seen', []))
+    can_stop_early = date_sorted and state.get('complete', False) and bool(seen)
+
+    present = set(scan_library(download_path).keys())
+    encountered = []
+    new_ids = []
+    report = {'pages': 0, 'found': 0, 'new': 0, 'downloaded': 0, 'failed': 0, 'stopped_early': False}
+
+    page = 1
+    seed = WallhavenAPI.new_seed()
+    while True:
+        data, meta = WallhavenAPI.search_wallpapers(query, page, spec, seed=seed)
+        if data is None:
+            raise RuntimeError(f"ошибка API на странице {page}")
+        seed = (meta or {}).get('seed') or seed
+        report['pages'] += 1
+
+        page_ids = [w.get('id') for w in data if w.get('id')]
+        encountered.extend(page_ids)
+        for w_id in page_ids:
+            if w_id not in present and w_id not in new_ids:
+                new_ids.append(w_id)
+
+        if can_stop_early and any(w_id in seen for w_id in page_ids):
+            report['stopped_early'] = True
+            break
+        last_page = (meta or {}).get('last_page', page)
+        if page >= last_page or (max_pages and page >= max_pages):
+            break
+        page += 1
+
+    report['found'] = len(encountered)
+    report['new'] = len(new_ids)
+    if dry_run:
+        return report
+
+    if new_ids:
+        manager = DownloadManager(parallelism=parallelism, bandwidth_kbps=bandwidth_kbps, on_progress=on_progress)
+        manager.enqueue(new_ids, download_path)
+        manager.wait()
+        stats = manager.get_stats()
+        report['downloaded'] = stats['done']
+        report['failed'] = stats['failed']
+        failed = {w_id for w_id, job in manager.jobs.items() if job['status'] == 'failed'}
+    else:
+        failed = set()
+
+    # Запоминаем увиденные ID; неудачные не запоминаем, чтобы повторить их в следующий раз.
+    # Полной считаем синхронизацию, дошедшую до конца выдачи или до уже виденных результатов.
+    seen.update(w_id for w_id in encountered if w_id not in failed)
+    reached_end = report['stopped_early'] or not max_pages or report['pages'] < max_pages
+    manifest[key] = {
+        'query': query,
+        'sorting': params.get('sorting'),
+        'seen': sorted(seen),
+        'complete': (state.get('complete', False) or reached_end) and not failed,
+        'last_sync': int(time.time()),
+    }
+    save_manifest(download_path, manifest)
+    return report
@@ -0,0 +1,242 @@
+"""
+Модуль локального словаря тегов Wallhaven для автодополнения поиска.
+
+Словарь пополняется из каждого ответа `get_wallpaper_info` и из sidecar-файлов
+библиотеки. Для поиска по префиксу ключи (имя и алиасы тега в нижнем регистре)
+хранятся отсортированным списком, поиск — двоичный (`bisect`).
+
+Не зависит от GTK: пополняется и из консольного режима.
+"""
+
+import os
+import json
+import bisect
+import threading
+
+from wallhaven_viewer.utils import get_cache_dir
+from wallhaven_viewer.sidecar import read_sidecar
+
+TAGS_FILE = "tags.json"
+# Версия формата файла; файлы другой версии игнорируются
+TAGS_VERSION = 1
+# Сколько ключей с нужным префиксом просматривать при подсказке
+MAX_SCAN = 500
+# Сколько последних учтённых обоев помнить (защита частот от повторного учёта);
+# больше — дольше запись файла, меньше — библиотеки крупнее лимита учитываются повторно
+MAX_WALLPAPERS = 50000
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_tags_path():
+    """Возвращает путь к файлу словаря тегов или None."""
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return None
+    index_dir = os.path.join(cache_dir, "index")
+    os.makedirs(index_dir, exist_ok=True)
+    return os.path.join(index_dir, TAGS_FILE)
+
+
+def get_tag_index():
+    """Возвращает общий словарь тегов процесса (загружается при первом обращении)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = TagIndex.load()
+        return _index
+
+
+def peek_tag_index():
+    """Возвращает общий словарь тегов, если он уже загружен, иначе None (не блокирует)."""
+    return _index
+
+
+def preload_tag_index(on_loaded=None):
+    """
+    Загружает общий словарь тегов в фоновом потоке, чтобы разбор файла
+    не занимал главный поток при первой подсказке.
+
+    Args:
+        on_loaded (callable, optional): Вызывается со словарём из фонового потока.
+    """
+    def worker():
+        index = get_tag_index()
+        if on_loaded:
+            on_loaded(index)
+
+    threading.Thread(target=worker, daemon=True).start()
+
+
+def save_tag_index():
+    """Сохраняет общий словарь тегов, если он загружался и изменился."""
+    if _index is not None:
+        _index.save()
+
+
+def format_tag_query(tag_id):
+    """Возвращает запрос точного поиска по ID тега."""
+    return f"id:{tag_id}"
+
+
+class TagIndex:
+    """
+    Словарь тегов: записи по ID тега и отсортированный список ключей для
+    поиска по префиксу.
+
+    Запись: id, name, alias, category, purity, count (на скольких обоях встречен).
+    Методы потокобезопасны.
+    """
+
+    def __init__(self, tags=None, wallpapers=None):
+        self.tags = {}
+        # Обои, чьи теги уже учтены: частота не накручивается повторными запросами.
+        # Упорядоченный dict — при переполнении забываются самые старые
+        self.wallpapers = dict.fromkeys(list(wallpapers or [])[-MAX_WALLPAPERS:])
+        self._keys = []
+        self._key_ids = []
+        self._lock = threading.Lock()
+        self._dirty = False
+        for record in tags or []:
+            self.tags[record['id']] = record
+        self._rebuild_keys()
+
+    @classmethod
+    def load(cls, path=None):
+        """Загружает словарь с диска; при отсутствии или ошибке — пустой."""
+        path = path or get_tags_path()
+        if not path or not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != TAGS_VERSION:
+                return cls()
+            return cls(data.get('tags', []), data.get('wallpapers', []))
+        except Exception as e:
+            print(f"Ошибка чтения словаря тегов {path}: {e}")
+            return cls()
+
+    def save(self, path=None):
+        """Атомарно сохраняет словарь, если он изменился."""
+        path = path or get_tags_path()
+        with self._lock:
+            if not path or not self._dirty:
+                return
+            data = {
+                'version': TAGS_VERSION,
+                'tags': list(self.tags.values()),
+                'wallpapers': list(self.wallpapers),
+            }
+            self._dirty = False
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Ошибка записи словаря тегов: {e}")
+
+    def add_wallpaper(self, wallpaper_id, tags):
+        """
+        Учитывает теги обоев (словари из ответа API или sidecar).
+
+        Returns:
+            bool: True, если словарь изменился.
+        """
+        tags = [t for t in tags or [] if isinstance(t, dict) and t.get('id') and t.get('name')]
+        if not tags:
+            return False
+        with self._lock:
+            first_time = wallpaper_id not in self.wallpapers
+            if first_time:
+                self.wallpapers[wallpaper_id] = None
+                if len(self.wallpapers) > MAX_WALLPAPERS:
+                    del self.wallpapers[next(iter(self.wallpapers))]
+            changed = first_time
+            for t in tags:
+                record = self.tags.get(t['id'])
+                if record is None:
+                    record = {
+                        'id': t['id'],
+                        'name': t['name'],
+                        'alias': t.get('alias') or '',
+                        'category': t.get('category') or '',
+                        'purity': t.get('purity') or '',
+                        'count': 0,
+                    }
+                    self.tags[t['id']] = record
+                    for key in self._record_keys(record):
+                        pos = bisect.bisect_left(self._keys, key)
+                        self._keys.insert(pos, key)
+                        self._key_ids.insert(pos, record['id'])
+                    changed = True
+                if first_time:
+                    record['count'] += 1
+            self._dirty = self._dirty or changed
+            return changed
+
+    def index_library(self, files):
+        """
+        Учитывает теги из sidecar-файлов библиотеки, ещё не попавших в словарь.
+
+        Args:
+            files (dict): {wallpaper_id: путь к файлу} (см. `scan_library`).
+
+        Returns:
+            int: Сколько обоев добавлено.
+        """
+        added = 0
+        for w_id, path in files.items():
+            if w_id in self.wallpapers:
+                continue
+            _meta, tags = read_sidecar(path)
+            if tags and self.add_wallpaper(w_id, tags):
+                added += 1
+        return added
+
+    def get(self, tag_id):
+        """Возвращает запись тега по ID или None."""
+        with self._lock:
+            return self.tags.get(tag_id)
+
+    def suggest(self, prefix, limit=10):
+        """
+        Подсказки по началу имени или алиаса тега.
+
+        Args:
+            prefix (str): Введённое начало (без учёта регистра).
+            limit (int): Максимум подсказок.
+
+        Returns:
+            list: Записи тегов, самые частые первыми.
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        with self._lock:
+            pos = bisect.bisect_left(self._keys, prefix)
+            found = {}
+            end = min(len(self._keys), pos + MAX_SCAN)
+            while pos < end and self._keys[pos].startswith(prefix):
+                tag_id = self._key_ids[pos]
+                found[tag_id] = self.tags[tag_id]
+                pos += 1
+            records = list(found.values())
+        records.sort(key=lambda r: (-r['count'], r['name'].lower()))
+        return records[:limit]
+
+    def _rebuild_keys(self):
+        pairs = sorted((key, record['id']) for record in self.tags.values() for key in self._record_keys(record))
+        self._keys = [key for key, _tag_id in pairs]
+        self._key_ids = [tag_id for _key, tag_id in pairs]
+
+    @staticmethod
+    def _record_keys(record):
+        keys = {record['name'].lower()}
+        for alias in (record.get('alias') or '').split(','):
+            alias = alias.strip().lower()
+            if alias:
+                keys.add(alias)
+        return keys
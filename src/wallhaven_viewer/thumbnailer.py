@@ -0,0 +1,110 @@
+"""
+Модуль массовой подготовки миниатюр (tiles) для локальной библиотеки.
+
+Декодирование и масштабирование выполняются в пуле процессов, поэтому
+подготовка масштабируется по ядрам, а не упирается в GIL. Используется
+Pillow с draft-режимом JPEG (декодирование сразу в уменьшенном масштабе);
+если Pillow не установлен, — GdkPixbuf внутри рабочего процесса.
+
+Не зависит от GTK в главном процессе: используется и главным окном,
+и консольной командой `warmup`.
+"""
+
+import os
+import time
+from concurrent.futures import as_completed
+
+from wallhaven_viewer.library import scan_library, get_tiles_dir, get_tile_path, is_tile_fresh
+from wallhaven_viewer.utils import process_pool
+
+# Максимальный размер миниатюры библиотеки (вписывается с сохранением пропорций)
+TILE_MAX_SIZE = (480, 320)
+TILE_QUALITY = 85
+
+
+def make_tile(source_path, tile_path, max_size=TILE_MAX_SIZE):
+    """
+    Создаёт миниатюру одного изображения (выполняется в рабочем процессе).
+
+    Returns:
+        bool: True при успехе.
+    """
+    tmp_path = tile_path + ".tmp"
+    try:
+        try:
+            from PIL import Image
+        except ImportError:
+            Image = None
+
+        if Image is not None:
+            with Image.open(source_path) as img:
+                # Для JPEG декодер сразу уменьшает изображение в 2/4/8 раз
+                img.draft("RGB", (max_size[0] * 2, max_size[1] * 2))
+                img = img.convert("RGB")
+                img.thumbnail(max_size, Image.BILINEAR)
+                img.save(tmp_path, "JPEG", quality=TILE_QUALITY)
+        else:
+            import gi
+            gi.require_version("GdkPixbuf", "2.0")
+            from gi.repository import GdkPixbuf
+
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(source_path, max_size[0], max_size[1], True)
+            if pixbuf.get_has_alpha():
+                pixbuf = pixbuf.composite_color_simple(pixbuf.get_width(), pixbuf.get_height(),
+                                                       GdkPixbuf.InterpType.NEAREST, 255, 16, 0xFFFFFF, 0xFFFFFF)
+            pixbuf.savev(tmp_path, "jpeg", ["quality"], [str(TILE_QUALITY)])
+        os.replace(tmp_path, tile_path)
+        return True
+    except Exception as e:
+        print(f"Ошибка подготовки миниатюры {source_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+
+def warm_library(download_path, workers=None, on_progress=None, cancel_event=None):
+    """
+    Готовит миниатюры для всех изображений библиотеки, которым они нужны.
+
+    Args:
+        download_path (str): Папка библиотеки.
+        workers (int, optional): Число процессов; по умолчанию — число ядер.
+        on_progress (callable, optional): Вызывается с (готово, всего) из вызывающего потока.
+        cancel_event (threading.Event, optional): Установленное событие прерывает работу.
+
+    Returns:
+        dict: total, generated, skipped, failed, seconds, cancelled.
+    """
+    start = time.perf_counter()
+    tiles_dir = get_tiles_dir()
+    library = scan_library(download_path)
+    jobs = []
+    for w_id, path in library.items():
+        tile_path = get_tile_path(w_id, tiles_dir)
+        if tile_path and not is_tile_fresh(tile_path, path):
+            jobs.append((path, tile_path))
+
+    report = {'total': len(library), 'generated': 0, 'skipped': len(library) - len(jobs),
+              'failed': 0, 'seconds': 0.0, 'cancelled': False}
+    if jobs:
+        with process_pool(workers) as pool:
+            futures = [pool.submit(make_tile, path, tile_path) for path, tile_path in jobs]
+            done = 0
+            for future in as_completed(futures):
+                done += 1
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    print(f"Ошибка рабочего процесса миниатюр: {e}")
+                    ok = False
+                report['generated' if ok else 'failed'] += 1
+                if on_progress:
+                    on_progress(done, len(jobs))
+                if cancel_event is not None and cancel_event.is_set():
+                    report['cancelled'] = True
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    break
+    report['seconds'] = time.perf_counter() - start
+    return report
@@ -0,0 +1,366 @@
+"""
+Виджет тайлового просмотра очень больших изображений.
+
+Сначала показывается уменьшенный до размера экрана уровень (preview),
+а полное разрешение декодируется только при увеличении. В видеопамять
+загружаются лишь видимые тайлы, поэтому память при открытии огромных
+обоев ограничена размером экрана, а не размером изображения.
+"""
+
+import threading
+from collections import OrderedDict
+import gi
+gi.require_version("Gtk", "4.0")
+gi.require_version("Graphene", "1.0")
+from gi.repository import Gtk, Gdk, GLib, Graphene
+
+# Сторона тайла в пикселях оригинала
+TILE_SIZE = 512
+# Максимальное число тайловых текстур, одновременно удерживаемых в памяти
+MAX_TILE_TEXTURES = 48
+# Максимальное увеличение (пикселей экрана на пиксель оригинала)
+MAX_ZOOM = 4.0
+# Шаг масштабирования колесом мыши
+ZOOM_STEP = 1.25
+
+
+def get_screen_size(widget=None):
+    """
+    Возвращает размер наибольшего монитора в физических пикселях.
+
+    Args:
+        widget (Gtk.Widget, optional): Виджет, по дисплею которого определяются мониторы.
+
+    Returns:
+        tuple: (ширина, высота); (1920, 1080), если определить не удалось.
+    """
+    best = (1920, 1080)
+    try:
+        display = widget.get_display() if widget else Gdk.Display.get_default()
+        monitors = display.get_monitors()
+        best_area = 0
+        for i in range(monitors.get_n_items()):
+            monitor = monitors.get_item(i)
+            geo = monitor.get_geometry()
+            scale = monitor.get_scale_factor() or 1
+            w, h = geo.width * scale, geo.height * scale
+            if w * h > best_area:
+                best_area = w * h
+                best = (w, h)
+    except Exception:
+        pass
+    return best
+
+
+class TiledImageView(Gtk.Widget):
+    """
+    Просмотрщик с масштабированием и панорамированием для очень больших изображений.
+
+    Уровень preview (не больше экрана) отрисовывается, пока масштаб не требует
+    большей детализации. При увеличении сверх preview полное изображение
+    декодируется в фоне функцией `decode_full`, а затем режется на тайлы
+    TILE_SIZE x TILE_SIZE, текстуры которых создаются только для видимой области.
+    При возврате к обзорному масштабу полное разрешение освобождается.
+
+    Управление: колесо мыши / жест щипка — масштаб, перетаскивание — сдвиг,
+    двойной клик — вписать в окно.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.set_hexpand(True)
+        self.set_vexpand(True)
+        self.set_overflow(Gtk.Overflow.HIDDEN)
+        self.set_focusable(True)
+
+        self.image_width = 0
+        self.image_height = 0
+        self.preview_texture = None
+        self.preview_width = 0
+        self.decode_full = None
+
+        self.full_pixbuf = None
+        self.tile_textures = OrderedDict()
+        # Поколение изображения, полное разрешение которого сейчас декодируется (None — ничего)
+        self._decoding_generation = None
+        self._generation = 0
+
+        # Масштаб и точка изображения, находящаяся в центре области просмотра
+        self.zoom = 1.0
+        self.center_x = 0.0
+        self.center_y = 0.0
+        self._fitted = True
+        self._pointer = None
+        self._drag_center = None
+        self._pinch_zoom = None
+
+        scroll = Gtk.EventControllerScroll.new(Gtk.EventControllerScrollFlags.VERTICAL)
+        scroll.connect("scroll", self.on_scroll)
+        self.add_controller(scroll)
+
+        motion = Gtk.EventControllerMotion()
+        motion.connect("motion", lambda _c, x, y: setattr(self, '_pointer', (x, y)))
+        motion.connect("leave", lambda _c: setattr(self, '_pointer', None))
+        self.add_controller(motion)
+
+        drag = Gtk.GestureDrag()
+        drag.connect("drag-begin", self.on_drag_begin)
+        drag.connect("drag-update", self.on_drag_update)
+        self.add_controller(drag)
+
+        pinch = Gtk.GestureZoom()
+        pinch.connect("begin", lambda *_: setattr(self, '_pinch_zoom', self.zoom))
+        pinch.connect("scale-changed", self.on_pinch_scale_changed)
+        self.add_controller(pinch)
+
+        click = Gtk.GestureClick()
+        click.connect("pressed", self.on_click_pressed)
+        self.add_controller(click)
+
+    def set_image(self, preview_pixbuf, width, height, decode_full):
+        """
+        Устанавливает новое изображение.
+
+        Args:
+            preview_pixbuf (GdkPixbuf.Pixbuf): Уменьшенная до размера экрана копия.
+            width (int): Ширина оригинала.
+            height (int): Высота оригинала.
+            decode_full (callable): Функция без аргументов, возвращающая полный Pixbuf
+                (вызывается в фоновом потоке).
+        """
+        self.release_full_resolution()
+        self._generation += 1
+        self.image_width = width
+        self.image_height = height
+        self.preview_texture = Gdk.Texture.new_for_pixbuf(preview_pixbuf)
+        self.preview_width = preview_pixbuf.get_width()
+        self.decode_full = decode_full
+        self._fitted = True
+        self.center_x = width / 2.0
+        self.center_y = height / 2.0
+        self.queue_resize()
+        self.queue_draw()
+
+    def clear(self):
+        """Освобождает все текстуры и буферы изображения."""
+        self.release_full_resolution()
+        self._generation += 1
+        self.preview_texture = None
+        self.decode_full = None
+        self.image_width = 0
+        self.image_height = 0
+        self.queue_draw()
+
+    def release_full_resolution(self):
+        """Освобождает полноразмерный Pixbuf и все тайловые текстуры."""
+        self.full_pixbuf = None
+        self.tile_textures.clear()
+
+    def release_memory(self):
+        """
+        Освобождает полное разрешение при нехватке памяти: до следующего
+        изменения масштаба показывается preview, затем полное разрешение
+        декодируется заново.
+        """
+        if self.full_pixbuf is None:
+            return
+        self.release_full_resolution()
+        self.queue_draw()
+
+    def get_fit_zoom(self):
+        """Возвращает масштаб, при котором изображение целиком вписывается в виджет."""
+        w, h = self.get_width(), self.get_height()
+        if not self.image_width or not self.image_height or w <= 0 or h <= 0:
+            return 1.0
+        return min(w / self.image_width, h / self.image_height, 1.0)
+
+    def reset_zoom(self):
+        """Вписывает изображение в окно."""
+        self._fitted = True
+        self.center_x = self.image_width / 2.0
+        self.center_y = self.image_height / 2.0
+        self._update_resolution_level()
+        self.queue_draw()
+
+    def set_zoom(self, zoom, anchor=None):
+        """
+        Меняет масштаб, сохраняя неподвижной точку изображения под `anchor`.
+
+        Args:
+            zoom (float): Новый масштаб.
+            anchor (tuple, optional): Координаты (x, y) в виджете; по умолчанию центр.
+        """
+        if not self.image_width:
+            return
+        fit = self.get_fit_zoom()
+        zoom = max(fit, min(MAX_ZOOM, zoom))
+        w, h = self.get_width(), self.get_height()
+        ax, ay = anchor if anchor else (w / 2.0, h / 2.0)
+
+        old = self.current_zoom()
+        img_x = self.center_x + (ax - w / 2.0) / old
+        img_y = self.center_y + (ay - h / 2.0) / old
+
+        self.zoom = zoom
+        self._fitted = zoom <= fit
+        self.center_x = img_x - (ax - w / 2.0) / zoom
+        self.center_y = img_y - (ay - h / 2.0) / zoom
+        self._clamp_center()
+        self._update_resolution_level()
+        self.queue_draw()
+
+    def current_zoom(self):
+        """Возвращает действующий масштаб с учётом режима «вписать»."""
+        return self.get_fit_zoom() if self._fitted else self.zoom
+
+    def _clamp_center(self):
+        z = self.current_zoom()
+        w, h = self.get_width(), self.get_height()
+        half_w, half_h = w / (2.0 * z), h / (2.0 * z)
+        if self.image_width * z <= w:
+            self.center_x = self.image_width / 2.0
+        else:
+            self.center_x = max(half_w, min(self.image_width - half_w, self.center_x))
+        if self.image_height * z <= h:
+            self.center_y = self.image_height / 2.0
+        else:
+            self.center_y = max(half_h, min(self.image_height - half_h, self.center_y))
+
+    def _needs_full_resolution(self):
+        """True, если при текущем масштабе preview уже недостаточно детален."""
+        if not self.preview_width or not self.image_width:
+            return False
+        return self.current_zoom() * self.image_width > self.preview_width * 1.05
+
+    def _update_resolution_level(self):
+        """Запускает декодирование полного разрешения или освобождает его."""
+        if self._needs_full_resolution():
+            if (self.full_pixbuf is None and self.decode_full
+                    and self._decoding_generation != self._generation):
+                generation = self._decoding_generation = self._generation
+                decode_full = self.decode_full
+
+                def worker():
+                    pixbuf = None
+                    try:
+                        pixbuf = decode_full()
+                    except Exception as e:
+                        print(f"Ошибка декодирования полного разрешения: {e}")
+                    GLib.idle_add(self._on_full_decoded, pixbuf, generation)
+
+                threading.Thread(target=worker, daemon=True).start()
+        elif self.full_pixbuf is not None:
+            self.release_full_resolution()
+
+    def _on_full_decoded(self, pixbuf, generation):
+        if generation == self._decoding_generation:
+            self._decoding_generation = None
+        if generation != self._generation:
+            # Устаревший результат: текущему изображению тоже может быть нужно полное разрешение
+            self._update_resolution_level()
+            return False
+        if pixbuf is not None and self._needs_full_resolution():
+            self.full_pixbuf = pixbuf
+            self.queue_draw()
+        return False
+
+    def _get_tile_texture(self, col, row):
+        key = (col, row)
+        texture = self.tile_textures.get(key)
+        if texture is not None:
+            self.tile_textures.move_to_end(key)
+            return texture
+
+        x, y = col * TILE_SIZE, row * TILE_SIZE
+        w = min(TILE_SIZE, self.image_width - x)
+        h = min(TILE_SIZE, self.image_height - y)
+        if w <= 0 or h <= 0:
+            return None
+        sub = self.full_pixbuf.new_subpixbuf(x, y, w, h)
+        texture = Gdk.Texture.new_for_pixbuf(sub)
+        self.tile_textures[key] = texture
+        while len(self.tile_textures) > MAX_TILE_TEXTURES:
+            self.tile_textures.popitem(last=False)
+        return texture
+
+    def do_measure(self, orientation, for_size):
+        natural = 0
+        if self.preview_texture is not None:
+            if orientation == Gtk.Orientation.HORIZONTAL:
+                natural = self.preview_texture.get_width()
+            else:
+                natural = self.preview_texture.get_height()
+        return 100, natural, -1, -1
+
+    def do_size_allocate(self, width, height, baseline):
+        if self.image_width:
+            self._clamp_center()
+            self._update_resolution_level()
+
+    def do_snapshot(self, snapshot):
+        if self.preview_texture is None or not self.image_width:
+            return
+
+        w, h = self.get_width(), self.get_height()
+        z = self.current_zoom()
+        origin_x = w / 2.0 - self.center_x * z
+        origin_y = h / 2.0 - self.center_y * z
+
+        if self.full_pixbuf is None:
+            rect = Graphene.Rect().init(origin_x, origin_y, self.image_width * z, self.image_height * z)
+            snapshot.append_texture(self.preview_texture, rect)
+            return
+
+        # Видимая область в координатах оригинала
+        left = max(0.0, -origin_x / z)
+        top = max(0.0, -origin_y / z)
+        right = min(self.image_width, (w - origin_x) / z)
+        bottom = min(self.image_height, (h - origin_y) / z)
+
+        first_col, last_col = int(left // TILE_SIZE), int((right - 1) // TILE_SIZE)
+        first_row, last_row = int(top // TILE_SIZE), int((bottom - 1) // TILE_SIZE)
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                texture = self._get_tile_texture(col, row)
+                if texture is None:
+                    continue
+                rect = Graphene.Rect().init(
+                    origin_x + col * TILE_SIZE * z,
+                    origin_y + row * TILE_SIZE * z,
+                    texture.get_width() * z,
+                    texture.get_height() * z,
+                )
+                snapshot.append_texture(texture, rect)
+
+    def on_scroll(self, controller, dx, dy):
+        if not self.image_width or dy == 0:
+            return False
+        factor = ZOOM_STEP if dy < 0 else 1.0 / ZOOM_STEP
+        self.set_zoom(self.current_zoom() * factor, self._pointer)
+        return True
+
+    def on_drag_begin(self, gesture, x, y):
+        self._drag_center = (self.center_x, self.center_y)
+
+    def on_drag_update(self, gesture, dx, dy):
+        if self._drag_center is None or self._fitted:
+            return
+        z = self.current_zoom()
+        self.center_x = self._drag_center[0] - dx / z
+        self.center_y = self._drag_center[1] - dy / z
+        self._clamp_center()
+        self.queue_draw()
+
+    def on_pinch_scale_changed(self, gesture, scale):
+        if self._pinch_zoom is None:
+            self._pinch_zoom = self.current_zoom()
+        ok, x, y = gesture.get_bounding_box_center()
+        self.set_zoom(self._pinch_zoom * scale, (x, y) if ok else None)
+
+    def on_click_pressed(self, gesture, n_press, x, y):
+        self.grab_focus()
+        if n_press == 2:
+            if self._fitted:
+                self.set_zoom(1.0, (x, y))
+            else:
+                self.reset_zoom()
@@ -0,0 +1,42 @@
+"""
+Модуль измерения времени запуска приложения.
+
+При заданной переменной окружения WALLHAVEN_STARTUP_TRACE каждая отметка
+печатается со временем от старта процесса:
+
+    WALLHAVEN_STARTUP_TRACE=1 python -m wallhaven_viewer
+"""
+
+import os
+import sys
+import time
+
+TRACE_ENV = "WALLHAVEN_STARTUP_TRACE"
+
+_start = time.perf_counter()
+_marks = {}
+
+
+def is_enabled():
+    """True, если трассировка запуска включена."""
+    return bool(os.environ.get(TRACE_ENV))
+
+
+def mark(stage):
+    """
+    Отмечает этап запуска. Повторные отметки этапа игнорируются.
+
+    Args:
+        stage (str): Название этапа (например, 'ui_built', 'first_thumbnail').
+    """
+    if stage in _marks:
+        return
+    elapsed = (time.perf_counter() - _start) * 1000
+    _marks[stage] = elapsed
+    if is_enabled():
+        print(f"⏱ {elapsed:8.1f} ms  {stage}", file=sys.stderr)
+
+
+def get_marks():
+    """Возвращает отметки этапов в миллисекундах от старта процесса."""
+    return dict(_marks)
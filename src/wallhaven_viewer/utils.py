@@ -4,9 +4,29 @@
 
 import os
 import sys
-from gi.repository import GLib
+import functools
 
+try:
+    from gi.repository import GLib
+except ImportError:  # консольный режим на машинах без PyGObject
+    GLib = None
 
+
+def get_user_cache_dir():
+    """Возвращает XDG-папку кэша пользователя (через GLib, если он доступен)."""
+    if GLib is not None:
+        return GLib.get_user_cache_dir()
+    return os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+
+
+def get_user_config_dir():
+    """Возвращает XDG-папку настроек пользователя (через GLib, если он доступен)."""
+    if GLib is not None:
+        return GLib.get_user_config_dir()
+    return os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+
+
+@functools.lru_cache(maxsize=None)
 def resolve_path(filename: str) -> str:
     """
     Ищет ресурс по следующим местам (в указанном порядке):
@@ -53,7 +73,7 @@ def get_cache_dir():
     Returns:
         str or None: Абсолютный путь к папке кэша или None в случае ошибки.
     """
-    cache_dir = os.path.join(GLib.get_user_cache_dir(), "wallhaven_viewer_cache")
+    cache_dir = os.path.join(get_user_cache_dir(), "wallhaven_viewer_cache")
     if not os.path.exists(cache_dir):
         try:
             os.makedirs(cache_dir)
@@ -63,6 +83,29 @@ def get_cache_dir():
     return cache_dir
 
 
+def get_staging_dir():
+    """
+    Возвращает путь к папке временных файлов полноразмерных изображений.
+
+    Скачанные оригиналы лежат здесь, пока окно просмотра открыто, и при
+    сохранении переносятся в папку загрузок.
+
+    Returns:
+        str or None: Абсолютный путь к папке или None в случае ошибки.
+    """
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return None
+    staging_dir = os.path.join(cache_dir, "staging")
+    if not os.path.exists(staging_dir):
+        try:
+            os.makedirs(staging_dir, exist_ok=True)
+        except OSError as e:
+            print(f"Ошибка создания папки staging: {e}")
+            return None
+    return staging_dir
+
+
 def extract_wallpaper_id(filename):
     """
     Извлекает ID обоев из имени файла.
@@ -155,6 +198,17 @@ def clean_cache(max_age_days=7, max_total_mb=300):
             except Exception:
                 continue
 
+        # Осиротевшие файлы staging (например, после аварийного завершения) старше суток
+        staging_dir = os.path.join(cache_dir, "staging")
+        if os.path.isdir(staging_dir):
+            for name in os.listdir(staging_dir):
+                path = os.path.join(staging_dir, name)
+                try:
+                    if now - os.path.getmtime(path) > 24 * 60 * 60:
+                        os.remove(path)
+                except Exception:
+                    continue
+
         # 2) проверить суммарный размер и удалить старые файлы, если нужно
         remaining = [f for f in files if not f['removed']]
         total = sum(f['size'] for f in remaining)
@@ -173,21 +227,23 @@ def clean_cache(max_age_days=7, max_total_mb=300):
     except Exception:
         return
 
-import os, subprocess
 
-def wallpaper_portal_available() -> bool:
-    """True, если org.freedesktop.portal.Wallpaper реагирует."""
-    try:
-        # qdbus/dbus-send отсутствуют в некоторых системах; ловим любые ошибки
-        out = subprocess.check_output(
-            ["gdbus", "call", "--session",
-             "--dest", "org.freedesktop.portal.Desktop",
-             "--object-path", "/org/freedesktop/portal/desktop",
-             "--method", "org.freedesktop.DBus.Properties.Get",
-             "org.freedesktop.portal.Wallpaper", "version"],
-            stderr=subprocess.DEVNULL,
-            timeout=2
-        )
-        return b"(" in out  # ответ пришёл
-    except Exception:
-        return False
\ No newline at end of file
+def process_pool(workers=None):
+    """
+    Создаёт пул процессов для пакетной обработки библиотеки.
+
+    Процессы запускаются через spawn: fork процесса с запущенным GTK
+    и потоками небезопасен. multiprocessing импортируется здесь, чтобы
+    не замедлять запуск GUI.
+
+    Args:
+        workers (int, optional): Число процессов; по умолчанию — число ядер.
+
+    Returns:
+        concurrent.futures.ProcessPoolExecutor: Пул (используется как контекстный менеджер).
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                               mp_context=multiprocessing.get_context("spawn"))
@@ -0,0 +1,328 @@
+"""
+Модуль установки обоев рабочего стола.
+
+Поддерживаемые backend'ы (в порядке предпочтения):
+  - portal    — org.freedesktop.portal.Wallpaper (внутри Flatpak или без GSettings);
+  - plasma    — org.kde.PlasmaShell.evaluateScript (KDE Plasma);
+  - gsettings — org.gnome.desktop.background (GNOME и совместимые).
+
+Доступность backend'ов проверяется один раз асинхронно (Gio.DBusProxy) и
+кэшируется; установка обоев тоже асинхронная, поэтому главный цикл GTK
+никогда не ждёт D-Bus.
+
+Для проверки без настоящего рабочего стола шину можно подменить:
+`WallpaperBackends(connection)` принимает любое Gio.DBusConnection
+(например, от Gio.TestDBus), а `benchmarks/fake_portal.py` публикует
+заглушку портала на текущей сессионной шине.
+
+Не зависит от Gtk (только Gio): используется и окном просмотра, и фоновой
+сменой обоев в консольном режиме.
+"""
+
+import os
+import json
+
+import gi
+gi.require_version("GdkPixbuf", "2.0")
+from gi.repository import Gio, GLib, GdkPixbuf
+
+from wallhaven_viewer.probe import probe_file
+
+BACKGROUND_SCHEMA = "org.gnome.desktop.background"
+
+PORTAL_NAME = "org.freedesktop.portal.Desktop"
+PORTAL_PATH = "/org/freedesktop/portal/desktop"
+PORTAL_IFACE = "org.freedesktop.portal.Wallpaper"
+
+PLASMA_NAME = "org.kde.plasmashell"
+PLASMA_PATH = "/PlasmaShell"
+PLASMA_IFACE = "org.kde.PlasmaShell"
+PLASMA_SCRIPT = (
+    "for (const d of desktops()) {"
+    " d.wallpaperPlugin = 'org.kde.image';"
+    " d.currentConfigGroup = ['Wallpaper', 'org.kde.image', 'General'];"
+    " d.writeConfig('Image', %s); }"
+)
+
+# Таймаут вызовов D-Bus, мс
+DBUS_TIMEOUT_MS = 5000
+# Сколько ждать установки обоев в синхронном режиме, с
+SYNC_TIMEOUT = 30
+
+_backends = None
+# Контекст и backend'ы синхронного режима (`set_wallpaper`)
+_sync_context = None
+_sync_backends = None
+
+
+def get_wallpaper_backends():
+    """Возвращает общий для приложения набор backend'ов (проверяется один раз)."""
+    global _backends
+    if _backends is None:
+        _backends = WallpaperBackends()
+    return _backends
+
+
+def is_valid_image(path):
+    """
+    Проверяет, что файл — изображение известного формата (без полного декодирования).
+
+    Returns:
+        bool: True, если формат и размеры читаются из заголовка.
+    """
+    try:
+        if not os.path.isfile(path) or os.path.getsize(path) == 0:
+            return False
+        info = probe_file(path)
+        if info:
+            return info.width > 0 and info.height > 0
+        fmt, width, height = GdkPixbuf.Pixbuf.get_file_info(path)
+        return fmt is not None and width > 0 and height > 0
+    except Exception:
+        return False
+
+
+def set_wallpaper_gsettings(path):
+    """
+    Устанавливает обои через GSettings.
+    Безопасно проверяет доступность ключей.
+
+    Returns:
+        bool: True при успехе.
+    """
+    try:
+        # Преобразуем путь в file:// URI (экранируем пробелы и спецсимволы)
+        file_uri = Gio.File.new_for_path(os.path.abspath(path)).get_uri()
+
+        schema = get_background_schema()
+        if not schema:
+            print(f"❌ Схема {BACKGROUND_SCHEMA} не найдена")
+            return False
+
+        settings = Gio.Settings.new(BACKGROUND_SCHEMA)
+        # Устанавливаем обои
+        if schema.has_key('picture-uri-dark'):
+            settings.set_string('picture-uri', file_uri)
+            settings.set_string('picture-uri-dark', file_uri)
+            print(f"✅ Обои установлены (с поддержкой тёмного режима): {file_uri}")
+        else:
+            settings.set_string('picture-uri', file_uri)
+            print(f"✅ Обои установлены: {file_uri}")
+        # Без главного цикла запись нужно протолкнуть явно (консольный режим)
+        Gio.Settings.sync()
+        return True
+
+    except Exception as e:
+        print(f"❌ Ошибка установки обоев: {type(e).__name__}: {e}")
+        return False
+
+
+def get_background_schema():
+    """Возвращает схему фона GNOME или None, если она не установлена."""
+    schema_source = Gio.SettingsSchemaSource.get_default()
+    return schema_source.lookup(BACKGROUND_SCHEMA, True) if schema_source else None
+
+
+class WallpaperBackends:
+    """
+    Асинхронная проверка и использование backend'ов установки обоев.
+
+    Все колбэки вызываются в главном контексте GLib того потока, из которого
+    начата операция.
+
+    Args:
+        connection (Gio.DBusConnection, optional): Шина; по умолчанию — сессионная.
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection
+        # Имена доступных backend'ов в порядке предпочтения; None — проверка не завершена
+        self.available = None
+        self._proxies = {}
+        self._waiting = []
+        self._probing = False
+
+    def probe(self, callback=None):
+        """
+        Проверяет доступные backend'ы (один раз) и вызывает callback(available).
+        """
+        if self.available is not None:
+            if callback:
+                callback(self.available)
+            return
+        if callback:
+            self._waiting.append(callback)
+        if self._probing:
+            return
+        self._probing = True
+        if self.connection is None:
+            Gio.bus_get(Gio.BusType.SESSION, None, self._on_bus_ready)
+        else:
+            self._probe_portal()
+
+    def _on_bus_ready(self, _source, result):
+        try:
+            self.connection = Gio.bus_get_finish(result)
+        except GLib.Error as e:
+            print(f"⚠️  Сессионная шина D-Bus недоступна: {e.message}")
+            self._finish_probe()
+            return
+        self._probe_portal()
+
+    def _probe_portal(self):
+        Gio.DBusProxy.new(
+            self.connection, Gio.DBusProxyFlags.NONE, None,
+            PORTAL_NAME, PORTAL_PATH, PORTAL_IFACE, None, self._on_portal_proxy)
+
+    def _on_portal_proxy(self, _source, result):
+        try:
+            proxy = Gio.DBusProxy.new_finish(result)
+            # Свойства загружаются при создании прокси: version есть, только если портал отвечает
+            if proxy.get_name_owner() and proxy.get_cached_property("version") is not None:
+                self._proxies['portal'] = proxy
+        except GLib.Error as e:
+            print(f"Портал обоев недоступен: {e.message}")
+        Gio.DBusProxy.new(
+            self.connection,
+            Gio.DBusProxyFlags.DO_NOT_LOAD_PROPERTIES | Gio.DBusProxyFlags.DO_NOT_AUTO_START,
+            None, PLASMA_NAME, PLASMA_PATH, PLASMA_IFACE, None, self._on_plasma_proxy)
+
+    def _on_plasma_proxy(self, _source, result):
+        try:
+            proxy = Gio.DBusProxy.new_finish(result)
+            if proxy.get_name_owner():
+                self._proxies['plasma'] = proxy
+        except GLib.Error:
+            pass
+        self._finish_probe()
+
+    def _finish_probe(self):
+        available = []
+        has_gsettings = get_background_schema() is not None
+        # Внутри Flatpak доступ к GSettings хоста закрыт — портал первым
+        if 'portal' in self._proxies and (os.getenv("FLATPAK_ID") or not has_gsettings):
+            available.append('portal')
+        # На KDE схема GNOME тоже бывает установлена, но фон рисует Plasma
+        if 'plasma' in self._proxies:
+            available.append('plasma')
+        if has_gsettings:
+            available.append('gsettings')
+        if 'portal' in self._proxies and 'portal' not in available:
+            available.append('portal')
+
+        self.available = available
+        self._probing = False
+        print(f"🖼️  Backend'ы установки обоев: {', '.join(available) or 'нет'}")
+        waiting, self._waiting = self._waiting, []
+        for callback in waiting:
+            callback(available)
+
+    def apply(self, path, callback=None):
+        """
+        Асинхронно устанавливает обои: backend'ы пробуются по очереди до первого успеха.
+
+        Args:
+            path (str): Путь к изображению.
+            callback (callable, optional): callback(success, backend_name).
+        """
+        callback = callback or (lambda ok, name: None)
+        if not path or not os.path.exists(path):
+            print("❌ Нет локального файла — нельзя установить обои")
+            callback(False, None)
+            return
+        self.probe(lambda available: self._apply_next(path, list(available), callback))
+
+    def _apply_next(self, path, backends, callback):
+        if not backends:
+            callback(False, None)
+            return
+        name = backends.pop(0)
+
+        def done(ok):
+            if ok:
+                callback(True, name)
+            else:
+                self._apply_next(path, backends, callback)
+
+        getattr(self, f"_apply_{name}")(path, done)
+
+    def _apply_portal(self, path, done):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+            # Список дескрипторов забирает fd во владение и закроет его сам
+            fd_list = Gio.UnixFDList.new_from_array([fd])
+        except OSError as e:
+            print(f"❌ Не удалось открыть {path}: {e}")
+            done(False)
+            return
+        params = GLib.Variant("(sha{sv})", ("", 0, {'show-preview': GLib.Variant("b", False)}))
+
+        def on_done(proxy, result):
+            try:
+                proxy.call_with_unix_fd_list_finish(result)
+                print(f"✅ Обои установлены через портал: {path}")
+                done(True)
+            except GLib.Error as e:
+                print(f"⚠️  Портал не установил обои ({e.message})")
+                done(False)
+
+        self._proxies['portal'].call_with_unix_fd_list(
+            "SetWallpaperFile", params, Gio.DBusCallFlags.NONE, DBUS_TIMEOUT_MS, fd_list, None, on_done)
+
+    def _apply_gsettings(self, path, done):
+        # Запись в dconf не блокирует: GSettings отправляет её асинхронно
+        done(set_wallpaper_gsettings(path))
+
+    def _apply_plasma(self, path, done):
+        file_uri = Gio.File.new_for_path(os.path.abspath(path)).get_uri()
+        script = PLASMA_SCRIPT % json.dumps(file_uri)
+
+        def on_done(proxy, result):
+            try:
+                proxy.call_finish(result)
+                print(f"✅ Обои установлены через Plasma: {path}")
+                done(True)
+            except GLib.Error as e:
+                print(f"⚠️  Plasma не установила обои ({e.message})")
+                done(False)
+
+        self._proxies['plasma'].call(
+            "evaluateScript", GLib.Variant("(s)", (script,)), Gio.DBusCallFlags.NONE,
+            DBUS_TIMEOUT_MS, None, on_done)
+
+
+def set_wallpaper(path):
+    """
+    Синхронно устанавливает обои — для потоков без главного цикла GTK
+    (консольный режим, фоновая смена обоев).
+
+    Асинхронные вызовы выполняются в отдельном контексте GLib, который
+    крутится до результата; проверка backend'ов кэшируется между вызовами.
+    Из главного потока GUI используйте `get_wallpaper_backends().apply`.
+
+    Returns:
+        bool: True при успехе.
+    """
+    global _sync_context, _sync_backends
+    if _sync_context is None:
+        _sync_context = GLib.MainContext.new()
+        _sync_backends = WallpaperBackends()
+
+    result = {}
+
+    def on_timeout():
+        result.setdefault('ok', False)
+        return False
+
+    _sync_context.push_thread_default()
+    try:
+        _sync_backends.apply(path, lambda ok, name: result.setdefault('ok', ok))
+        timeout = GLib.timeout_source_new_seconds(SYNC_TIMEOUT)
+        timeout.set_callback(on_timeout)
+        timeout.attach(_sync_context)
+        while 'ok' not in result:
+            _sync_context.iteration(True)
+        timeout.destroy()
+        return result['ok']
+    finally:
+        _sync_context.pop_thread_default()